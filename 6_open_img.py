@@ -1,62 +1,577 @@
 import os.path
 import sys
 import math
+import bisect
+import re
 import glob
 import json
+import copy
 import time
+import hashlib
+import shutil
+import random
+import socket
+import threading
+import atexit
+import logging
+import traceback
+from logging.handlers import RotatingFileHandler
+from email.utils import parsedate_to_datetime
 import requests
-from collections import OrderedDict
-from urllib.parse import urljoin, urlparse
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urldefrag, urljoin, urlparse
 import lxml.html
+from lxml import etree
 
 from PyQt6.QtCore import *
 from PyQt6.QtWidgets import *
 from PyQt6.QtGui import *
 
 
-class ConfigManager:
-    """配置管理器，用于保存和加载用户设置"""
+class _NullSpan:
+    """未启用性能统计时使用的空span，进入和退出都不做任何事"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _PerfSpan:
+    """记录一段代码耗时的span"""
+    __slots__ = ('recorder', 'name', 'args', 'start')
+
+    def __init__(self, recorder, name, args):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class PerfRecorder:
+    """热点路径的轻量性能统计
+
+    未启用时span()直接返回共享的空span，开销只有一次属性判断；启用后记录每段耗时的
+    聚合统计（次数/总耗时/最大值）和最近的事件，可导出为Chrome trace-event JSON
+    （在chrome://tracing或Perfetto中打开）。
+    """
+    NULL_SPAN = _NullSpan()
+    MAX_EVENTS = 200000
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.reset()
+
+    def reset(self):
+        """清空统计"""
+        with self.lock:
+            self.stats = {}     # 名称 -> [次数, 总耗时, 最大耗时]（秒）
+            self.counters = {}  # 名称 -> 计数
+            self.events = deque(maxlen=self.MAX_EVENTS)
+
+    def span(self, name, **args):
+        """用with包裹需要统计的代码段"""
+        if not self.enabled:
+            return self.NULL_SPAN
+        return _PerfSpan(self, name, args)
+
+    def record(self, name, start, end, args=None):
+        """记录一段已知起止时间（perf_counter）的耗时"""
+        if not self.enabled:
+            return
+        duration = end - start
+        with self.lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = [0, 0.0, 0.0]
+            stat[0] += 1
+            stat[1] += duration
+            if duration > stat[2]:
+                stat[2] = duration
+            self.events.append(('X', name, start, duration, threading.get_ident(), args))
+
+    def count(self, name, amount=1):
+        """累加计数（如缓存命中/未命中）"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def sample(self, name, value):
+        """记录一个随时间变化的数值（如线程池占用），trace中显示为计数曲线"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.events.append(('C', name, time.perf_counter(), value, threading.get_ident(), None))
+
+    def ratio(self, hit_name, miss_name):
+        """命中率，没有数据时返回None"""
+        hits, misses = self.counters.get(hit_name, 0), self.counters.get(miss_name, 0)
+        return hits / (hits + misses) if hits + misses else None
+
+    def summary_rows(self):
+        """按总耗时降序返回[(名称, 次数, 总耗时ms, 平均ms, 最大ms)]"""
+        with self.lock:
+            items = [(name, s[0], s[1] * 1000, s[1] * 1000 / s[0], s[2] * 1000) for name, s in self.stats.items()]
+        return sorted(items, key=lambda row: row[2], reverse=True)
+
+    def summary_text(self, limit=12):
+        """文本形式的统计摘要"""
+        if not self.enabled and not self.stats:
+            return "性能统计未启用"
+        lines = [f"{'名称':<22}{'次数':>8}{'平均ms':>10}{'最大ms':>10}"]
+        for name, calls, _total, mean, peak in self.summary_rows()[:limit]:
+            lines.append(f"{name:<24}{calls:>8}{mean:>10.2f}{peak:>10.2f}")
+        hit_ratio = self.ratio('cache.hit', 'cache.miss')
+        if hit_ratio is not None:
+            lines.append(f"缓存命中率: {hit_ratio * 100:.1f}%")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path):
+        """导出Chrome trace-event JSON，返回导出的事件数"""
+        with self.lock:
+            events = list(self.events)
+        trace = []
+        for phase, name, start, value, tid, args in events:
+            event = {'name': name, 'ph': phase, 'ts': round((start - self.origin) * 1e6, 1), 'pid': os.getpid(), 'tid': tid}
+            if phase == 'X':
+                event['dur'] = round(value * 1e6, 1)
+                if args:
+                    event['args'] = {k: str(v) for k, v in args.items()}
+            else:
+                event['args'] = {name: value}
+            trace.append(event)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        return len(trace)
+
+
+# 全局性能统计（工作线程直接使用，无需逐层传递）
+perf_recorder = PerfRecorder()
+
+
+class SamplingProfiler:
+    """采样分析器：后台线程定时抓取所有线程的调用栈
+
+    GUI线程的采样带时间戳保存在环形缓冲中，ProfilingApplication发现某次事件分发超过
+    stall_ms时，取这段时间内出现最多的调用栈作为卡顿原因。退出时写出报告，
+    列出造成GUI卡顿最多的函数（如load_albums、process_url）以及各线程的热点函数。
+    """
+    MAX_DEPTH = 64
+
+    def __init__(self, interval_ms=5, stall_ms=50):
+        self.interval = interval_ms / 1000.0
+        self.stall_ms = stall_ms
+        self.main_ident = threading.main_thread().ident
+        self.app_file = os.path.basename(__file__)
+        self.lock = threading.Lock()
+        self.main_samples = deque(maxlen=4000)  # (时间, 调用栈)
+        self.self_counts = {'gui': {}, 'worker': {}}  # 栈顶函数 -> 采样数
+        self.sample_count = 0
+        self.stalls = []
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动采样线程"""
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止采样"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _stack(self, frame):
+        """调用栈（由外到内），每一帧为(文件名, 函数名, 行号)"""
+        stack = []
+        while frame is not None and len(stack) < self.MAX_DEPTH:
+            code = frame.f_code
+            stack.append((os.path.basename(code.co_filename), code.co_name, frame.f_lineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            with self.lock:
+                self.sample_count += 1
+                for ident, frame in frames.items():
+                    if ident == own_ident:
+                        continue
+                    stack = self._stack(frame)
+                    role = 'gui' if ident == self.main_ident else 'worker'
+                    if role == 'gui':
+                        self.main_samples.append((now, stack))
+                    if stack:
+                        leaf = f"{stack[-1][1]} ({stack[-1][0]})"
+                        counts = self.self_counts[role]
+                        counts[leaf] = counts.get(leaf, 0) + 1
+            del frames
+
+    def blocker_of(self, stack):
+        """卡顿归因：调用栈中最内层的本程序函数（跳过事件分发本身）"""
+        for filename, name, lineno in reversed(stack):
+            if filename == self.app_file and name not in ('notify', '<module>', '<lambda>'):
+                return name
+        return f"{stack[-1][1]} ({stack[-1][0]})" if stack else "未知（Qt内部）"
+
+    def record_stall(self, start, end, description, duration_ms=None, excluded=()):
+        """记录一次GUI线程卡顿，取期间出现最多的调用栈
+
+        excluded为不属于这次分发的时间段（嵌套事件循环的空闲等待和其中的分发），其间的采样不参与归因。
+        """
+        with self.lock:
+            stacks = [stack for t, stack in self.main_samples
+                      if start <= t <= end and not any(a <= t <= b for a, b in excluded)]
+        counts = {}
+        for stack in stacks:
+            counts[stack] = counts.get(stack, 0) + 1
+        stack = max(counts, key=counts.get) if counts else ()
+        self.stalls.append({
+            'time': time.time(),
+            'duration_ms': duration_ms if duration_ms is not None else (end - start) * 1000,
+            'event': description,
+            'blocker': self.blocker_of(stack),
+            'stack': stack,
+            'samples': len(stacks),
+        })
+
+    def report_text(self, top=15):
+        """生成文本报告"""
+        duration = time.time() - (self.started or time.time())
+        lines = [
+            "采样分析报告",
+            f"时间: {time.strftime('%Y-%m-%d %H:%M:%S')}",
+            f"会话时长: {duration:.1f}s，采样 {self.sample_count} 次（间隔 {self.interval * 1000:.0f}ms）",
+            f"GUI线程卡顿（>{self.stall_ms}ms）: {len(self.stalls)} 次，共 {sum(s['duration_ms'] for s in self.stalls):.0f}ms",
+            "",
+            "== 主要GUI阻塞函数（按卡顿总时长）==",
+        ]
+        blockers = {}
+        for stall in self.stalls:
+            entry = blockers.setdefault(stall['blocker'], [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += stall['duration_ms']
+            entry[2] = max(entry[2], stall['duration_ms'])
+        for name, (count, total, longest) in sorted(blockers.items(), key=lambda kv: kv[1][1], reverse=True)[:top]:
+            lines.append(f"{name:<40} {count:>5} 次  共 {total:>8.0f}ms  最长 {longest:>7.0f}ms")
+        lines += ["", "== 最长的卡顿 =="]
+        for stall in sorted(self.stalls, key=lambda s: s['duration_ms'], reverse=True)[:5]:
+            lines.append(f"{stall['duration_ms']:.0f}ms  {stall['event']}  -> {stall['blocker']}")
+            for filename, name, lineno in stall['stack'][-12:]:
+                lines.append(f"    {filename}:{lineno} {name}")
+        for role, title in (('gui', "GUI线程"), ('worker', "工作线程")):
+            lines += ["", f"== {title}热点函数（栈顶采样数）=="]
+            counts = self.self_counts[role]
+            for name, count in sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+                lines.append(f"{name:<50} {count:>7}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, folder="profile_reports"):
+        """写出本次会话的报告，返回文件路径"""
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"profile_{time.strftime('%Y%m%d_%H%M%S')}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.report_text())
+        return path
+
+
+class StallWatchdog(QObject):
+    """GUI线程卡顿看门狗
+
+    主线程用QTimer定时心跳，检查线程发现心跳超过阈值未更新时抓取主线程的Python调用栈；
+    心跳恢复后由主线程计算卡顿时长，写入滚动日志并发出stall_detected信号。
+    开销只有每100ms一次的定时器和一个休眠线程，默认常开。
+    """
+    stall_detected = pyqtSignal(dict)
+    HEARTBEAT_MS = 100
+
+    def __init__(self, threshold_ms=250, log_file="stall_watchdog.log", parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000.0
+        self.main_ident = threading.main_thread().ident
+        self.last_beat = time.perf_counter()
+        self.beat_count = 0
+        self.pending = None  # (心跳序号, 调用栈)：检查线程为当前卡顿抓取的栈
+        self.stalls = deque(maxlen=100)
+        self.stall_count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.logger = logging.getLogger("image_viewer.stall")
+        if log_file and not self.logger.handlers:
+            handler = RotatingFileHandler(log_file, maxBytes=1024 * 1024, backupCount=3, encoding='utf-8')
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.HEARTBEAT_MS)
+        self.timer.timeout.connect(self.heartbeat)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """开始心跳和检查"""
+        self.last_beat = time.perf_counter()
+        self.timer.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="StallWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止看门狗"""
+        self.timer.stop()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _watch(self):
+        """检查线程：心跳超时时抓取主线程调用栈（每次卡顿只抓一次）"""
+        while not self._stop.wait(self.HEARTBEAT_MS / 2000.0):
+            beat = self.beat_count
+            waited = time.perf_counter() - self.last_beat - self.HEARTBEAT_MS / 1000.0
+            if waited < self.threshold or (self.pending and self.pending[0] == beat):
+                continue
+            frame = sys._current_frames().get(self.main_ident)
+            stack = traceback.format_stack(frame)[-15:] if frame is not None else []
+            del frame
+            self.pending = (beat, stack)
+            self.logger.warning("GUI线程无响应已超过 %.0fms，主线程调用栈:\n%s", waited * 1000, "".join(stack))
+
+    def heartbeat(self):
+        """主线程心跳：与上次心跳的间隔超出定时周期的部分即为卡顿时长"""
+        now = time.perf_counter()
+        stall = now - self.last_beat - self.HEARTBEAT_MS / 1000.0
+        pending = self.pending
+        self.last_beat = now
+        self.beat_count += 1
+        if stall < self.threshold:
+            return
+        stack = pending[1] if pending and pending[0] == self.beat_count - 1 else []
+        self.pending = None
+        record = {'time': time.time(), 'duration_ms': stall * 1000, 'stack': stack, 'where': self.locate(stack)}
+        self.stalls.append(record)
+        self.stall_count += 1
+        self.total_ms += record['duration_ms']
+        self.max_ms = max(self.max_ms, record['duration_ms'])
+        self.logger.warning("GUI线程卡顿 %.0fms，位置: %s", record['duration_ms'], record['where'])
+        self.stall_detected.emit(record)
+
+    @staticmethod
+    def locate(stack):
+        """卡顿位置：调用栈中最内层的本程序代码行（如load_albums），没有时取栈顶"""
+        if not stack:
+            return "未抓取到调用栈"
+        app_file = os.path.basename(__file__)
+        for entry in reversed(stack):
+            if app_file in entry:
+                return entry.strip().splitlines()[0]
+        return stack[-1].strip().splitlines()[0]
+
+    def summary_text(self, recent=5):
+        """统计面板中显示的卡顿摘要"""
+        lines = [f"GUI卡顿（>{self.threshold * 1000:.0f}ms）: {self.stall_count} 次，"
+                 f"共 {self.total_ms:.0f}ms，最长 {self.max_ms:.0f}ms"]
+        for record in list(self.stalls)[-recent:]:
+            lines.append(f"  {time.strftime('%H:%M:%S', time.localtime(record['time']))} "
+                         f"{record['duration_ms']:.0f}ms  {record['where']}")
+        return "\n".join(lines)
+
+
+class ProfilingApplication(QApplication):
+    """分析模式下的QApplication：测量每层事件循环中事件分发的耗时，超过阈值时交给采样分析器归因
+
+    模态对话框、菜单等嵌套事件循环（exec()）中的空闲等待和分发的事件不计入外层分发：
+    空闲等待由事件分发器的aboutToBlock/awake信号得到，嵌套循环中的事件按各自的接收者单独计时。
+    同一层事件循环内的同步嵌套分发（sendEvent）计入外层。
+    """
+    def __init__(self, argv, profiler):
+        super().__init__(argv)
+        self.profiler = profiler
+        self._frames = []  # 正在计时的分发：[事件循环层级, 开始时间, 需扣除的时间段]
+        self._blocked_since = None
+        dispatcher = QAbstractEventDispatcher.instance()
+        dispatcher.aboutToBlock.connect(self._on_about_to_block)
+        dispatcher.awake.connect(self._on_awake)
+
+    def _on_about_to_block(self):
+        self._blocked_since = time.perf_counter()
+
+    def _on_awake(self):
+        # 分发进行中发生的等待只可能来自嵌套事件循环，记在最内层的分发上
+        if self._blocked_since is not None and self._frames:
+            self._frames[-1][2].append((self._blocked_since, time.perf_counter()))
+        self._blocked_since = None
+
+    @staticmethod
+    def covered(intervals):
+        """时间段并集的总长度（glib事件分发器在awake之前就会分发事件，等待与嵌套分发的时间段可能重叠）"""
+        total, reach = 0.0, None
+        for a, b in sorted(intervals):
+            if reach is None or a > reach:
+                total += b - a
+                reach = b
+            elif b > reach:
+                total += b - reach
+                reach = b
+        return total
+
+    def notify(self, receiver, event):
+        level = QThread.currentThread().loopLevel()
+        if self._frames and self._frames[-1][0] >= level:
+            return super().notify(receiver, event)
+        frame = [level, time.perf_counter(), []]
+        self._frames.append(frame)
+        try:
+            return super().notify(receiver, event)
+        finally:
+            self._frames.pop()
+            end = time.perf_counter()
+            _, start, excluded = frame
+            if self._frames:
+                self._frames[-1][2].append((start, end))
+            busy_ms = ((end - start) - self.covered(excluded)) * 1000
+            if busy_ms > self.profiler.stall_ms:
+                self.profiler.record_stall(start, end, f"{type(receiver).__name__}/{event.type().name}",
+                                           busy_ms, excluded)
+
+
+class ConfigManager(QObject):
+    """配置管理器，用于保存和加载用户设置
+
+    配置只在启动时读取一次并缓存在内存中；保存时先写临时文件再改名（原子写入），
+    并通过config_changed信号通知实际发生变化的配置项。
+    """
+    config_changed = pyqtSignal(dict)  # {配置项: 新值}
+
     def __init__(self):
+        super().__init__()
         self.config_file = "image_viewer_config.json"
         self.default_config = {
             'image_folder': "/Users/jiangjie/Downloads/img",
             'items_per_page': 9,
             'cache_size_gb': 1,
+            'similar_max_distance': 10,
+            'download_max_jobs': 3,
+            'download_global_kbps': 0,
+            'max_image_width': 0,
+            'perf_enabled': False,
+            'profile_enabled': False,
+            'stall_threshold_ms': 250,
+            'trash_retention_minutes': 30,
+            'trash_roots': [],  # 以前的图片文件夹中尚未清理完的回收区
+            'album_sort': 'time',
+            'probe_enabled': True,
+            'probe_min_kb': 10,
+            'probe_min_width': 200,
+            'probe_min_height': 200,
             'xpath_configs': []
         }
     
-    def load_config(self):
-        """加载配置文件"""
+        self._config = self.read_config_file()
+    
+    def read_config_file(self):
+        """从磁盘读取配置文件"""
         try:
             if os.path.exists(self.config_file):
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     config = json.load(f)
                     # 合并默认配置和用户配置
-                    merged_config = self.default_config.copy()
+                    merged_config = copy.deepcopy(self.default_config)
                     merged_config.update(config)
                     return merged_config
         except Exception as e:
             print(f"加载配置失败: {e}")
-        return self.default_config.copy()
+        return copy.deepcopy(self.default_config)
+    
+    def load_config(self):
+        """获取完整配置的副本（不读磁盘）"""
+        return copy.deepcopy(self._config)
+    
+    def reload(self):
+        """重新从磁盘读取配置（外部修改了配置文件时使用）"""
+        self._apply(self.read_config_file())
     
     def save_config(self, config):
         """保存配置文件"""
+        merged_config = copy.deepcopy(self.default_config)
+        merged_config.update(copy.deepcopy(config))
+        self._apply(merged_config, write=True)
+    
+    def _apply(self, new_config, write=False):
+        """替换内存中的配置，必要时落盘，并通知变化的配置项"""
+        changed = {key: value for key, value in new_config.items()
+                   if key not in self._config or self._config[key] != value}
+        self._config = new_config
+        if write:
+            self._write_file()
+        if changed:
+            self.config_changed.emit(copy.deepcopy(changed))
+    
+    def _write_file(self):
+        """原子写入：先写临时文件再改名，避免写到一半时程序退出导致配置损坏"""
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            tmp_file = self.config_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._config, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.config_file)
         except Exception as e:
             print(f"保存配置失败: {e}")
     
     def get(self, key, default=None):
         """获取配置项"""
-        config = self.load_config()
-        return config.get(key, default)
+        value = self._config.get(key, default)
+        return copy.deepcopy(value) if isinstance(value, (list, dict)) else value
     
     def set(self, key, value):
         """设置配置项"""
         config = self.load_config()
         config[key] = value
         self.save_config(config)
+    
+    def get_str(self, key, default=''):
+        value = self._config.get(key, default)
+        return value if isinstance(value, str) else default
+    
+    def get_int(self, key, default=0):
+        try:
+            return int(self._config.get(key, default))
+        except (TypeError, ValueError):
+            return default
+    
+    def get_float(self, key, default=0.0):
+        try:
+            return float(self._config.get(key, default))
+        except (TypeError, ValueError):
+            return default
+    
+    def get_bool(self, key, default=False):
+        value = self._config.get(key, default)
+        return value if isinstance(value, bool) else default
+    
+    def get_list(self, key, default=None):
+        value = self._config.get(key)
+        return copy.deepcopy(value) if isinstance(value, list) else (default if default is not None else [])
 
 
 class ConfigDialog(QDialog):
@@ -302,6 +817,104 @@ class ConfigDialog(QDialog):
         
         config_layout.addWidget(xpath_group)
         
+        # 下载限速区域
+        limit_group = QGroupBox("🌐 下载设置")
+        limit_group.setStyleSheet("""
+            QGroupBox {
+                font-weight: bold;
+                border: 2px solid #e0e0e0;
+                border-radius: 8px;
+                margin-top: 10px;
+                padding-top: 10px;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left: 10px;
+                padding: 0 5px 0 5px;
+            }
+        """)
+        limit_layout = QHBoxLayout(limit_group)
+        limit_layout.addWidget(QLabel("全局带宽上限:"))
+        self.global_kbps_spinbox = QSpinBox()
+        self.global_kbps_spinbox.setRange(0, 1000000)
+        self.global_kbps_spinbox.setSingleStep(256)
+        self.global_kbps_spinbox.setSuffix(" KB/s")
+        self.global_kbps_spinbox.setSpecialValueText("不限")
+        self.global_kbps_spinbox.setValue(self.current_config.get('download_global_kbps', 0))
+        limit_layout.addWidget(self.global_kbps_spinbox)
+        
+        # srcset/<picture>有多种分辨率时选择的最大宽度
+        limit_layout.addWidget(QLabel("图片最大宽度:"))
+        self.max_width_spinbox = QSpinBox()
+        self.max_width_spinbox.setRange(0, 20000)
+        self.max_width_spinbox.setSingleStep(100)
+        self.max_width_spinbox.setSuffix(" px")
+        self.max_width_spinbox.setSpecialValueText("最高分辨率")
+        self.max_width_spinbox.setValue(self.current_config.get('max_image_width', 0))
+        limit_layout.addWidget(self.max_width_spinbox)
+        limit_layout.addStretch()
+        config_layout.addWidget(limit_group)
+        
+        # 下载前预检：过滤小图和非图片资源
+        probe_group = QGroupBox("🔎 下载前预检")
+        probe_group.setStyleSheet(limit_group.styleSheet())
+        probe_layout = QHBoxLayout(probe_group)
+        self.probe_enabled_cb = QCheckBox("启用")
+        self.probe_enabled_cb.setChecked(self.current_config.get('probe_enabled', True))
+        probe_layout.addWidget(self.probe_enabled_cb)
+        probe_layout.addWidget(QLabel("最小文件:"))
+        self.probe_kb_spinbox = QSpinBox()
+        self.probe_kb_spinbox.setRange(0, 100000)
+        self.probe_kb_spinbox.setSuffix(" KB")
+        self.probe_kb_spinbox.setValue(self.current_config.get('probe_min_kb', 10))
+        probe_layout.addWidget(self.probe_kb_spinbox)
+        probe_layout.addWidget(QLabel("最小尺寸:"))
+        self.probe_width_spinbox = QSpinBox()
+        self.probe_width_spinbox.setRange(0, 20000)
+        self.probe_width_spinbox.setValue(self.current_config.get('probe_min_width', 200))
+        probe_layout.addWidget(self.probe_width_spinbox)
+        probe_layout.addWidget(QLabel("×"))
+        self.probe_height_spinbox = QSpinBox()
+        self.probe_height_spinbox.setRange(0, 20000)
+        self.probe_height_spinbox.setSuffix(" px")
+        self.probe_height_spinbox.setValue(self.current_config.get('probe_min_height', 200))
+        probe_layout.addWidget(self.probe_height_spinbox)
+        probe_layout.addStretch()
+        config_layout.addWidget(probe_group)
+        
+        # 性能统计
+        perf_group = QGroupBox("📊 性能统计")
+        perf_group.setStyleSheet(limit_group.styleSheet())
+        perf_layout = QVBoxLayout(perf_group)
+        perf_top_layout = QHBoxLayout()
+        self.perf_enabled_cb = QCheckBox("启用性能统计（F12显示浮层）")
+        self.perf_enabled_cb.setChecked(self.current_config.get('perf_enabled', False))
+        perf_top_layout.addWidget(self.perf_enabled_cb)
+        self.profile_enabled_cb = QCheckBox("采样分析（下次启动生效）")
+        self.profile_enabled_cb.setChecked(self.current_config.get('profile_enabled', False))
+        perf_top_layout.addWidget(self.profile_enabled_cb)
+        perf_top_layout.addStretch()
+        refresh_perf_btn = QPushButton("🔄 刷新")
+        refresh_perf_btn.setStyleSheet(Styles.BUTTON_SECONDARY)
+        refresh_perf_btn.clicked.connect(self.update_perf_display)
+        perf_top_layout.addWidget(refresh_perf_btn)
+        export_perf_btn = QPushButton("📤 导出Trace")
+        export_perf_btn.setStyleSheet(Styles.BUTTON_SECONDARY)
+        export_perf_btn.clicked.connect(self.export_perf_trace)
+        perf_top_layout.addWidget(export_perf_btn)
+        reset_perf_btn = QPushButton("🗑️ 清空")
+        reset_perf_btn.setStyleSheet(Styles.BUTTON_SECONDARY)
+        reset_perf_btn.clicked.connect(self.reset_perf_stats)
+        perf_top_layout.addWidget(reset_perf_btn)
+        perf_layout.addLayout(perf_top_layout)
+        self.perf_text = QPlainTextEdit()
+        self.perf_text.setReadOnly(True)
+        self.perf_text.setMinimumHeight(160)
+        self.perf_text.setStyleSheet("font-family: 'Courier New'; font-size: 12px;")
+        perf_layout.addWidget(self.perf_text)
+        config_layout.addWidget(perf_group)
+        self.update_perf_display()
+        
         config_layout.addStretch()
         config_scroll.setWidget(config_widget)
         main_layout.addWidget(config_scroll)
@@ -336,6 +949,14 @@ class ConfigDialog(QDialog):
         self.path_label.setText("当前路径: " + self.current_config.get('image_folder', ''))
         self.page_spinbox.setValue(self.current_config.get('items_per_page', 9))
         self.cache_slider.setValue(self.current_config.get('cache_size_gb', 1))
+        self.global_kbps_spinbox.setValue(self.current_config.get('download_global_kbps', 0))
+        self.max_width_spinbox.setValue(self.current_config.get('max_image_width', 0))
+        self.probe_enabled_cb.setChecked(self.current_config.get('probe_enabled', True))
+        self.probe_kb_spinbox.setValue(self.current_config.get('probe_min_kb', 10))
+        self.probe_width_spinbox.setValue(self.current_config.get('probe_min_width', 200))
+        self.probe_height_spinbox.setValue(self.current_config.get('probe_min_height', 200))
+        self.perf_enabled_cb.setChecked(self.current_config.get('perf_enabled', False))
+        self.profile_enabled_cb.setChecked(self.current_config.get('profile_enabled', False))
         self.update_cache_size_label()
         self.update_cache_usage_display()
         self.load_xpath_configs()
@@ -358,6 +979,31 @@ class ConfigDialog(QDialog):
         size_gb = self.cache_slider.value()
         self.cache_size_label.setText(f"{size_gb} GB")
     
+    def update_perf_display(self):
+        """刷新性能统计面板"""
+        text = perf_recorder.summary_text(limit=20)
+        parent_app = self.parent()
+        if hasattr(parent_app, 'pool_occupancy_text'):
+            text += "\n" + parent_app.pool_occupancy_text()
+        if hasattr(parent_app, 'stall_watchdog'):
+            text += "\n" + parent_app.stall_watchdog.summary_text()
+        self.perf_text.setPlainText(text)
+    
+    def export_perf_trace(self):
+        """导出Chrome trace-event JSON"""
+        path, _ = QFileDialog.getSaveFileName(self, "导出Trace", "perf_trace.json", "JSON (*.json)")
+        if path:
+            try:
+                count = perf_recorder.export_chrome_trace(path)
+                QMessageBox.information(self, "导出完成", f"已导出 {count} 个事件，可在chrome://tracing或Perfetto中打开")
+            except OSError as e:
+                QMessageBox.warning(self, "导出失败", str(e))
+    
+    def reset_perf_stats(self):
+        """清空性能统计"""
+        perf_recorder.reset()
+        self.update_perf_display()
+    
     def update_cache_usage_display(self):
         """更新缓存使用情况显示"""
         # 获取主应用的缓存信息
@@ -405,6 +1051,17 @@ class ConfigDialog(QDialog):
             domain = config.get('domain', '')
             xpath = config.get('xpath', '')
             item_text = f"域名: {domain}\nXPath: {xpath}"
+            limits = []
+            if config.get('max_rps'):
+                limits.append(f"{config['max_rps']:g} 请求/秒")
+            if config.get('max_kbps'):
+                limits.append(f"{config['max_kbps']} KB/s")
+            if limits:
+                item_text += "\n限速: " + "，".join(limits)
+            if config.get('streaming'):
+                item_text += "\n流式解析"
+            if config.get('next_page_xpath'):
+                item_text += f"\n下一页: {config['next_page_xpath']}（最多{config.get('max_pages', 10)}页）"
             item = QListWidgetItem(item_text)
             item.setData(Qt.ItemDataRole.UserRole, config)
             self.xpath_list.addItem(item)
@@ -421,7 +1078,11 @@ class ConfigDialog(QDialog):
         if dialog.exec() == QDialog.DialogCode.Accepted:
             domain, xpath = dialog.get_config()
             if domain and xpath:
-                new_config = {'domain': domain, 'xpath': xpath}
+                max_rps, max_kbps = dialog.get_limits()
+                next_page_xpath, max_pages = dialog.get_pagination()
+                new_config = {'domain': domain, 'xpath': xpath, 'max_rps': max_rps, 'max_kbps': max_kbps,
+                              'streaming': dialog.is_streaming(),
+                              'next_page_xpath': next_page_xpath, 'max_pages': max_pages}
                 xpath_configs = self.current_config.get('xpath_configs', [])
                 xpath_configs.append(new_config)
                 self.current_config['xpath_configs'] = xpath_configs
@@ -443,6 +1104,9 @@ class ConfigDialog(QDialog):
                 # 更新配置
                 config['domain'] = domain
                 config['xpath'] = xpath
+                config['max_rps'], config['max_kbps'] = dialog.get_limits()
+                config['streaming'] = dialog.is_streaming()
+                config['next_page_xpath'], config['max_pages'] = dialog.get_pagination()
                 self.load_xpath_configs()
     
     def delete_xpath_config(self):
@@ -471,7 +1135,7 @@ class ConfigDialog(QDialog):
     
     def reset_config(self):
         """重置配置"""
-        self.current_config = self.config_manager.default_config.copy()
+        self.current_config = copy.deepcopy(self.config_manager.default_config)
         self.load_current_config()
     
     def accept_config(self):
@@ -479,7 +1143,15 @@ class ConfigDialog(QDialog):
         # 更新配置
         self.current_config.update({
             'items_per_page': self.page_spinbox.value(),
-            'cache_size_gb': self.cache_slider.value()
+            'cache_size_gb': self.cache_slider.value(),
+            'download_global_kbps': self.global_kbps_spinbox.value(),
+            'max_image_width': self.max_width_spinbox.value(),
+            'probe_enabled': self.probe_enabled_cb.isChecked(),
+            'probe_min_kb': self.probe_kb_spinbox.value(),
+            'probe_min_width': self.probe_width_spinbox.value(),
+            'probe_min_height': self.probe_height_spinbox.value(),
+            'perf_enabled': self.perf_enabled_cb.isChecked(),
+            'profile_enabled': self.profile_enabled_cb.isChecked()
         })
         
         # 保存配置
@@ -564,6 +1236,36 @@ class XPathEditDialog(QDialog):
         """)
         form_layout.addRow("XPath:", self.xpath_edit)
         
+        # 该域名的下载限速（0表示不限）
+        self.rps_spinbox = QDoubleSpinBox()
+        self.rps_spinbox.setRange(0, 100)
+        self.rps_spinbox.setDecimals(1)
+        self.rps_spinbox.setSingleStep(0.5)
+        self.rps_spinbox.setSpecialValueText("不限")
+        form_layout.addRow("请求/秒:", self.rps_spinbox)
+        
+        self.kbps_spinbox = QSpinBox()
+        self.kbps_spinbox.setRange(0, 1000000)
+        self.kbps_spinbox.setSingleStep(256)
+        self.kbps_spinbox.setSuffix(" KB/s")
+        self.kbps_spinbox.setSpecialValueText("不限")
+        form_layout.addRow("带宽:", self.kbps_spinbox)
+        
+        # 超大页面使用流式解析
+        self.streaming_cb = QCheckBox("流式解析（适合数MB的超长页面，含位置或子元素条件的XPath自动改为整页解析）")
+        form_layout.addRow("", self.streaming_cb)
+        
+        # 多页图集：下一页链接的XPath和最多抓取的页数
+        self.next_page_edit = QLineEdit()
+        self.next_page_edit.setPlaceholderText("可选，例如: //a[@rel='next']/@href")
+        form_layout.addRow("下一页XPath:", self.next_page_edit)
+        
+        self.max_pages_spinbox = QSpinBox()
+        self.max_pages_spinbox.setRange(1, 500)
+        self.max_pages_spinbox.setValue(10)
+        self.max_pages_spinbox.setSuffix(" 页")
+        form_layout.addRow("最多页数:", self.max_pages_spinbox)
+        
         main_layout.addLayout(form_layout)
         
         # 说明文本
@@ -605,6 +1307,11 @@ class XPathEditDialog(QDialog):
         if self.config:
             self.domain_edit.setText(self.config.get('domain', ''))
             self.xpath_edit.setPlainText(self.config.get('xpath', ''))
+            self.rps_spinbox.setValue(self.config.get('max_rps', 0) or 0)
+            self.kbps_spinbox.setValue(self.config.get('max_kbps', 0) or 0)
+            self.streaming_cb.setChecked(bool(self.config.get('streaming', False)))
+            self.next_page_edit.setText(self.config.get('next_page_xpath', ''))
+            self.max_pages_spinbox.setValue(self.config.get('max_pages', 10) or 10)
     
     def get_config(self):
         """获取配置"""
@@ -612,6 +1319,18 @@ class XPathEditDialog(QDialog):
         xpath = self.xpath_edit.toPlainText().strip()
         return domain, xpath
     
+    def is_streaming(self):
+        """是否使用流式解析"""
+        return self.streaming_cb.isChecked()
+    
+    def get_limits(self):
+        """获取限速配置：(每秒请求数, 带宽KB/s)，0表示不限"""
+        return self.rps_spinbox.value(), self.kbps_spinbox.value()
+    
+    def get_pagination(self):
+        """获取分页配置：(下一页XPath, 最多页数)"""
+        return self.next_page_edit.text().strip(), self.max_pages_spinbox.value()
+    
     def accept_config(self):
         """接受配置"""
         domain, xpath = self.get_config()
@@ -627,48 +1346,718 @@ class XPathEditDialog(QDialog):
         self.accept()
 
 
+class HttpCache:
+    """磁盘HTTP缓存，保存网页正文和图片元数据（预检得到的类型、大小和尺寸）
+
+    遵循Cache-Control/Expires判断是否新鲜，过期后用ETag/Last-Modified发送条件请求，
+    服务器返回304时直接复用缓存。没有缓存指令的响应在recent_seconds内也直接复用，
+    避免重复复制同一网址时反复下载。
+    """
+    STORED_HEADERS = ('cache-control', 'expires', 'etag', 'last-modified', 'date',
+                      'content-type', 'content-length')
+
+    def __init__(self, cache_dir="http_cache", recent_seconds=60, max_age_days=7, max_entries=2000):
+        self.cache_dir = cache_dir
+        self.recent_seconds = recent_seconds
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.prune()
+
+    def _path(self, kind, url):
+        key = hashlib.sha1(f"{kind}:{url}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    @staticmethod
+    def parse_cache_control(value):
+        """解析Cache-Control为{指令: 值}"""
+        directives = {}
+        for part in (value or '').split(','):
+            name, _, arg = part.strip().partition('=')
+            if name:
+                directives[name.lower()] = arg.strip('"')
+        return directives
+
+    def lookup(self, kind, url):
+        """读取缓存元数据，不存在返回None"""
+        try:
+            with open(self._path(kind, url) + '.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read_body(self, kind, url):
+        try:
+            with open(self._path(kind, url) + '.body', 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def is_fresh(self, meta):
+        """根据Cache-Control/Expires（或最近访问时间）判断缓存是否可直接使用"""
+        headers = meta.get('headers', {})
+        directives = self.parse_cache_control(headers.get('cache-control'))
+        if 'no-cache' in directives or 'no-store' in directives:
+            return False
+        age = time.time() - meta.get('stored_at', 0)
+        if 'max-age' in directives:
+            try:
+                return age < int(directives['max-age'])
+            except ValueError:
+                return False
+        if headers.get('expires'):
+            try:
+                return time.time() < parsedate_to_datetime(headers['expires']).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return age < self.recent_seconds
+
+    @staticmethod
+    def validators(meta):
+        """条件请求头"""
+        headers = {}
+        if meta is None:
+            return headers
+        if meta['headers'].get('etag'):
+            headers['If-None-Match'] = meta['headers']['etag']
+        if meta['headers'].get('last-modified'):
+            headers['If-Modified-Since'] = meta['headers']['last-modified']
+        return headers
+
+    def store(self, kind, url, response, body=None, extra=None):
+        """写入缓存；Cache-Control: no-store的响应不缓存，extra为随缓存保存的解析结果"""
+        headers = {k.lower(): v for k, v in response.headers.items()
+                   if k.lower() in self.STORED_HEADERS}
+        if 'no-store' in self.parse_cache_control(headers.get('cache-control')):
+            return
+        meta = {
+            'url': url,
+            'status': response.status_code,
+            'stored_at': time.time(),
+            'encoding': response.encoding if body is not None else None,
+            'headers': headers,
+        }
+        if extra is not None:
+            meta['extra'] = extra
+        path = self._path(kind, url)
+        try:
+            if body is not None:
+                with open(path + '.body.tmp', 'wb') as f:
+                    f.write(body)
+                os.replace(path + '.body.tmp', path + '.body')
+            self._write_meta(path, meta)
+        except OSError as e:
+            print(f"写入HTTP缓存失败: {e}")
+
+    def revalidated(self, kind, url, meta, response):
+        """304响应：更新缓存头和存储时间"""
+        for k, v in response.headers.items():
+            if k.lower() in self.STORED_HEADERS and k.lower() not in ('content-length', 'content-type'):
+                meta['headers'][k.lower()] = v
+        meta['stored_at'] = time.time()
+        try:
+            self._write_meta(self._path(kind, url), meta)
+        except OSError as e:
+            print(f"写入HTTP缓存失败: {e}")
+
+    @staticmethod
+    def _write_meta(path, meta):
+        with open(path + '.json.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(path + '.json.tmp', path + '.json')
+
+    def prune(self):
+        """清理过旧的缓存，并把条目数限制在max_entries以内"""
+        try:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.json'):
+                    entries.append((entry.stat().st_mtime, entry.path[:-len('.json')]))
+            entries.sort(reverse=True)
+            cutoff = time.time() - self.max_age_days * 86400
+            for i, (mtime, path) in enumerate(entries):
+                if i >= self.max_entries or mtime < cutoff:
+                    for suffix in ('.json', '.body'):
+                        if os.path.exists(path + suffix):
+                            os.remove(path + suffix)
+        except OSError as e:
+            print(f"清理HTTP缓存失败: {e}")
+
+
+class DomainMatcher:
+    """按主机名匹配xpath配置：以反转的域名标签构建的后缀字典树
+
+    配置的域名匹配其自身及所有子域名（sspai.com 匹配 cdn.sspai.com，但不匹配
+    notsspai.com 或查询参数中出现的 sspai.com），多个配置命中时取最长的域名。
+    查找只需按主机名标签走一遍树，耗时与配置数量无关；同一域名可配置多条XPath。
+    """
+    def __init__(self, xpath_configs=()):
+        self.root = {}
+        for config in xpath_configs:
+            self.add(config)
+
+    @staticmethod
+    def normalize(domain):
+        """规范化配置中的域名：去掉协议、路径、端口和通配符前缀"""
+        domain = (domain or '').strip().lower()
+        if '://' in domain:
+            domain = urlparse(domain).hostname or ''
+        domain = domain.split('/')[0].split(':')[0]
+        if domain.startswith('*.'):
+            domain = domain[2:]
+        return domain.strip('.')
+
+    def add(self, config):
+        domain = self.normalize(config.get('domain', ''))
+        if not domain:
+            return
+        node = self.root
+        for label in reversed(domain.split('.')):
+            node = node.setdefault(label, {})
+        # 用None作为存放配置列表的键，不会与域名标签冲突
+        node.setdefault(None, []).append(config)
+
+    def match(self, url):
+        """返回与URL主机名匹配的配置列表（最长匹配的域名），无匹配返回空列表"""
+        host = (urlparse(url).hostname or '').rstrip('.')
+        node = self.root
+        matched = []
+        for label in reversed(host.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            matched = node.get(None, matched)
+        return list(matched)
+
+
 class WebScraper:
     """网页抓取器"""
-    def __init__(self):
+    STREAM_CHUNK_SIZE = 64 * 1024
+    # 可流式匹配的XPath步骤：//标签[属性谓词] 或 /标签[属性谓词]，末尾可选 /@属性
+    STREAM_STEP_RE = re.compile(r'(//?)([A-Za-z_][\w-]*|\*)((?:\[[^\[\]]*\])*)')
+    STREAM_ATTR_RE = re.compile(r'/@([A-Za-z_][\w-]*|\*)$')
+    # 流式谓词中允许出现的函数和运算符
+    STREAM_PREDICATE_FUNCS = {'and', 'or', 'not', 'div', 'mod', 'contains', 'starts-with',
+                              'normalize-space', 'concat', 'translate', 'string-length'}
+    # XPath结果为这些属性时，按所属元素的srcset重新选择分辨率
+    IMAGE_ATTRS = ('src', 'data-src', 'srcset', 'data-srcset', 'data-original', 'data-lazy-src')
+    def __init__(self, http_cache=None, max_image_width=0):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        self.http_cache = http_cache
+        # srcset选择的最大宽度（像素），0表示取最高分辨率
+        self.max_image_width = max_image_width
+        # 编译后的XPath缓存：(域名, XPath) -> etree.XPath
+        self._xpath_cache = {}
+        # lxml解析器不能跨线程共享，每个线程复用自己的解析器
+        self._local = threading.local()
+    
+    @property
+    def html_parser(self):
+        """当前线程复用的HTML解析器"""
+        parser = getattr(self._local, 'parser', None)
+        if parser is None:
+            parser = self._local.parser = lxml.html.HTMLParser()
+        return parser
+    
+    def compile_xpath(self, xpath, domain=None):
+        """按域名缓存编译后的XPath，避免每次调用重新编译"""
+        key = (domain, xpath)
+        compiled = self._xpath_cache.get(key)
+        if compiled is None:
+            compiled = self._xpath_cache[key] = etree.XPath(xpath)
+        return compiled
     
     def get_webpage_content(self, url):
-        """获取网页内容"""
+        """获取网页内容（优先使用缓存，过期时发送条件请求）"""
         try:
-            response = self.session.get(url, timeout=10)
+            cache = self.http_cache
+            meta = cache.lookup('page', url) if cache else None
+            if meta is not None:
+                body = cache.read_body('page', url)
+                if body is None:
+                    meta = None
+                elif cache.is_fresh(meta):
+                    return body.decode(meta.get('encoding') or 'utf-8', errors='replace')
+            
+            response = self.session.get(url, timeout=10, headers=HttpCache.validators(meta))
+            if response.status_code == 304 and meta is not None:
+                cache.revalidated('page', url, meta, response)
+                return body.decode(meta.get('encoding') or 'utf-8', errors='replace')
             response.raise_for_status()
+            if cache:
+                # 没有声明编码时使用requests推测的编码，保证缓存可按相同编码解码
+                if response.encoding is None or 'charset' not in response.headers.get('content-type', ''):
+                    response.encoding = response.apparent_encoding
+                cache.store('page', url, response, response.content)
             return response.text
         except Exception as e:
             print(f"获取网页内容失败: {e}")
             return None
     
-    def extract_images_by_xpath(self, html_content, xpath):
-        """根据XPath提取图片URL"""
+    def extract_images_by_xpath(self, html_content, xpath, domain=None):
+        """根据XPath提取图片URL（按文档顺序去重）"""
         try:
-            doc = lxml.html.fromstring(html_content)
-            elements = doc.xpath(xpath)
+            doc = lxml.html.fromstring(html_content, parser=self.html_parser)
+            elements = self.compile_xpath(xpath, domain)(doc)
             
             image_urls = []
             for element in elements:
-                if isinstance(element, str):
-                    image_urls.append(element)
-                else:
-                    # 如果是元素，获取其文本内容或属性
-                    if hasattr(element, 'text') and element.text:
-                        image_urls.append(element.text.strip())
-                    elif hasattr(element, 'get'):
-                        # 尝试获取src属性
-                        src = element.get('src') or element.get('data-src') or element.get('href')
-                        if src:
-                            image_urls.append(src.strip())
+                image_url = self.element_to_url(element, self.max_image_width)
+                if image_url:
+                    image_urls.append(image_url)
             
-            return list(set(image_urls))  # 去重
+            return list(dict.fromkeys(image_urls))  # 保持文档顺序去重
         except Exception as e:
             print(f"XPath提取失败: {e}")
             return []
+    
+    def extract_images(self, url, xpath_configs, html_content=None, on_batch=None):
+        """用同一域名下的多条XPath提取图片，按配置和文档顺序合并去重
+
+        on_batch(新发现的URL列表)在每批结果可用时立即调用，流式模式下在网页下载完成前就开始回调。
+        网页下载失败时只跳过需要整页内容的配置，已提取到的结果照常返回。
+        """
+        image_urls, seen = [], set()
+        page_failed = False
+        def add(batch):
+            new_urls = [u for u in dict.fromkeys(batch) if u not in seen]
+            seen.update(new_urls)
+            image_urls.extend(new_urls)
+            if on_batch is not None and new_urls:
+                on_batch(new_urls)
+        
+        for xpath_config in xpath_configs:
+            xpath = xpath_config.get('xpath', '')
+            domain = xpath_config.get('domain')
+            if not xpath:
+                continue
+            if xpath_config.get('streaming') and html_content is None:
+                # 流式模式：边下载边提取
+                for batch in self.iter_images_streaming(url, xpath, domain):
+                    add(batch)
+                continue
+            if page_failed:
+                continue
+            if html_content is None:
+                # 获取网页内容（多条XPath共用一次下载）
+                html_content = self.get_webpage_content(url)
+                if not html_content:
+                    html_content = None
+                    page_failed = True
+                    continue
+            add(self.extract_images_by_xpath(html_content, xpath, domain))
+        return image_urls
+    
+    def extract_next_pages(self, html_content, xpath_configs):
+        """根据配置的"下一页"XPath提取分页链接（按文档顺序去重）"""
+        next_urls = []
+        try:
+            doc = None
+            for xpath_config in xpath_configs:
+                next_xpath = xpath_config.get('next_page_xpath', '')
+                if not next_xpath:
+                    continue
+                if doc is None:
+                    doc = lxml.html.fromstring(html_content, parser=self.html_parser)
+                for element in self.compile_xpath(next_xpath, xpath_config.get('domain'))(doc):
+                    # 链接元素优先取href，避免取到"下一页"这样的文本
+                    link = element if isinstance(element, str) else (element.get('href') if hasattr(element, 'get') else None)
+                    if link and link.strip():
+                        next_urls.append(link.strip())
+        except Exception as e:
+            print(f"分页XPath提取失败: {e}")
+        return list(dict.fromkeys(next_urls))
+    
+    @staticmethod
+    def parse_srcset(value):
+        """解析srcset，返回[(url, 宽度w或None, 像素密度x)]
+
+        URL本身可能含逗号（如CDN的裁剪参数），因此按HTML规范以空白切分URL，
+        只有描述符之后的逗号才是候选项分隔符。
+        """
+        candidates = []
+        pos, length = 0, len(value or '')
+        while pos < length:
+            while pos < length and (value[pos].isspace() or value[pos] == ','):
+                pos += 1
+            start = pos
+            while pos < length and not value[pos].isspace():
+                pos += 1
+            url = value[start:pos]
+            descriptors = ''
+            if url.endswith(','):
+                url = url.rstrip(',')
+            else:
+                end = value.find(',', pos)
+                end = length if end == -1 else end
+                descriptors, pos = value[pos:end], end + 1
+            if not url:
+                continue
+            width, density = None, 1.0
+            for descriptor in descriptors.split():
+                try:
+                    if descriptor.endswith('w'):
+                        width = int(descriptor[:-1])
+                    elif descriptor.endswith('x'):
+                        density = float(descriptor[:-1])
+                except ValueError:
+                    pass
+            candidates.append((url, width, density))
+        return candidates
+    
+    @staticmethod
+    def pick_rendition(candidates, max_width=0):
+        """从srcset候选中选择分辨率最高的一项；max_width>0时选不超过该宽度的最大一项
+
+        所有带宽度的候选都超过上限时取最小的一项；只有像素密度描述符时无法得知宽度，取密度最高的一项。
+        """
+        with_width = [c for c in candidates if c[1]]
+        if with_width:
+            if max_width > 0:
+                fitting = [c for c in with_width if c[1] <= max_width]
+                return max(fitting, key=lambda c: c[1])[0] if fitting else min(with_width, key=lambda c: c[1])[0]
+            return max(with_width, key=lambda c: c[1])[0]
+        if candidates:
+            return max(candidates, key=lambda c: c[2])[0]
+        return None
+    
+    @staticmethod
+    def best_image_source(element, max_width=0):
+        """<img>/<source>/<picture>元素的最佳图片地址：srcset候选 > data-src等懒加载属性 > src"""
+        # libxml2不认识<source>是空元素，<img>会被嵌套进<source>中，因此向上查找<picture>
+        picture = element if element.tag == 'picture' else next(element.iterancestors('picture'), None)
+        sources = list(picture.iter('source', 'img')) if picture is not None else [element]
+        candidates = []
+        for source in sources:
+            for attr in ('srcset', 'data-srcset'):
+                candidates.extend(WebScraper.parse_srcset(source.get(attr)))
+        best = WebScraper.pick_rendition(candidates, max_width)
+        if best:
+            return best
+        for source in sources:
+            # 懒加载页面的src通常是占位图（data:URI或1像素gif），真实地址在data-*属性中
+            for attr in ('data-src', 'data-original', 'data-lazy-src', 'src'):
+                src = (source.get(attr) or '').strip()
+                if src and not src.startswith('data:'):
+                    return src
+        return None
+    
+    @staticmethod
+    def element_to_url(element, max_width=0):
+        """把XPath结果（字符串或元素）转换为图片URL"""
+        if isinstance(element, str):
+            # XPath取的是图片属性（如//img/@src）时，回到所属元素选择最高分辨率
+            parent = element.getparent() if getattr(element, 'attrname', None) in WebScraper.IMAGE_ATTRS else None
+            if parent is not None and parent.tag in ('img', 'source'):
+                return WebScraper.best_image_source(parent, max_width) or element
+            return element
+        if getattr(element, 'tag', None) in ('img', 'source', 'picture'):
+            return WebScraper.best_image_source(element, max_width)
+        # 如果是元素，获取其文本内容或属性
+        if hasattr(element, 'text') and element.text:
+            return element.text.strip()
+        elif hasattr(element, 'get'):
+            # 尝试获取src属性
+            src = element.get('src') or element.get('data-src') or element.get('href')
+            if src:
+                return src.strip()
+        return None
+    
+    @classmethod
+    def stream_predicate_ok(cls, predicate):
+        """谓词只引用所在元素的属性时才能在流式解析中判断（不能含位置、子元素、文本或其他轴）"""
+        bare = re.sub(r'"[^"]*"|\'[^\']*\'', '""', predicate)
+        if '@' not in bare or any(c in bare for c in '/.:$|'):
+            return False
+        for match in re.finditer(r'(@?)([A-Za-z_][\w-]*)', bare):
+            if not match.group(1) and match.group(2) not in cls.STREAM_PREDICATE_FUNCS:
+                return False
+        return True
+    
+    def compile_stream_xpath(self, xpath, domain=None):
+        """把XPath改写为以目标元素为上下文的形式，返回(目标标签或None, 编译后的XPath)；不能流式匹配时返回None
+
+        //div[@class="g"]//img/@src 改写为 self::img[ancestor::div[@class="g"]]/@src，
+        在img的end事件上计算：此时img已完整解析，祖先的开始标签和属性也都已读到，结果与整页解析一致。
+        只支持由//或/连接、谓词只引用属性的步骤，可选以/@属性结尾。
+        """
+        key = ('stream', domain, xpath)
+        if key in self._xpath_cache:
+            return self._xpath_cache[key]
+        text = xpath.strip()
+        attr = self.STREAM_ATTR_RE.search(text)
+        if attr:
+            text = text[:attr.start()]
+        steps, pos = [], 0
+        while pos < len(text):
+            match = self.STREAM_STEP_RE.match(text, pos)
+            if not match:
+                steps = None
+                break
+            steps.append(match.groups())
+            pos = match.end()
+        compiled = None
+        if steps and steps[0][0] == '//' and all(
+                self.stream_predicate_ok(p) for _, _, preds in steps for p in re.findall(r'\[([^\[\]]*)\]', preds)):
+            expr = ''
+            for sep, tag, preds in steps:
+                axis = 'parent' if sep == '/' else 'ancestor'
+                expr = f"{tag}{preds}" + (f"[{axis}::{expr}]" if expr else '')
+            try:
+                compiled = (None if tag == '*' else tag,
+                            etree.XPath('self::' + expr + (f"/@{attr.group(1)}" if attr else '')))
+            except etree.XPathError:
+                compiled = None
+        self._xpath_cache[key] = compiled
+        return compiled
+    
+    def iter_images_streaming(self, url, xpath, domain=None):
+        """边下载边解析的提取模式，适合数MB的超长页面，逐批产出新发现的图片URL
+
+        XPath先改写为以目标元素为上下文的形式（见compile_stream_xpath），网页分块送入lxml的增量解析器，
+        只在目标标签的end事件上对该元素计算一次，总开销与页面大小成线性。
+        处理过的元素随即清空并删除前面的兄弟节点（<picture>内部保留到<picture>结束，供srcset选择），
+        峰值内存不随页面大小增长，第一批结果在下载完成前即可返回。
+        无法改写的XPath（位置谓词、依赖子元素的条件、并集等）回退为整页解析；流式模式不经过HTTP缓存。
+        请求失败（超时、4xx/5xx、连接中断）时与整页模式一样打印错误并结束，已产出的批次保留。
+        """
+        stream = self.compile_stream_xpath(xpath, domain)
+        if stream is None:
+            print(f"XPath无法流式匹配，改为整页解析: {xpath}")
+            html_content = self.get_webpage_content(url)
+            image_urls = self.extract_images_by_xpath(html_content, xpath, domain) if html_content else []
+            if image_urls:
+                yield image_urls
+            return
+        tag, compiled = stream
+        seen = set()
+        try:
+            response = self.session.get(url, timeout=10, stream=True)
+            with response:
+                response.raise_for_status()
+                encoding = response.encoding if 'charset' in response.headers.get('content-type', '') else None
+                parser = etree.HTMLPullParser(events=('end',), encoding=encoding)
+                for chunk in response.iter_content(chunk_size=self.STREAM_CHUNK_SIZE):
+                    parser.feed(chunk)
+                    batch = self._drain_stream(parser, tag, compiled, seen)
+                    if batch:
+                        yield batch
+                parser.close()
+                batch = self._drain_stream(parser, tag, compiled, seen)
+                if batch:
+                    yield batch
+        except requests.RequestException as e:
+            print(f"流式获取网页内容失败: {e}")
+    
+    def _drain_stream(self, parser, tag, compiled, seen):
+        """处理增量解析器的end事件：在目标元素上计算XPath，随后释放已处理的节点"""
+        batch = []
+        for _, element in parser.read_events():
+            if tag is None or element.tag == tag:
+                for result in compiled(element):
+                    image_url = self.element_to_url(result, self.max_image_width)
+                    if image_url and image_url not in seen:
+                        seen.add(image_url)
+                        batch.append(image_url)
+            if next(element.iterancestors('picture'), None) is not None:
+                continue
+            element.clear(keep_tail=True)
+            parent = element.getparent()
+            while element.getprevious() is not None:
+                del parent[0]
+        return batch
+
+
+class GalleryCrawler:
+    """多页图集抓取器：沿"下一页"链接抓取后续页面并合并图片
+
+    已发现的页面并发抓取，但结果按发现顺序依次处理，因此分页链接的去重和最终图片顺序
+    与页面完成先后无关：第1页的图片在前，随后是第2页、第3页……
+    页面总数（含第一页）不超过配置的max_pages，同时在途请求不超过max_workers个。
+    """
+    def __init__(self, scraper, max_workers=4):
+        self.scraper = scraper
+        self.max_workers = max_workers
+    
+    @staticmethod
+    def page_limit(xpath_configs):
+        """分页上限：取配置了下一页XPath的各条配置中max_pages的最大值，未配置分页时为1"""
+        limits = [max(1, int(c.get('max_pages', 10) or 1)) for c in xpath_configs if c.get('next_page_xpath')]
+        return max(limits) if limits else 1
+    
+    @staticmethod
+    def normalize_page_url(url):
+        """用于去重的页面地址（忽略#片段）"""
+        return urldefrag(url)[0]
+    
+    def fetch_page(self, page_url, xpath_configs):
+        """抓取单个页面，返回(绝对地址的图片列表, 绝对地址的下一页列表)"""
+        html_content = self.scraper.get_webpage_content(page_url)
+        if not html_content:
+            return [], []
+        image_urls = self.scraper.extract_images(page_url, xpath_configs, html_content=html_content)
+        next_urls = self.scraper.extract_next_pages(html_content, xpath_configs)
+        # 后续页面的相对地址要相对各自页面解析，不能交给下载器按首页解析
+        return ([urljoin(page_url, u) for u in image_urls],
+                [urljoin(page_url, u) for u in next_urls])
+    
+    def crawl(self, url, xpath_configs, on_batch=None, cancel_token=None):
+        """从url开始抓取全部分页，返回按页面顺序合并去重后的图片URL
+
+        on_batch(新发现的URL列表)在每批结果可用时调用；cancel_token取消时在页面之间抛出DownloadCancelled。
+        """
+        max_pages = self.page_limit(xpath_configs)
+        if max_pages <= 1:
+            return self.scraper.extract_images(url, xpath_configs, on_batch=on_batch)
+        if any(c.get('streaming') for c in xpath_configs):
+            # 下一页链接需要在完整页面上提取，分页抓取时流式解析不生效
+            print(f"多页图集按整页解析，忽略流式解析设置: {url}")
+        
+        visited = {self.normalize_page_url(url)}
+        frontier = deque([url])  # 已发现但尚未提交的页面
+        in_flight = deque()      # 按发现顺序排列的(页面, Future)
+        image_urls, seen = [], set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while frontier or in_flight:
+                while frontier and len(in_flight) < self.max_workers:
+                    page_url = frontier.popleft()
+                    in_flight.append((page_url, executor.submit(self.fetch_page, page_url, xpath_configs)))
+                page_url, future = in_flight.popleft()
+                if cancel_token is not None and cancel_token.cancelled:
+                    for _, pending in in_flight:
+                        pending.cancel()
+                    raise DownloadCancelled()
+                try:
+                    page_images, next_urls = future.result()
+                except Exception as e:
+                    print(f"抓取分页失败 {page_url}: {e}")
+                    continue
+                new_images = [u for u in page_images if u not in seen]
+                seen.update(new_images)
+                image_urls.extend(new_images)
+                if on_batch is not None and new_images:
+                    on_batch(new_images)
+                for next_url in next_urls:
+                    if len(visited) >= max_pages:
+                        break
+                    key = self.normalize_page_url(next_url)
+                    if key not in visited and next_url.startswith(('http://', 'https://')):
+                        visited.add(key)
+                        frontier.append(next_url)
+        return image_urls
+
+
+class ImageProbe:
+    """下载前的预检：用Range请求只取图片开头几KB，过滤图标、跟踪像素、头像等小图和非图片资源
+
+    一次请求同时拿到Content-Type、总大小（Content-Range或Content-Length）和图片头，
+    用QImageReader从图片头读出真实尺寸。预检失败或信息不全时保留该图片，只丢弃确定不合格的。
+    预检结果作为图片元数据存入HttpCache：新鲜时不再请求，过期后用ETag/Last-Modified条件请求重新验证。
+    """
+    PROBE_BYTES = 16 * 1024
+    TIMEOUT = (5, 10)
+    
+    def __init__(self, scraper, rate_limiter=None, max_workers=8):
+        self.scraper = scraper
+        self.rate_limiter = rate_limiter
+        self.max_workers = max_workers
+        self.enabled = True
+        self.min_bytes = 0
+        self.min_width = 0
+        self.min_height = 0
+    
+    def configure(self, config):
+        """从配置读取阈值（0表示不限制）"""
+        self.enabled = bool(config.get('probe_enabled', True))
+        self.min_bytes = int(config.get('probe_min_kb', 0) or 0) * 1024
+        self.min_width = int(config.get('probe_min_width', 0) or 0)
+        self.min_height = int(config.get('probe_min_height', 0) or 0)
+    
+    @staticmethod
+    def total_size(response):
+        """资源总大小：206响应取Content-Range中的总长度，200响应取Content-Length"""
+        content_range = response.headers.get('content-range', '')
+        if response.status_code == 206 and '/' in content_range:
+            total = content_range.rsplit('/', 1)[1].strip()
+            return int(total) if total.isdigit() else None
+        length = response.headers.get('content-length', '')
+        return int(length) if length.isdigit() else None
+    
+    @staticmethod
+    def read_dimensions(data):
+        """从图片头读取(宽, 高)，头部不完整时返回None"""
+        buffer = QBuffer()
+        buffer.setData(QByteArray(data))
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        size = QImageReader(buffer).size()
+        buffer.close()
+        return (size.width(), size.height()) if size.isValid() else None
+    
+    def evaluate(self, info):
+        """根据图片元数据判断是否保留，返回{'keep': bool, 'reason': str, 'content_type', 'size', 'dimensions'}"""
+        result = {'keep': True, 'reason': '', 'content_type': info.get('content_type', ''),
+                  'size': info.get('size'), 'dimensions': info.get('dimensions')}
+        content_type, dimensions = result['content_type'], result['dimensions']
+        if content_type and not content_type.startswith('image/') and content_type != 'application/octet-stream':
+            result.update(keep=False, reason='非图片')
+        elif self.min_bytes and result['size'] is not None and result['size'] < self.min_bytes:
+            result.update(keep=False, reason='文件太小')
+        elif dimensions and (dimensions[0] < self.min_width or dimensions[1] < self.min_height):
+            result.update(keep=False, reason='尺寸太小')
+        return result
+    
+    def probe(self, url, cancel_token=None):
+        """预检单张图片（优先使用缓存的图片元数据），返回evaluate()的结果"""
+        cache = self.scraper.http_cache
+        meta = cache.lookup('head', url) if cache else None
+        cached = meta.get('extra') if meta else None
+        if cached is not None and cache.is_fresh(meta):
+            return self.evaluate(cached)
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        headers = {'Range': f"bytes=0-{self.PROBE_BYTES - 1}"}
+        if cached is not None:
+            headers.update(HttpCache.validators(meta))
+        try:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire_request(self.rate_limiter.domain_for_url(url), cancel_token)
+            response = self.scraper.session.get(url, timeout=self.TIMEOUT, stream=True, headers=headers)
+            with response:
+                if response.status_code == 304 and cached is not None:
+                    cache.revalidated('head', url, meta, response)
+                    return self.evaluate(cached)
+                response.raise_for_status()
+                content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+                size = self.total_size(response)
+                head = b''
+                for chunk in response.iter_content(chunk_size=self.PROBE_BYTES):
+                    head += chunk
+                    if len(head) >= self.PROBE_BYTES:
+                        break
+        except DownloadCancelled:
+            raise
+        except Exception as e:
+            print(f"预检失败 {url}: {e}")
+            return self.evaluate({})
+        
+        dimensions = self.read_dimensions(head[:self.PROBE_BYTES])
+        info = {'content_type': content_type, 'size': size, 'dimensions': list(dimensions) if dimensions else None}
+        if cache:
+            cache.store('head', url, response, extra=info)
+        return self.evaluate(info)
+    
+    def filter(self, image_urls, base_url="", cancel_token=None):
+        """并发预检，返回(保留的URL列表（保持原顺序）, 被过滤的数量)；取消时抛出DownloadCancelled"""
+        if not self.enabled or not image_urls:
+            return list(image_urls), 0
+        absolute_urls = [urljoin(base_url, u) for u in image_urls]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(lambda u: self.probe(u, cancel_token), absolute_urls))
+        kept = [u for u, r in zip(image_urls, results) if r['keep']]
+        return kept, len(image_urls) - len(kept)
 
 
 class ImageDownloader:
@@ -699,23 +2088,10 @@ class ImageDownloader:
                 response = self.session.get(url, timeout=30)
                 response.raise_for_status()
                 
-                # 获取文件扩展名
-                parsed_url = urlparse(url)
-                filename = os.path.basename(parsed_url.path)
-                if not filename or '.' not in filename:
-                    # 根据Content-Type确定扩展名
-                    content_type = response.headers.get('content-type', '')
-                    if 'jpeg' in content_type or 'jpg' in content_type:
-                        ext = '.jpg'
-                    elif 'png' in content_type:
-                        ext = '.png'
-                    elif 'gif' in content_type:
-                        ext = '.gif'
-                    elif 'webp' in content_type:
-                        ext = '.webp'
-                    else:
-                        ext = '.jpg'  # 默认
-                    filename = f"image_{i+1}{ext}"
+                # 生成唯一且有序的文件名
+                filename = ImageDownloadWorker.make_filename(
+                    i, len(image_urls), hashlib.sha1(response.content).hexdigest(), url,
+                    response.headers.get('content-type', ''))
                 
                 # 保存文件
                 file_path = os.path.join(download_folder, filename)
@@ -756,10 +2132,11 @@ class ClipboardMonitor(QObject):
 
 class DownloadConfirmDialog(QDialog):
     """下载确认对话框"""
-    def __init__(self, url, image_count, parent=None):
+    def __init__(self, url, image_count, parent=None, filtered_count=0):
         super().__init__(parent)
         self.url = url
         self.image_count = image_count
+        self.filtered_count = filtered_count
         self.setup_ui()
     
     def setup_ui(self):
@@ -795,8 +2172,10 @@ class DownloadConfirmDialog(QDialog):
         info_text = f"""
         <p><b>网页地址:</b> {self.url}</p>
         <p><b>发现图片数量:</b> {self.image_count} 张</p>
-        <p>是否要下载这些图片到配置的文件夹中？</p>
         """
+        if self.filtered_count:
+            info_text += f"<p><b>已过滤:</b> {self.filtered_count} 张（小图或非图片）</p>"
+        info_text += "<p>是否要下载这些图片到配置的文件夹中？</p>"
         
         info_label = QLabel(info_text)
         info_label.setStyleSheet("""
@@ -851,131 +2230,646 @@ class DownloadConfirmDialog(QDialog):
         return self.dont_ask_again_cb.isChecked()
 
 
-class DownloadProgressDialog(QDialog):
-    """下载进度对话框"""
-    def __init__(self, total_count, parent=None):
+class DownloadQueueDialog(QDialog):
+    """下载队列面板（非模态）"""
+    COLUMNS = ["网页", "状态", "进度", "速度", "剩余时间", "已下载", "失败"]
+
+    def __init__(self, download_queue, parent=None):
         super().__init__(parent)
-        self.total_count = total_count
+        self.download_queue = download_queue
         self.setup_ui()
-    
+        self.download_queue.job_updated.connect(self.refresh)
+        # 定时刷新速度和剩余时间
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
     def setup_ui(self):
         """设置UI"""
-        self.setWindowTitle("⬇️ 下载图片")
-        self.setModal(True)
-        self.resize(400, 200)
-        self.setWindowFlags(self.windowFlags() & ~Qt.WindowType.WindowCloseButtonHint)  # 禁用关闭按钮
-        
+        self.setWindowTitle("⬇️ 下载队列")
+        self.setModal(False)
+        self.resize(820, 360)
+
         # 主布局
         main_layout = QVBoxLayout(self)
-        main_layout.setSpacing(20)
+        main_layout.setSpacing(15)
         main_layout.setContentsMargins(20, 20, 20, 20)
-        
-        # 标题
-        title_label = QLabel("⬇️ 正在下载图片...")
-        title_label.setStyleSheet("""
-            QLabel {
-                font-size: 16px;
-                font-weight: bold;
-                color: #2c3e50;
-                padding: 10px;
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #667eea, stop:1 #764ba2);
-                color: white;
-                border-radius: 8px;
-                text-align: center;
-            }
-        """)
-        title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        main_layout.addWidget(title_label)
-        
-        # 进度条
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setRange(0, self.total_count)
-        self.progress_bar.setValue(0)
-        self.progress_bar.setStyleSheet("""
-            QProgressBar {
-                border: 2px solid #e0e0e0;
-                border-radius: 8px;
-                text-align: center;
-                font-weight: bold;
-                height: 25px;
-            }
-            QProgressBar::chunk {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #4fc3f7, stop:1 #29b6f6);
-                border-radius: 6px;
-            }
-        """)
-        main_layout.addWidget(self.progress_bar)
-        
-        # 状态标签
-        self.status_label = QLabel(f"准备下载 {self.total_count} 张图片...")
-        self.status_label.setStyleSheet("""
-            QLabel {
-                font-size: 14px;
-                color: #666;
-                padding: 8px;
-                text-align: center;
-            }
-        """)
-        self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        main_layout.addWidget(self.status_label)
-        
-        # 取消按钮
-        self.cancel_button = QPushButton("❌ 取消下载")
-        self.cancel_button.setStyleSheet(Styles.BUTTON_SECONDARY)
-        self.cancel_button.clicked.connect(self.cancel_download)
-        main_layout.addWidget(self.cancel_button)
-    
-    def update_progress(self, current, total):
-        """更新进度"""
-        self.progress_bar.setValue(current)
-        self.status_label.setText(f"已下载 {current}/{total} 张图片...")
-    
-    def cancel_download(self):
-        """取消下载"""
+
+        # 汇总信息
+        self.summary_label = QLabel()
+        self.summary_label.setStyleSheet(Styles.BADGE_BLUE)
+        main_layout.addWidget(self.summary_label)
+
+        # 任务表格
+        self.job_table = QTableWidget(0, len(self.COLUMNS))
+        self.job_table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.job_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.job_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.job_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.job_table.verticalHeader().setVisible(False)
+        self.job_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.job_table.itemSelectionChanged.connect(self.update_buttons)
+        main_layout.addWidget(self.job_table)
+
+        # 按钮区域
+        button_layout = QHBoxLayout()
+
+        self.cancel_job_btn = QPushButton("❌ 取消任务")
+        self.cancel_job_btn.setStyleSheet(Styles.BUTTON_DANGER)
+        self.cancel_job_btn.clicked.connect(self.cancel_selected_job)
+        button_layout.addWidget(self.cancel_job_btn)
+
+        self.retry_job_btn = QPushButton("🔄 重试失败项")
+        self.retry_job_btn.setStyleSheet(Styles.BUTTON_PRIMARY)
+        self.retry_job_btn.clicked.connect(self.retry_selected_job)
+        button_layout.addWidget(self.retry_job_btn)
+
+        button_layout.addStretch()
+
+        clear_button = QPushButton("🧹 清除已结束")
+        clear_button.setStyleSheet(Styles.BUTTON_SECONDARY)
+        clear_button.clicked.connect(self.download_queue.clear_finished)
+        button_layout.addWidget(clear_button)
+
+        close_button = QPushButton("关闭")
+        close_button.setStyleSheet(Styles.BUTTON_SECONDARY)
+        close_button.clicked.connect(self.hide)
+        button_layout.addWidget(close_button)
+
+        main_layout.addLayout(button_layout)
+        self.update_buttons()
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    @staticmethod
+    def format_bytes(size):
+        for unit in ("B", "KB", "MB", "GB"):
+            if size < 1024 or unit == "GB":
+                return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+            size /= 1024
+
+    @staticmethod
+    def format_seconds(seconds):
+        if seconds is None:
+            return "-"
+        seconds = int(seconds)
+        if seconds >= 3600:
+            return f"{seconds // 3600}时{seconds % 3600 // 60}分"
+        if seconds >= 60:
+            return f"{seconds // 60}分{seconds % 60}秒"
+        return f"{seconds}秒"
+
+    def selected_job_id(self):
+        rows = self.job_table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        item = self.job_table.item(rows[0].row(), 0)
+        return item.data(Qt.ItemDataRole.UserRole) if item else None
+
+    def refresh(self):
+        """刷新任务表格"""
+        if not self.isVisible():
+            return
+        selected = self.selected_job_id()
+        jobs = list(self.download_queue.jobs.values())
+        self.job_table.setRowCount(len(jobs))
+        total_speed = 0.0
+        for row, job in enumerate(jobs):
+            stats = self.download_queue.job_stats(job)
+            total_speed += stats['speed']
+            done = len(job['done'])
+            values = [
+                job['url'],
+                DownloadQueue.STATUS_TEXT.get(job['status'], job['status']),
+                f"{done}/{job['total']}",
+                f"{self.format_bytes(stats['speed'])}/s" if job['status'] == 'running' else "-",
+                self.format_seconds(stats['eta']) if job['status'] == 'running' else "-",
+                self.format_bytes(stats['bytes']),
+                str(len(job['failed'])),
+            ]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col == 0:
+                    item.setData(Qt.ItemDataRole.UserRole, job['id'])
+                    item.setToolTip(job['url'])
+                self.job_table.setItem(row, col, item)
+            if job['id'] == selected:
+                self.job_table.selectRow(row)
+        counts = self.download_queue.status_counts()
+        self.summary_label.setText(
+            f"进行中 {counts.get('running', 0)} · 等待 {counts.get('pending', 0)} · "
+            f"已完成 {counts.get('done', 0)} · 有失败 {counts.get('failed', 0)} · "
+            f"总速度 {self.format_bytes(total_speed)}/s")
+        self.update_buttons()
+
+    def update_buttons(self):
+        job = self.download_queue.jobs.get(self.selected_job_id())
+        self.cancel_job_btn.setEnabled(job is not None and job['status'] in ('pending', 'running'))
+        self.retry_job_btn.setEnabled(job is not None and bool(job['failed']) and job['status'] != 'running')
+
+    def cancel_selected_job(self):
+        job_id = self.selected_job_id()
+        if job_id is None:
+            return
         reply = QMessageBox.question(
-            self, 
-            "确认取消", 
-            "确定要取消下载吗？",
+            self,
+            "确认取消",
+            "确定要取消这个下载任务吗？",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
         if reply == QMessageBox.StandardButton.Yes:
-            self.reject()
+            self.download_queue.cancel(job_id)
+
+    def retry_selected_job(self):
+        job_id = self.selected_job_id()
+        if job_id is not None:
+            self.download_queue.retry_failed(job_id)
+
+
+class SimilarImagesDialog(QDialog):
+    """相似图片对话框"""
+    image_activated = pyqtSignal(str)
+
+    def __init__(self, source_path, results, parent=None):
+        super().__init__(parent)
+        self.source_path = source_path
+        self.results = results
+        self.setup_ui()
+
+    def setup_ui(self):
+        """设置UI"""
+        self.setWindowTitle("🔍 相似图片")
+        self.resize(600, 500)
+
+        main_layout = QVBoxLayout(self)
+        main_layout.setSpacing(15)
+        main_layout.setContentsMargins(20, 20, 20, 20)
+
+        info_label = QLabel(f"与 {os.path.basename(self.source_path)} 相似的图片: {len(self.results)} 张")
+        info_label.setStyleSheet(Styles.BADGE_BLUE)
+        info_label.setWordWrap(True)
+        main_layout.addWidget(info_label)
+
+        self.result_list = QListWidget()
+        self.result_list.setIconSize(QSize(64, 64))
+        for distance, path in self.results:
+            reader = QImageReader(path)
+            reader.setAutoTransform(True)
+            if reader.size().isValid():
+                reader.setScaledSize(reader.size().scaled(64, 64, Qt.AspectRatioMode.KeepAspectRatio))
+            icon = QIcon(QPixmap.fromImage(reader.read()))
+            item = QListWidgetItem(icon, f"距离 {distance}  ·  {os.path.basename(os.path.dirname(path))}/{os.path.basename(path)}")
+            item.setData(Qt.ItemDataRole.UserRole, path)
+            item.setToolTip(path)
+            self.result_list.addItem(item)
+        self.result_list.itemDoubleClicked.connect(self.on_item_double_clicked)
+        main_layout.addWidget(self.result_list)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        close_button = QPushButton("❌ 关闭")
+        close_button.setStyleSheet(Styles.BUTTON_SECONDARY)
+        close_button.clicked.connect(self.reject)
+        button_layout.addWidget(close_button)
+        main_layout.addLayout(button_layout)
+
+    def on_item_double_clicked(self, item):
+        """双击跳转到该图片"""
+        self.image_activated.emit(item.data(Qt.ItemDataRole.UserRole))
+        self.accept()
 
 
 class WorkerSignals(QObject):
     imageLoaded = pyqtSignal(int, QPixmap)
 
 
+class RetryPolicy:
+    """下载重试策略：带上限的指数退避 + 全抖动"""
+    RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=30.0, max_retry_after=120.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def backoff(self, attempt: int) -> float:
+        """第attempt次失败后的等待时间（秒）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def is_retryable_status(self, status: int) -> bool:
+        return status in self.RETRY_STATUS
+
+    def parse_retry_after(self, value):
+        """解析Retry-After头（秒数或HTTP日期），返回秒数或None"""
+        if not value:
+            return None
+        value = value.strip()
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+                seconds = retry_at.timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return max(0.0, min(seconds, self.max_retry_after))
+
+
+class HostCircuitBreaker:
+    """按主机的熔断器：连续失败或被限流时暂停对该主机的请求"""
+    def __init__(self, failure_threshold=5, cooldown=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._open_until = {}
+
+    def wait_time(self, host: str) -> float:
+        """该主机仍处于熔断状态的剩余秒数"""
+        with self._lock:
+            return max(0.0, self._open_until.get(host, 0.0) - time.monotonic())
+
+    def record_success(self, host: str):
+        with self._lock:
+            self._failures.pop(host, None)
+
+    def record_failure(self, host: str, retry_after=None):
+        """记录一次失败；服务器要求等待或连续失败过多时打开熔断"""
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            pause = 0.0
+            if retry_after is not None:
+                pause = retry_after
+            elif failures >= self.failure_threshold:
+                pause = self.cooldown
+            if pause > 0:
+                until = time.monotonic() + pause
+                self._open_until[host] = max(self._open_until.get(host, 0.0), until)
+                if retry_after is None:
+                    print(f"主机 {host} 连续失败 {failures} 次，暂停 {pause:.0f} 秒")
+
+
+class DownloadCancelled(Exception):
+    """下载已被取消"""
+
+
+class CancelToken:
+    """协作式取消令牌：取消时立即关闭已登记的在途HTTP连接"""
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._responses = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        """取消并中断所有在途传输"""
+        self._event.set()
+        with self._lock:
+            responses = list(self._responses)
+            self._responses.clear()
+        for response in responses:
+            self._abort(response)
+
+    def wait(self, timeout: float) -> bool:
+        """可被取消打断的等待，返回是否已取消"""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise DownloadCancelled()
+
+    def register(self, response):
+        """登记在途响应；若已取消则立即中断"""
+        with self._lock:
+            if not self._event.is_set():
+                self._responses.add(response)
+                return
+        self._abort(response)
+
+    def unregister(self, response):
+        with self._lock:
+            self._responses.discard(response)
+
+    @staticmethod
+    def _abort(response):
+        # 先shutdown套接字以唤醒阻塞在recv上的下载线程，再关闭响应
+        try:
+            sock = response.raw.connection.sock
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+        try:
+            response.close()
+        except Exception:
+            pass
+
+
+class TokenBucket:
+    """令牌桶（线程安全），允许预支令牌：取令牌的一方按欠额等待"""
+    def __init__(self, rate: float, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1.0))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """取走amount个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self, amount: float, cancel_token=None):
+        wait = self.reserve(amount)
+        if wait <= 0:
+            return
+        if cancel_token is not None:
+            if cancel_token.wait(wait):
+                raise DownloadCancelled()
+        else:
+            time.sleep(wait)
+
+
+class DownloadRateLimiter:
+    """按域名的请求频率/带宽限制，外加保护交互带宽的全局带宽上限
+
+    限速按下载任务来源网页所匹配的域名配置计算，同一任务的所有图片请求共用该域名的令牌桶。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.domain_limits = {}  # 域名 -> (每秒请求数, 每秒字节数)
+        self.matcher = DomainMatcher()
+        self.request_buckets = {}
+        self.byte_buckets = {}
+        self.global_bucket = None
+
+    @staticmethod
+    def _stricter(current, value):
+        """合并同一域名的多个限速值：取非零值中最小的（0表示不限）"""
+        if current <= 0:
+            return value
+        return min(current, value) if value > 0 else current
+
+    def configure(self, xpath_configs, global_kbps=0):
+        """根据配置重建令牌桶；限速未变化的域名保留原令牌桶状态
+
+        同一域名有多条XPath配置时，每项限速取各条配置中最严格的值，与配置顺序无关。
+        """
+        limits = {}
+        matcher = DomainMatcher()
+        for config in xpath_configs:
+            domain = DomainMatcher.normalize(config.get('domain', ''))
+            rps = float(config.get('max_rps', 0) or 0)
+            bps = float(config.get('max_kbps', 0) or 0) * 1024
+            if domain and (rps > 0 or bps > 0):
+                if domain in limits:
+                    old_rps, old_bps = limits[domain]
+                    rps, bps = self._stricter(old_rps, rps), self._stricter(old_bps, bps)
+                else:
+                    matcher.add({'domain': domain})
+                limits[domain] = (rps, bps)
+        with self._lock:
+            request_buckets = {}
+            byte_buckets = {}
+            for domain, (rps, bps) in limits.items():
+                old_rps, old_bps = self.domain_limits.get(domain, (0, 0))
+                if rps > 0:
+                    request_buckets[domain] = self.request_buckets[domain] if old_rps == rps else TokenBucket(rps)
+                if bps > 0:
+                    # 带宽桶容量为1秒的流量，允许小幅突发
+                    byte_buckets[domain] = self.byte_buckets[domain] if old_bps == bps else TokenBucket(bps)
+            self.request_buckets = request_buckets
+            self.byte_buckets = byte_buckets
+            self.domain_limits = limits
+            self.matcher = matcher
+            global_bps = float(global_kbps or 0) * 1024
+            if global_bps <= 0:
+                self.global_bucket = None
+            elif self.global_bucket is None or self.global_bucket.rate != global_bps:
+                self.global_bucket = TokenBucket(global_bps)
+
+    def domain_for_url(self, url):
+        """找到URL所属的已配置限速域名（主机名等于该域名或是其子域名）"""
+        matched = self.matcher.match(url)
+        return matched[0]['domain'] if matched else None
+
+    def acquire_request(self, domain, cancel_token=None):
+        bucket = self.request_buckets.get(domain) if domain else None
+        if bucket is not None:
+            bucket.acquire(1, cancel_token)
+
+    def acquire_bytes(self, domain, amount, cancel_token=None):
+        bucket = self.byte_buckets.get(domain) if domain else None
+        if bucket is not None:
+            bucket.acquire(amount, cancel_token)
+        global_bucket = self.global_bucket
+        if global_bucket is not None:
+            global_bucket.acquire(amount, cancel_token)
+
+
 class DownloadSignals(QObject):
     """图片下载信号"""
     progress = pyqtSignal(int, int)  # 当前进度, 总数
+    item_done = pyqtSignal(int, str)  # 完成的图片序号, 文件路径
+    failed = pyqtSignal(list)  # 下载失败的[(序号, URL)]列表
     finished = pyqtSignal(list)  # 下载完成的文件列表
+    cancelled = pyqtSignal(list)  # 取消前已完成的文件列表
     error = pyqtSignal(str)  # 错误信息
 
 
 class ImageDownloadWorker(QRunnable):
     """图片下载工作线程"""
-    def __init__(self, image_urls, download_folder, base_url="", original_url=""):
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.jfif')
+    CHUNK_SIZE = 16 * 1024
+    TIMEOUT = (5, 30)  # (连接超时, 读取超时)
+    def __init__(self, image_urls, download_folder, base_url="", original_url="",
+                 indices=None, total_count=None, retry_policy=None, circuit_breaker=None,
+                 rate_limiter=None):
         super().__init__()
         self.image_urls = image_urls
         self.download_folder = download_folder
         self.base_url = base_url
         self.original_url = original_url
+        # 图片在原图集中的序号（重试失败项时沿用原序号以保持文件名顺序）
+        self.indices = list(indices) if indices is not None else list(range(len(image_urls)))
+        self.total_count = total_count if total_count is not None else len(image_urls)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or HostCircuitBreaker()
+        self.rate_limiter = rate_limiter
+        # 限速按来源网页的域名配置
+        self.rate_domain = rate_limiter.domain_for_url(base_url) if rate_limiter else None
+        self.cancel_token = CancelToken()
+        self.bytes_received = 0  # 本次运行已接收的字节数，供队列面板统计速度
         self.signals = DownloadSignals()
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
     
+    @staticmethod
+    def make_album_folder(base_folder, url):
+        """创建相册文件夹：域名+时间戳，同一秒内的多个任务追加序号（并发创建时也不会重名）"""
+        domain = urlparse(url).netloc.replace('www.', '')
+        folder_name = f"{domain}_{int(time.time())}"
+        download_folder = os.path.join(base_folder, folder_name)
+        suffix = 2
+        while True:
+            try:
+                os.makedirs(download_folder)
+                return download_folder
+            except FileExistsError:
+                download_folder = os.path.join(base_folder, f"{folder_name}_{suffix}")
+                suffix += 1
+    
+    @staticmethod
+    def guess_extension(url, content_type):
+        """优先使用URL中的图片扩展名，否则根据Content-Type确定"""
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+        if ext in ImageDownloadWorker.IMAGE_EXTENSIONS:
+            return ext
+        content_type = content_type.lower()
+        if 'jpeg' in content_type or 'jpg' in content_type:
+            return '.jpg'
+        elif 'png' in content_type:
+            return '.png'
+        elif 'gif' in content_type:
+            return '.gif'
+        elif 'webp' in content_type:
+            return '.webp'
+        elif 'bmp' in content_type:
+            return '.bmp'
+        return '.jpg'  # 默认
+
+    @staticmethod
+    def make_filename(index, total, digest, url, content_type=''):
+        """生成文件名：零填充的下载序号 + 内容SHA-1前8位
+
+        序号保证同一次下载内文件名唯一且按图集原始顺序排序，无需逐个检查目录；
+        内容哈希让同一图片重复下载时得到相同的文件名。
+        """
+        width = max(4, len(str(total)))
+        ext = ImageDownloadWorker.guess_extension(url, content_type)
+        return f"{index + 1:0{width}d}_{digest[:8]}{ext}"
+
+    def cancel(self):
+        """请求取消下载（可在任意线程调用）"""
+        self.cancel_token.cancel()
+
+    @staticmethod
+    def remove_partial(part_path):
+        """删除未完成的临时文件"""
+        try:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        except OSError as e:
+            print(f"删除临时文件失败 {part_path}: {e}")
+
+    def stream_to_file(self, response, part_path):
+        """分块写入临时文件并计算内容哈希，期间可被取消令牌中断"""
+        sha1 = hashlib.sha1()
+        self.cancel_token.register(response)
+        try:
+            with open(part_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    self.cancel_token.raise_if_cancelled()
+                    f.write(chunk)
+                    sha1.update(chunk)
+                    self.bytes_received += len(chunk)
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.acquire_bytes(self.rate_domain, len(chunk), self.cancel_token)
+        except requests.RequestException:
+            # 取消时连接被强制关闭，读取会以连接错误结束
+            self.cancel_token.raise_if_cancelled()
+            raise
+        finally:
+            self.cancel_token.unregister(response)
+        self.cancel_token.raise_if_cancelled()
+        return sha1.hexdigest()
+
+    def fetch_with_retry(self, url, part_path):
+        """按重试策略下载单个URL到临时文件，返回(内容SHA-1, Content-Type)
+
+        遵守Retry-After，主机熔断时等待；所有等待都可被取消令牌立即打断。
+        """
+        host = urlparse(url).netloc
+        policy = self.retry_policy
+        token = self.cancel_token
+        last_error = None
+        for attempt in range(policy.max_attempts):
+            # 主机被熔断时先等待，而不是继续请求
+            pause = self.circuit_breaker.wait_time(host)
+            if pause > 0 and token.wait(pause):
+                raise DownloadCancelled()
+            token.raise_if_cancelled()
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire_request(self.rate_domain, token)
+            delay = policy.backoff(attempt)
+            try:
+                response = self.session.get(url, timeout=self.TIMEOUT, stream=True)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                token.raise_if_cancelled()
+                self.circuit_breaker.record_failure(host)
+                last_error = e
+            else:
+                with response:
+                    if not policy.is_retryable_status(response.status_code):
+                        # 不可重试的状态码（如404）直接抛出
+                        response.raise_for_status()
+                        try:
+                            digest = self.stream_to_file(response, part_path)
+                        except (requests.ConnectionError, requests.Timeout,
+                                requests.exceptions.ChunkedEncodingError) as e:
+                            # 传输中断，按连接错误重试
+                            self.circuit_breaker.record_failure(host)
+                            last_error = e
+                        else:
+                            self.circuit_breaker.record_success(host)
+                            return digest, response.headers.get('content-type', '')
+                    else:
+                        retry_after = policy.parse_retry_after(response.headers.get('Retry-After'))
+                        throttled = response.status_code in (429, 503)
+                        self.circuit_breaker.record_failure(host, retry_after if throttled else None)
+                        if retry_after is not None:
+                            delay = retry_after
+                        last_error = requests.HTTPError(f"{response.status_code} {response.reason}", response=response)
+            if attempt < policy.max_attempts - 1 and token.wait(delay):
+                raise DownloadCancelled()
+        raise last_error
+
     @pyqtSlot()
     def run(self):
         """执行下载任务"""
+        # 下载属于后台任务，降低线程优先级以免影响界面和图片加载
+        QThread.currentThread().setPriority(QThread.Priority.LowPriority)
         downloaded_files = []
+        failed = []
+        cancelled = False
         total = len(self.image_urls)
         
-        for i, url in enumerate(self.image_urls):
+        for done, (i, url) in enumerate(zip(self.indices, self.image_urls), start=1):
+            if self.cancel_token.cancelled:
+                cancelled = True
+                break
+            # 先写入隐藏的临时文件，完成后再改名，取消或失败时不会留下残缺图片
+            part_path = os.path.join(self.download_folder, f".{i + 1}.part")
             try:
                 # 处理相对URL
                 if not url.startswith(('http://', 'https://')):
@@ -984,43 +2878,34 @@ class ImageDownloadWorker(QRunnable):
                     else:
                         continue
                 
-                response = self.session.get(url, timeout=30)
-                response.raise_for_status()
+                with perf_recorder.span('download.image', url=url):
+                    digest, content_type = self.fetch_with_retry(url, part_path)
                 
-                # 获取文件扩展名
-                parsed_url = urlparse(url)
-                filename = os.path.basename(parsed_url.path)
-                if not filename or '.' not in filename:
-                    # 根据Content-Type确定扩展名
-                    content_type = response.headers.get('content-type', '')
-                    if 'jpeg' in content_type or 'jpg' in content_type:
-                        ext = '.jpg'
-                    elif 'png' in content_type:
-                        ext = '.png'
-                    elif 'gif' in content_type:
-                        ext = '.gif'
-                    elif 'webp' in content_type:
-                        ext = '.webp'
-                    else:
-                        ext = '.jpg'  # 默认
-                    filename = f"image_{i+1}{ext}"
+                # 生成唯一且有序的文件名：下载序号 + 内容哈希
+                filename = self.make_filename(i, self.total_count, digest, url, content_type)
                 
                 # 保存文件
                 file_path = os.path.join(self.download_folder, filename)
-                with open(file_path, 'wb') as f:
-                    f.write(response.content)
+                os.replace(part_path, file_path)
                 
                 downloaded_files.append(file_path)
+                self.signals.item_done.emit(i, file_path)
                 
-                # 发送进度信号
-                self.signals.progress.emit(i + 1, total)
-                
+            except DownloadCancelled:
+                self.remove_partial(part_path)
+                cancelled = True
+                break
             except Exception as e:
+                self.remove_partial(part_path)
                 print(f"下载失败 {url}: {e}")
+                failed.append((i, url))
                 # 继续下载其他图片，不中断整个流程
+            
+            # 发送进度信号
+            self.signals.progress.emit(done, total)
         
         # 保存原始URL到文件夹
-        if self.original_url:
+        if self.original_url and (downloaded_files or not cancelled):
             try:
                 url_file_path = os.path.join(self.download_folder, "original_url.txt")
                 with open(url_file_path, 'w', encoding='utf-8') as f:
@@ -1028,10 +2913,510 @@ class ImageDownloadWorker(QRunnable):
             except Exception as e:
                 print(f"保存原始URL失败: {e}")
         
+        if cancelled:
+            # 取消且没有任何已完成的图片时，移除空文件夹
+            if not downloaded_files:
+                try:
+                    os.rmdir(self.download_folder)
+                except OSError:
+                    pass
+            self.signals.cancelled.emit(downloaded_files)
+            return
+        
         # 发送完成信号
+        if failed:
+            self.signals.failed.emit(failed)
         self.signals.finished.emit(downloaded_files)
 
 
+class DownloadQueue(QObject):
+    """持久化的多任务下载队列
+
+    任务状态写入磁盘，重启后未完成的任务自动继续；调度时优先选择当前运行任务最少的主机，
+    下载使用独立的低优先级线程池，不占用图片加载线程。
+    """
+    job_updated = pyqtSignal(str)  # 任务ID
+    job_finished = pyqtSignal(str, list)  # 任务ID, 本次完成的文件列表
+
+    STATUS_TEXT = {
+        'pending': "⏳ 等待中",
+        'running': "⬇️ 下载中",
+        'done': "✅ 已完成",
+        'failed': "⚠️ 部分失败",
+        'cancelled': "❌ 已取消",
+    }
+
+    def __init__(self, queue_file="download_queue.json", max_jobs=3, max_jobs_per_host=2,
+                 retry_policy=None, circuit_breaker=None, rate_limiter=None):
+        super().__init__()
+        self.queue_file = queue_file
+        self.max_jobs = max_jobs
+        self.max_jobs_per_host = max_jobs_per_host
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or HostCircuitBreaker()
+        self.rate_limiter = rate_limiter
+        self.jobs = OrderedDict()  # 任务ID -> 任务
+        self.workers = {}  # 任务ID -> 正在运行的下载线程
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_jobs)
+        # 合并频繁的状态变化，最多每秒写一次磁盘
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(1000)
+        self._save_timer.timeout.connect(self.save)
+        self._shutting_down = False
+        self.load()
+
+    def load(self):
+        """加载持久化的队列，中断的任务恢复为等待状态"""
+        try:
+            if os.path.exists(self.queue_file):
+                with open(self.queue_file, 'r', encoding='utf-8') as f:
+                    for job in json.load(f):
+                        if job['status'] == 'running':
+                            job['status'] = 'pending'
+                        self.jobs[job['id']] = job
+        except Exception as e:
+            print(f"加载下载队列失败: {e}")
+
+    def save(self):
+        """原子写入队列文件"""
+        try:
+            jobs = []
+            for job in self.jobs.values():
+                data = {k: v for k, v in job.items() if not k.startswith('_')}
+                data['bytes'] = self.job_stats(job)['bytes']
+                jobs.append(data)
+            tmp_file = self.queue_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(jobs, f, ensure_ascii=False)
+            os.replace(tmp_file, self.queue_file)
+        except Exception as e:
+            print(f"保存下载队列失败: {e}")
+
+    def schedule_save(self):
+        self._save_timer.start()
+
+    def enqueue(self, url, image_urls, download_folder):
+        """添加下载任务，返回任务ID"""
+        job_id = f"{int(time.time() * 1000)}_{len(self.jobs)}"
+        self.jobs[job_id] = {
+            'id': job_id,
+            'url': url,
+            'host': urlparse(url).netloc,
+            'folder': download_folder,
+            'image_urls': list(image_urls),
+            'total': len(image_urls),
+            'pending': list(range(len(image_urls))),
+            'done': [],
+            'failed': [],
+            'status': 'pending',
+            'bytes': 0,
+            'elapsed': 0.0,
+            'created': time.time(),
+        }
+        self.save()
+        self.job_updated.emit(job_id)
+        self.schedule()
+        return job_id
+
+    def set_max_jobs(self, max_jobs):
+        """调整并发任务数"""
+        self.max_jobs = max(1, max_jobs)
+        self.pool.setMaxThreadCount(self.max_jobs)
+        self.schedule()
+
+    def resume(self):
+        """启动时继续上次未完成的任务"""
+        self.schedule()
+
+    def _next_job(self):
+        """选择下一个任务：跳过已达并发上限的主机，优先运行任务最少的主机"""
+        running_per_host = {}
+        for job_id in self.workers:
+            host = self.jobs[job_id]['host']
+            running_per_host[host] = running_per_host.get(host, 0) + 1
+        best = None
+        best_running = None
+        for job in self.jobs.values():
+            if job['status'] != 'pending':
+                continue
+            running = running_per_host.get(job['host'], 0)
+            if running >= self.max_jobs_per_host:
+                continue
+            if best is None or running < best_running:
+                best, best_running = job, running
+        return best
+
+    def schedule(self):
+        """在并发上限内启动等待中的任务"""
+        while len(self.workers) < self.max_jobs:
+            job = self._next_job()
+            if job is None:
+                break
+            self._start(job)
+
+    def _start(self, job):
+        job_id = job['id']
+        indices = list(job['pending'])
+        # 取消时空文件夹会被工作线程删除，继续任务前重新创建
+        try:
+            os.makedirs(job['folder'], exist_ok=True)
+        except OSError as e:
+            print(f"创建下载文件夹失败 {job['folder']}: {e}")
+        worker = ImageDownloadWorker(
+            [job['image_urls'][i] for i in indices], job['folder'], job['url'], job['url'],
+            indices=indices, total_count=job['total'],
+            retry_policy=self.retry_policy, circuit_breaker=self.circuit_breaker,
+            rate_limiter=self.rate_limiter)
+        job['status'] = 'running'
+        job['_run_started'] = time.monotonic()
+        job['_run_bytes_base'] = job['bytes']
+        job['_run_done_base'] = len(job['done'])
+        self.workers[job_id] = worker
+
+        def _on_item_done(index, path, jid=job_id):
+            self._on_item_done(jid, index)
+        def _on_failed(failed, jid=job_id):
+            self._on_failed(jid, failed)
+        def _on_finished(files, jid=job_id):
+            self._on_worker_ended(jid, files, cancelled=False)
+        def _on_cancelled(files, jid=job_id):
+            self._on_worker_ended(jid, files, cancelled=True)
+        worker.signals.item_done.connect(_on_item_done)
+        worker.signals.failed.connect(_on_failed)
+        worker.signals.finished.connect(_on_finished)
+        worker.signals.cancelled.connect(_on_cancelled)
+        self.pool.start(worker)
+        self.save()
+        self.job_updated.emit(job_id)
+
+    def _on_item_done(self, job_id, index):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        if index in job['pending']:
+            job['pending'].remove(index)
+        job['done'].append(index)
+        self.schedule_save()
+        self.job_updated.emit(job_id)
+
+    def _on_failed(self, job_id, failed):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        failed_indices = {index for index, _ in failed}
+        job['pending'] = [i for i in job['pending'] if i not in failed_indices]
+        job['failed'] = sorted(set(job['failed']) | failed_indices)
+
+    def _on_worker_ended(self, job_id, files, cancelled):
+        worker = self.workers.pop(job_id, None)
+        job = self.jobs.get(job_id)
+        if job is not None:
+            if worker is not None:
+                job['bytes'] = job['_run_bytes_base'] + worker.bytes_received
+            job['elapsed'] += time.monotonic() - job.pop('_run_started', time.monotonic())
+            if self._shutting_down:
+                # 退出时被中断的任务保持等待状态，下次启动继续；由shutdown统一保存
+                job['status'] = 'pending'
+                return
+            if cancelled:
+                job['status'] = 'cancelled'
+            else:
+                job['status'] = 'failed' if job['failed'] else 'done'
+            self.save()
+            self.job_updated.emit(job_id)
+            if not cancelled:
+                self.job_finished.emit(job_id, files)
+        self.schedule()
+
+    def cancel(self, job_id):
+        """取消任务：运行中的立即中断，等待中的直接标记为取消"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        worker = self.workers.get(job_id)
+        if worker is not None:
+            worker.cancel()
+        elif job['status'] == 'pending':
+            job['status'] = 'cancelled'
+            self.save()
+            self.job_updated.emit(job_id)
+
+    def retry_failed(self, job_id):
+        """只把失败的图片重新放回队列"""
+        job = self.jobs.get(job_id)
+        if job is None or job_id in self.workers or not job['failed']:
+            return
+        job['pending'] = sorted(set(job['pending']) | set(job['failed']))
+        job['failed'] = []
+        job['status'] = 'pending'
+        self.save()
+        self.job_updated.emit(job_id)
+        self.schedule()
+
+    def clear_finished(self):
+        """从队列中移除已结束的任务"""
+        for job_id in [j for j, job in self.jobs.items() if job['status'] in ('done', 'cancelled')]:
+            del self.jobs[job_id]
+        self.save()
+        self.job_updated.emit("")
+
+    def status_counts(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job['status']] = counts.get(job['status'], 0) + 1
+        return counts
+
+    def job_stats(self, job):
+        """任务的已下载字节数、当前速度（字节/秒）和预计剩余秒数"""
+        worker = self.workers.get(job['id'])
+        if worker is None or '_run_started' not in job:
+            return {'bytes': job['bytes'], 'speed': 0.0, 'eta': None}
+        run_bytes = worker.bytes_received
+        run_elapsed = max(1e-3, time.monotonic() - job['_run_started'])
+        run_done = len(job['done']) - job['_run_done_base']
+        eta = None
+        if run_done > 0:
+            eta = len(job['pending']) * run_elapsed / run_done
+        return {'bytes': job['_run_bytes_base'] + run_bytes, 'speed': run_bytes / run_elapsed, 'eta': eta}
+
+    def shutdown(self):
+        """退出前中断运行中的任务并保存队列（中断的任务保持等待状态，下次启动时继续）
+
+        先取消并等待工作线程结束，再处理它们排队中的信号（已完成的图片记入done），最后只保存一次，
+        避免迟到的回调把任务改成"已取消"覆盖可继续的状态。
+        """
+        self._shutting_down = True
+        self._save_timer.stop()
+        for worker in list(self.workers.values()):
+            worker.cancel()
+        self.pool.waitForDone(5000)
+        QCoreApplication.sendPostedEvents()
+        for job in self.jobs.values():
+            if job['status'] == 'running':
+                job['status'] = 'pending'
+        self.save()
+
+
+class ExtractSignals(QObject):
+    """网页提取信号"""
+    progress = pyqtSignal(str, int)        # (网址, 已找到的图片数)
+    finished = pyqtSignal(str, list, int)  # (网址, 预检后保留的图片URL, 被过滤的数量)
+
+
+class UrlExtractWorker(QRunnable):
+    """后台提取网页图片（含分页）并预检，结果通过信号交回GUI线程"""
+    def __init__(self, url, xpath_configs, crawler, probe):
+        super().__init__()
+        self.url = url
+        self.xpath_configs = xpath_configs
+        self.crawler = crawler
+        self.probe = probe
+        self.signals = ExtractSignals()
+        self.cancel_token = CancelToken()
+    
+    def cancel(self):
+        self.cancel_token.cancel()
+    
+    @pyqtSlot()
+    def run(self):
+        found = 0
+        def on_batch(batch):
+            nonlocal found
+            found += len(batch)
+            self.signals.progress.emit(self.url, found)
+        
+        image_urls, filtered_count = [], 0
+        try:
+            with perf_recorder.span('process_url.extract', url=self.url):
+                image_urls = self.crawler.crawl(self.url, self.xpath_configs, on_batch, self.cancel_token)
+            if image_urls:
+                with perf_recorder.span('process_url.probe', count=len(image_urls)):
+                    image_urls, filtered_count = self.probe.filter(image_urls, self.url, self.cancel_token)
+        except DownloadCancelled:
+            return
+        except Exception as e:
+            print(f"处理URL失败: {e}")
+            image_urls = []
+        if not self.cancel_token.cancelled:
+            self.signals.finished.emit(self.url, image_urls, filtered_count)
+
+
+class BatchSignals(QObject):
+    """批量任务信号"""
+    url_done = pyqtSignal(dict)  # 单个网址的处理结果（报告中的一行）
+
+
+class BatchUrlTask(QRunnable):
+    """批量模式下处理单个网址：抓取（含分页）→ 预检 → 下载，与剪贴板流程使用同一套组件"""
+    def __init__(self, runner, url, xpath_configs):
+        super().__init__()
+        self.runner = runner
+        self.url = url
+        self.xpath_configs = xpath_configs
+        self.signals = BatchSignals()
+    
+    def run(self):
+        """执行抓取与下载，结果通过url_done信号交回主线程写入报告"""
+        runner = self.runner
+        start = time.time()
+        record = {'url': self.url, 'status': 'ok', 'folder': '', 'found': 0, 'filtered': 0,
+                  'downloaded': 0, 'failed': 0, 'error': ''}
+        try:
+            image_urls = runner.crawler.crawl(self.url, self.xpath_configs)
+            record['found'] = len(image_urls)
+            image_urls, record['filtered'] = runner.probe.filter(image_urls, self.url)
+            if not image_urls:
+                record['status'] = 'empty'
+            else:
+                # 上次部分失败的网址沿用原相册文件夹
+                folder = runner.previous_folders.get(self.url)
+                if not folder or not os.path.isdir(folder):
+                    folder = ImageDownloadWorker.make_album_folder(runner.base_folder, self.url)
+                record['folder'] = folder
+                worker = ImageDownloadWorker(
+                    image_urls, folder, self.url, self.url,
+                    retry_policy=runner.retry_policy, circuit_breaker=runner.host_breaker,
+                    rate_limiter=runner.rate_limiter)
+                # 在当前线程内直接运行下载，用直连方式收集结果
+                outcome = {'files': [], 'failed': []}
+                worker.signals.finished.connect(lambda files: outcome.update(files=files),
+                                                Qt.ConnectionType.DirectConnection)
+                worker.signals.failed.connect(lambda failed: outcome.update(failed=failed),
+                                              Qt.ConnectionType.DirectConnection)
+                worker.run()
+                record['downloaded'] = len(outcome['files'])
+                record['failed'] = len(outcome['failed'])
+                if outcome['failed']:
+                    record['status'] = 'partial' if outcome['files'] else 'failed'
+        except Exception as e:
+            record.update(status='error', error=str(e))
+        record['elapsed'] = round(time.time() - start, 3)
+        self.signals.url_done.emit(record)
+
+
+class BatchRunner(QObject):
+    """批量导入：对网址列表无界面地执行抓取和下载，结果逐行写入JSONL报告
+
+    重复运行是幂等的：以报告中每个网址最后一条记录为准，状态为ok的跳过，失败或部分失败的重新处理，
+    并沿用上次的相册文件夹（文件名含内容哈希，已下载的图片原样覆盖，不会产生重复相册）。
+    报告中没有记录的网址，图片文件夹中已有相册（original_url.txt，如界面中下载的）时同样跳过。
+    """
+    finished = pyqtSignal(dict)  # 汇总：{状态: 数量}
+    
+    def __init__(self, config_manager, report_path, concurrency=4):
+        super().__init__()
+        config = config_manager.load_config()
+        self.base_folder = config.get('image_folder', '/Users/jiangjie/Downloads/img')
+        self.report_path = report_path
+        self.matcher = DomainMatcher(config.get('xpath_configs', []))
+        self.scraper = WebScraper(HttpCache(), config.get('max_image_width', 0))
+        self.crawler = GalleryCrawler(self.scraper)
+        self.retry_policy = RetryPolicy()
+        self.host_breaker = HostCircuitBreaker()
+        self.rate_limiter = DownloadRateLimiter()
+        self.rate_limiter.configure(config.get('xpath_configs', []), config.get('download_global_kbps', 0))
+        self.probe = ImageProbe(self.scraper, self.rate_limiter)
+        self.probe.configure(config)
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max(1, concurrency))
+        self.tasks = {}
+        self.summary = {}
+        self.previous_folders = {}  # 网址 -> 上次未完成时使用的相册文件夹
+    
+    @staticmethod
+    def read_url_file(path):
+        """读取网址列表：文本文件每行一个网址（#开头为注释），.jsonl文件每行一个{"url": ...}"""
+        urls = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith('{'):
+                    try:
+                        line = json.loads(line).get('url', '')
+                    except ValueError:
+                        print(f"无法解析的行: {line}")
+                        continue
+                if line.startswith(('http://', 'https://')):
+                    urls.append(line)
+        return list(dict.fromkeys(urls))
+    
+    def latest_records(self):
+        """报告中每个网址的最后一条记录"""
+        latest = {}
+        if os.path.exists(self.report_path):
+            with open(self.report_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get('url'):
+                        latest[record['url']] = record
+        return latest
+    
+    def completed_urls(self):
+        """已完成的网址：最后一条报告记录为ok的，以及报告中没有记录但已有相册的原始网址
+
+        相册中的original_url.txt在部分图片失败时也会写入（界面中需要用它打开原网页），
+        因此报告中有记录的网址只看报告状态。
+        """
+        latest = self.latest_records()
+        done = {url for url, record in latest.items() if record.get('status') == 'ok'}
+        self.previous_folders = {url: record['folder'] for url, record in latest.items()
+                                 if url not in done and record.get('folder')}
+        if os.path.isdir(self.base_folder):
+            for entry in os.scandir(self.base_folder):
+                url_file = os.path.join(entry.path, "original_url.txt")
+                if entry.is_dir() and os.path.exists(url_file):
+                    try:
+                        with open(url_file, 'r', encoding='utf-8') as f:
+                            url = f.read().strip()
+                    except OSError:
+                        continue
+                    if url not in latest:
+                        done.add(url)
+        return done
+    
+    def start(self, urls):
+        """开始处理，返回实际提交的网址数量"""
+        done = self.completed_urls()
+        for url in urls:
+            if url in done:
+                self.summary['skipped'] = self.summary.get('skipped', 0) + 1
+                continue
+            xpath_configs = self.matcher.match(url)
+            if not xpath_configs:
+                self.write_record({'url': url, 'status': 'no_config', 'error': '没有匹配的XPath配置'})
+                continue
+            task = BatchUrlTask(self, url, xpath_configs)
+            task.setAutoDelete(False)
+            task.signals.url_done.connect(self.on_url_done)
+            self.tasks[url] = task
+            self.pool.start(task)
+        if not self.tasks:
+            QTimer.singleShot(0, lambda: self.finished.emit(dict(self.summary)))
+        return len(self.tasks)
+    
+    def write_record(self, record):
+        """追加一行报告（每行立即落盘，中途退出也不丢失已完成的结果）"""
+        record['time'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.summary[record['status']] = self.summary.get(record['status'], 0) + 1
+        with open(self.report_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def on_url_done(self, record):
+        """单个网址处理完成"""
+        self.tasks.pop(record['url'], None)
+        self.write_record(record)
+        print(f"[{record['status']}] {record['url']} 下载 {record.get('downloaded', 0)} 张，失败 {record.get('failed', 0)} 张")
+        if not self.tasks:
+            self.finished.emit(dict(self.summary))
+
+
 class ImageLoadWorker(QRunnable):
     def __init__(self, global_index: int, image_path: str, target_size: QSize):
         super().__init__()
@@ -1039,21 +3424,1073 @@ class ImageLoadWorker(QRunnable):
         self.image_path = image_path
         self.target_size = target_size
         self.signals = WorkerSignals()
+        self.queued_at = time.perf_counter()
 
     @pyqtSlot()
     def run(self):
-        pixmap = QPixmap(self.image_path)
+        # 排队等待时间：从创建到线程池开始执行
+        perf_recorder.record('image.queue_wait', self.queued_at, time.perf_counter())
+        with perf_recorder.span('image.decode', path=self.image_path):
+            pixmap = QPixmap(self.image_path)
         if not pixmap.isNull():
-            scaled = pixmap.scaled(
-                self.target_size,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation,
-            )
+            with perf_recorder.span('image.scale'):
+                scaled = pixmap.scaled(
+                    self.target_size,
+                    Qt.AspectRatioMode.KeepAspectRatio,
+                    Qt.TransformationMode.SmoothTransformation,
+                )
             self.signals.imageLoaded.emit(self.global_index, scaled)
         else:
             self.signals.imageLoaded.emit(self.global_index, QPixmap())
 
 
+class PerceptualHasher:
+    """感知哈希计算（dHash，64位）"""
+    HASH_WIDTH = 9
+    HASH_HEIGHT = 8
+    # 后台计算时先按缩小尺寸解码，JPEG可直接在DCT阶段缩放，远快于完整解码
+    DECODE_SIZE = QSize(64, 64)
+
+    @staticmethod
+    def dhash(image: QImage):
+        """根据已解码图片计算dHash，失败返回None"""
+        if image is None or image.isNull():
+            return None
+        small = image.scaled(
+            PerceptualHasher.HASH_WIDTH,
+            PerceptualHasher.HASH_HEIGHT,
+            Qt.AspectRatioMode.IgnoreAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        ).convertToFormat(QImage.Format.Format_Grayscale8)
+        value = 0
+        for y in range(PerceptualHasher.HASH_HEIGHT):
+            for x in range(PerceptualHasher.HASH_WIDTH - 1):
+                left = small.pixel(x, y) & 0xFF
+                right = small.pixel(x + 1, y) & 0xFF
+                value = (value << 1) | (1 if left > right else 0)
+        return value
+
+    @staticmethod
+    def hash_file(path: str):
+        """以缩小尺寸解码文件并计算dHash"""
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        if reader.size().isValid():
+            reader.setScaledSize(PerceptualHasher.DECODE_SIZE)
+        return PerceptualHasher.dhash(reader.read())
+
+    @staticmethod
+    def distance(a: int, b: int) -> int:
+        """两个哈希之间的汉明距离"""
+        return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """按汉明距离组织的BK树，支持亚线性的近邻半径查询"""
+    def __init__(self):
+        # 节点结构: [hash, [路径...], {距离: 子节点}]
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int, path: str):
+        """插入一个哈希值及其对应的图片路径"""
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [path], {}]
+            return
+        node = self.root
+        while True:
+            d = PerceptualHasher.distance(value, node[0])
+            if d == 0:
+                node[1].append(path)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [path], {}]
+                return
+            node = child
+
+    def query(self, value: int, radius: int):
+        """返回距离不超过radius的所有(距离, 哈希, 路径)"""
+        results = []
+        if self.root is None:
+            return results
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = PerceptualHasher.distance(value, node[0])
+            if d <= radius:
+                results.extend((d, node[0], path) for path in node[1])
+            # 三角不等式剪枝：只需访问距离在[d-r, d+r]内的子树
+            for child_d, child in node[2].items():
+                if d - radius <= child_d <= d + radius:
+                    stack.append(child)
+        return results
+
+
+class ImageHashIndex:
+    """图片感知哈希索引，持久化到磁盘并以BK树提供相似图片查询
+
+    索引文件由ImageHashWorker在后台读取并建立BK树，再通过install()交给GUI线程；
+    之后条目只在GUI线程中修改，save()可在任意线程调用，写入的是当时条目的快照。
+    """
+    def __init__(self, index_file="image_hash_index.json"):
+        self.index_file = index_file
+        # 路径 -> (mtime, size, hash)
+        self.entries = {}
+        self.tree = BKTree()
+        self.dirty = False
+        self.loaded = False
+        self._save_lock = threading.Lock()
+
+    @staticmethod
+    def read_file(index_file):
+        """读取持久化的哈希索引并建立BK树（在后台线程调用），返回(条目, BK树)"""
+        entries, tree = {}, BKTree()
+        try:
+            if os.path.exists(index_file):
+                with open(index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for path, (mtime, size, value) in data.items():
+                    entries[path] = (mtime, size, int(value, 16))
+                    tree.add(int(value, 16), path)
+        except Exception as e:
+            print(f"加载哈希索引失败: {e}")
+        return entries, tree
+
+    def install(self, entries, tree):
+        """换上后台加载的索引，加载期间在GUI线程中新增的条目保留"""
+        for path, entry in self.entries.items():
+            previous = entries.get(path)
+            entries[path] = entry
+            if previous is None or previous[2] != entry[2]:
+                tree.add(entry[2], path)
+        self.entries, self.tree = entries, tree
+        self.loaded = True
+
+    def save(self, pending=None, removed=(), base=None):
+        """保存哈希索引（仅在有变化时写入）
+
+        pending（路径 -> 条目）和removed是后台任务尚未交给GUI线程的结果，一并写入；
+        base是后台已读取但GUI线程尚未install()的条目。没有完整条目时不写入，避免覆盖索引文件。
+        """
+        if (base is None and not self.loaded) or not (self.dirty or pending or removed):
+            return
+        with self._save_lock:
+            self.dirty = False
+            entries = dict(base) if base is not None and not self.loaded else {}
+            entries.update(self.entries)
+            entries.update(pending or {})
+            for path in removed:
+                entries.pop(path, None)
+            try:
+                data = {path: [mtime, size, format(value, '016x')]
+                        for path, (mtime, size, value) in entries.items()}
+                tmp_file = self.index_file + ".tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_file, self.index_file)
+            except Exception as e:
+                self.dirty = True
+                print(f"保存哈希索引失败: {e}")
+
+    @staticmethod
+    def file_signature(path: str):
+        """文件签名(mtime, size)，用于判断哈希是否过期"""
+        st = os.stat(path)
+        return int(st.st_mtime), st.st_size
+
+    def is_current(self, path: str, signature) -> bool:
+        entry = self.entries.get(path)
+        return entry is not None and (entry[0], entry[1]) == tuple(signature)
+
+    def add(self, path: str, signature, value: int):
+        """记录一张图片的哈希；旧节点留在树中，查询时按当前值过滤"""
+        entry = self.entries.get(path)
+        if entry is not None and entry[2] == value and (entry[0], entry[1]) == tuple(signature):
+            return
+        self.entries[path] = (signature[0], signature[1], value)
+        if entry is None or entry[2] != value:
+            self.tree.add(value, path)
+        self.dirty = True
+
+    def remove(self, paths):
+        """移除条目（文件已删除或不再是图片），返回移除的{路径: 条目}；树中的旧节点查询时按当前条目过滤"""
+        removed = {}
+        for path in paths:
+            entry = self.entries.pop(path, None)
+            if entry is not None:
+                removed[path] = entry
+        if removed:
+            self.dirty = True
+        return removed
+
+    def restore(self, entries):
+        """写回remove()移除的条目（撤销删除）"""
+        for path, (mtime, size, value) in entries.items():
+            self.add(path, (mtime, size), value)
+
+    def move(self, moves):
+        """文件改名或移动后沿用原哈希（改名不改变修改时间和大小）：moves为[(原路径, 新路径)]"""
+        for source, target in moves:
+            entry = self.entries.pop(source, None)
+            if entry is not None:
+                self.entries[target] = entry
+                self.tree.add(entry[2], target)
+                self.dirty = True
+
+    def get_hash(self, path: str):
+        entry = self.entries.get(path)
+        return entry[2] if entry is not None else None
+
+    def find_similar(self, path: str, max_distance: int):
+        """查找与指定图片相似的图片，按距离升序返回(距离, 路径)"""
+        value = self.get_hash(path)
+        if value is None:
+            return []
+        results = []
+        seen = set()
+        for d, node_value, other in self.tree.query(value, max_distance):
+            if other == path or other in seen:
+                continue
+            current = self.entries.get(other)
+            if current is None or current[2] != node_value:
+                continue  # 该节点已过期
+            seen.add(other)
+            results.append((d, other))
+        results.sort()
+        return results
+
+
+class HashSignals(QObject):
+    """哈希计算信号"""
+    index_loaded = pyqtSignal(object, object)  # (条目, BK树)
+    hashes_ready = pyqtSignal(list)  # [(路径, 签名, 哈希)]
+    hashes_removed = pyqtSignal(list)  # [路径]
+    finished = pyqtSignal()
+
+
+class ImageHashWorker(QRunnable):
+    """后台同步感知哈希索引：首次运行时加载索引文件，为新增或有变化的图片计算哈希，
+    移除文件已不存在或不再是图片的条目，并定期保存"""
+    BATCH_SIZE = 256
+    SAVE_INTERVAL = 60  # 秒
+
+    def __init__(self, index, album_images):
+        super().__init__()
+        self.index = index
+        # 各相册的图片列表（只传引用，运行时逐个复制，避免在GUI线程中展开全部路径）
+        self.album_images = album_images
+        self.signals = HashSignals()
+        self.cancelled = False
+        # 本次计算的结果，保存时与GUI线程中的条目合并（最后一批信号可能尚未处理）
+        self.results = {}
+        self.removed = set()
+        self.base = None  # 本次从文件加载的条目
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _flush(self, batch, removed):
+        if batch:
+            self.signals.hashes_ready.emit(batch)
+        if removed:
+            self.signals.hashes_removed.emit(removed)
+
+    @pyqtSlot()
+    def run(self):
+        if self.index.loaded:
+            entries = dict(self.index.entries)
+        else:
+            entries, tree = ImageHashIndex.read_file(self.index.index_file)
+            self.base = dict(entries)
+            self.signals.index_loaded.emit(entries, tree)
+            entries = self.base
+        batch, removed = [], []
+        seen = set()
+        last_save = time.time()
+        for images in self.album_images:
+            for path in list(images):
+                if self.cancelled:
+                    break
+                seen.add(path)
+                entry = entries.get(path)
+                try:
+                    signature = ImageHashIndex.file_signature(path)
+                    if entry is not None and (entry[0], entry[1]) == signature:
+                        continue
+                    value = PerceptualHasher.hash_file(path)
+                except OSError:
+                    value, signature = None, None
+                if value is not None:
+                    batch.append((path, signature, value))
+                    self.results[path] = (signature[0], signature[1], value)
+                elif entry is not None:
+                    removed.append(path)
+                    self.removed.add(path)
+                if len(batch) >= self.BATCH_SIZE:
+                    self._flush(batch, removed)
+                    batch, removed = [], []
+                    if time.time() - last_save > self.SAVE_INTERVAL:
+                        self.index.save(self.results, self.removed, self.base)
+                        last_save = time.time()
+        if not self.cancelled:
+            # 不在当前图库中的条目（其他图片文件夹的图片）只在文件已不存在时移除
+            for path in entries:
+                if path not in seen and not os.path.exists(path):
+                    removed.append(path)
+                    self.removed.add(path)
+        self._flush(batch, removed)
+        self.index.save(self.results, self.removed, self.base)
+        self.signals.finished.emit()
+
+
+class AlbumCatalog:
+    """排序目录：置顶等人工排序以排序键的形式保存在<图片文件夹>/.catalog.json，不再改名文件夹和文件
+
+    {'albums': {文件夹名: 排序键}, 'images': {文件夹名: {文件名: 排序键}}}
+    排序键是置顶时的毫秒时间戳，越大越靠前；与旧版置顶留下的"时间戳_原名称"前缀取较大值，
+    因此旧图库的顺序保持不变。相册或图片被删除、移走时条目随之移除（撤销删除时写回），
+    扫描图库时再清理在程序外删除的条目。
+
+    相册元数据（修改时间、占用空间、平均分辨率）由AlbumMetadataWorker在后台统计一次，
+    单独保存在.catalog_meta.json（数据量大，避免每次置顶都重写），切换排序方式时只读内存。
+    """
+    # (排序方式, 显示名称)；置顶的相册在任何排序方式下都排在最前
+    SORT_MODES = [
+        ('time', "🕒 下载时间"),
+        ('mtime', "📝 修改时间"),
+        ('size', "💾 占用空间"),
+        ('count', "🖼️ 图片数量"),
+        ('domain', "🌐 来源域名"),
+        ('name', "🔤 名称"),
+        ('dimensions', "📐 分辨率"),
+    ]
+    # 依赖后台统计结果的排序方式
+    META_SORT_MODES = ('mtime', 'size', 'dimensions')
+    NATURAL_SPLIT = re.compile(r'(\d+)')
+
+    def __init__(self, root_folder):
+        self.root_folder = root_folder
+        self.catalog_file = os.path.join(root_folder, ".catalog.json")
+        self.meta_file = os.path.join(root_folder, ".catalog_meta.json")
+        self.lock = threading.Lock()
+        self.data = self._load()
+        # 已有的最大排序键，置顶时递增维护，新键无需扫描全部条目
+        self.max_key = max([*self.data['albums'].values(),
+                            *(key for keys in self.data['images'].values() for key in keys.values())], default=0)
+        self.meta = self._load_meta()  # 文件夹名 -> {'sig', 'mtime', 'size', 'pixels'}
+        self._sort_keys = {}  # 排序方式 -> {相册路径: (签名, 排序键)}
+
+    def _load(self):
+        try:
+            with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault('albums', {})
+        data.setdefault('images', {})
+        return data
+
+    def _save(self):
+        """原子写入目录文件（调用方持有锁）"""
+        tmp_file = self.catalog_file + ".tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.catalog_file)
+        except OSError as e:
+            print(f"保存排序目录失败: {e}")
+
+    @staticmethod
+    def prefix_timestamp(name):
+        """旧版置顶写入的"时间戳_原名称"前缀，没有则为0"""
+        if name.count('_') >= 2:
+            first_underscore = name.find('_')
+            if first_underscore > 0:
+                try:
+                    return int(name[:first_underscore])
+                except ValueError:
+                    pass
+        return 0
+
+    def album_key(self, album_name):
+        return max(self.data['albums'].get(album_name, 0), self.prefix_timestamp(album_name))
+
+    def image_key(self, album_name, filename):
+        keys = self.data['images'].get(album_name, {})
+        return max(keys.get(filename, 0), self.prefix_timestamp(filename))
+
+    def next_keys(self, count):
+        """count个新的排序键（从大到小）：都大于已有的所有键，同一毫秒内连续置顶也保持先后（调用方持有锁）"""
+        base = max(int(time.time() * 1000), self.max_key + 1)
+        keys = [base + count - 1 - i for i in range(count)]
+        if keys:
+            self.max_key = keys[0]
+        return keys
+
+    def pin_albums(self, album_names):
+        """置顶一组相册（第一个排在最前），只写入一次，返回对应的排序键"""
+        with self.lock:
+            keys = self.next_keys(len(album_names))
+            self.data['albums'].update(zip(album_names, keys))
+            self._save()
+        return keys
+
+    def pin_images(self, album_name, filenames):
+        """置顶相册中的一组图片（第一个排在最前），只写入一次，返回对应的排序键"""
+        with self.lock:
+            keys = self.next_keys(len(filenames))
+            self.data['images'].setdefault(album_name, {}).update(zip(filenames, keys))
+            self._save()
+        return keys
+
+    def take_albums(self, album_names):
+        """移除一组相册的排序键和元数据（相册已删除或移出图库），只写入一次
+
+        返回{文件夹名: {'album', 'images', 'meta'}}，撤销删除时交给put_albums()写回。
+        """
+        taken = {}
+        with self.lock:
+            for name in album_names:
+                entry = {'album': self.data['albums'].pop(name, None),
+                         'images': self.data['images'].pop(name, None),
+                         'meta': self.meta.pop(name, None)}
+                if any(value is not None for value in entry.values()):
+                    taken[name] = entry
+            if taken:
+                self._save()
+        for keys in self._sort_keys.values():
+            for name in album_names:
+                keys.pop(os.path.join(self.root_folder, name), None)
+        return taken
+
+    def put_albums(self, taken):
+        """写回take_albums()移除的条目"""
+        if not taken:
+            return
+        with self.lock:
+            for name, entry in taken.items():
+                if entry['album'] is not None:
+                    self.data['albums'][name] = entry['album']
+                    self.max_key = max(self.max_key, entry['album'])
+                if entry['images']:
+                    self.data['images'][name] = entry['images']
+                    self.max_key = max(self.max_key, *entry['images'].values())
+                if entry['meta'] is not None:
+                    self.meta[name] = entry['meta']
+            self._save()
+
+    def take_images(self, album_name, filenames):
+        """移除相册中一组图片的排序键（图片已删除或移走），返回{文件名: 排序键}"""
+        with self.lock:
+            keys = self.data['images'].get(album_name)
+            taken = {name: keys.pop(name) for name in filenames if keys and name in keys}
+            if taken:
+                if not keys:
+                    del self.data['images'][album_name]
+                self._save()
+        return taken
+
+    def put_images(self, album_name, keys):
+        """写回图片的排序键（撤销删除，或随图片移到另一个相册）"""
+        if not keys:
+            return
+        with self.lock:
+            self.data['images'].setdefault(album_name, {}).update(keys)
+            self.max_key = max(self.max_key, *keys.values())
+            self._save()
+
+    def prune(self, albums):
+        """扫描图库后移除已不存在的相册和图片的排序键（在程序外删除或改名的），有变化时写入一次"""
+        present = {album['name']: album for album in albums}
+        with self.lock:
+            changed = False
+            for name in [n for n in self.data['albums'] if n not in present]:
+                del self.data['albums'][name]
+                changed = True
+            for name in list(self.data['images']):
+                album = present.get(name)
+                keys = self.data['images'][name]
+                filenames = {os.path.basename(path) for path in album['images']} if album else set()
+                for filename in [f for f in keys if f not in filenames]:
+                    del keys[filename]
+                    changed = True
+                if not keys:
+                    del self.data['images'][name]
+                    changed = True
+            if changed:
+                self._save()
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def update_meta(self, batch):
+        # 缓存的排序键按签名核对，元数据变化后自动重新计算
+        self.meta.update(batch)
+
+    def save_meta(self):
+        """原子写入相册元数据"""
+        tmp_file = self.meta_file + ".tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.meta, f, ensure_ascii=False)
+            os.replace(tmp_file, self.meta_file)
+        except OSError as e:
+            print(f"保存相册元数据失败: {e}")
+
+    @classmethod
+    def natural_key(cls, name):
+        """自然排序键：数字补齐到相同位数后按字符串比较（2.jpg排在10.jpg前面），比较速度与普通字符串相同"""
+        return cls.NATURAL_SPLIT.sub(lambda match: match.group().zfill(20), name.lower())
+
+    def _mode_key(self, mode, album):
+        meta = self.meta.get(album['name'], {})
+        if mode in self.META_SORT_MODES:
+            return meta.get({'dimensions': 'pixels'}.get(mode, mode), 0)
+        if mode == 'domain':
+            return AlbumSearchIndex.album_domain(album), -AlbumSearchIndex.album_time(album, meta)
+        if mode == 'name':
+            return self.natural_key(album['name'])
+        return AlbumSearchIndex.album_time(album, meta)
+
+    def album_signature(self, album):
+        """缓存排序键用的相册签名：元数据签名（文件夹修改时间和图片数量）、图片数量和来源网址，
+        文件夹在程序外重建或元数据更新后签名改变，缓存的排序键随之失效"""
+        sig = self.meta.get(album['name'], {}).get('sig')
+        return tuple(sig) if sig else None, len(album['images']), album.get('original_url')
+
+    def sort_albums(self, albums, mode):
+        """按排序方式原地排序相册列表：置顶的在前（排序键从大到小），其余按mode排序
+
+        每个相册在每种排序方式下的排序键按 路径 + 签名 缓存，只在签名变化时重新计算，
+        之后切换排序方式只是对缓存的标量排序，不访问磁盘。
+        """
+        keys = self._sort_keys.setdefault(mode, {})
+        pinned, rest = [], []
+        if mode == 'count':
+            for album in albums:
+                (pinned if album['timestamp'] else rest).append(album)
+            rest.sort(key=lambda album: len(album['images']), reverse=True)
+        else:
+            for album in albums:
+                (pinned if album['timestamp'] else rest).append(album)
+                signature = self.album_signature(album)
+                cached = keys.get(album['path'])
+                if cached is None or cached[0] != signature:
+                    keys[album['path']] = (signature, self._mode_key(mode, album))
+            # 名称和域名从小到大，其余（时间、空间、分辨率）从大到小
+            rest.sort(key=lambda album: keys[album['path']][1], reverse=mode not in ('name', 'domain'))
+        pinned.sort(key=lambda album: album['timestamp'], reverse=True)
+        albums[:] = pinned + rest
+
+
+class AlbumMetaSignals(QObject):
+    """相册元数据统计信号"""
+    meta_ready = pyqtSignal(dict)  # {文件夹名: 元数据}
+    finished = pyqtSignal()
+
+
+class AlbumMetadataWorker(QRunnable):
+    """后台统计相册的修改时间、占用空间和平均分辨率（只读图片文件头），文件夹未变化的相册跳过"""
+    BATCH_SIZE = 200
+    SAVE_INTERVAL = 60  # 秒，统计过程中保存已有结果的间隔
+
+    def __init__(self, albums, known_signatures):
+        super().__init__()
+        # [(文件夹名, 文件夹路径, 图片路径列表)]
+        self.albums = albums
+        # 文件夹名 -> 签名（文件夹修改时间和图片数量），一致时跳过
+        self.known_signatures = known_signatures
+        self.signals = AlbumMetaSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    @staticmethod
+    def album_signature(folder, image_count):
+        return [os.stat(folder).st_mtime, image_count]
+
+    @staticmethod
+    def collect(folder, images):
+        """统计单个相册，返回元数据字典"""
+        size = 0
+        pixels = 0
+        measured = 0
+        for path in images:
+            try:
+                size += os.stat(path).st_size
+            except OSError:
+                continue
+            dimensions = QImageReader(path).size()
+            if dimensions.isValid():
+                pixels += dimensions.width() * dimensions.height()
+                measured += 1
+        return {
+            'sig': AlbumMetadataWorker.album_signature(folder, len(images)),
+            'mtime': os.stat(folder).st_mtime,
+            'size': size,
+            'pixels': pixels // measured if measured else 0,
+        }
+
+    @pyqtSlot()
+    def run(self):
+        batch = {}
+        for name, folder, images in self.albums:
+            if self.cancelled:
+                break
+            try:
+                if self.known_signatures.get(name) == self.album_signature(folder, len(images)):
+                    continue
+                batch[name] = self.collect(folder, images)
+            except OSError:
+                continue
+            if len(batch) >= self.BATCH_SIZE:
+                self.signals.meta_ready.emit(batch)
+                batch = {}
+        if batch:
+            self.signals.meta_ready.emit(batch)
+        self.signals.finished.emit()
+
+
+class AlbumSearchIndex:
+    """相册的内存搜索索引：名称和来源域名的前缀/三元组（trigram）匹配，以及域名、图片数量、日期过滤
+
+    查询语法（空格分隔，条件之间为"且"）：
+        普通词            名称或域名包含该词（不少于3个字符用三元组查找词；更短的词和纯数字按词前缀匹配）
+        domain:sspai      来源域名包含sspai
+        count:>20         图片数量，支持 > >= < <= = 以及范围 10-20
+        date:2024-03      下载日期，支持 年 / 年-月 / 年-月-日 以及范围 2024-01..2024-03（任一端可省略）
+    名称和域名拆成词，倒排表为 词 -> 相册路径集合，三元组只对不重复的非数字词建立
+    （文件夹名中的时间戳每个相册都不同，建三元组代价大，数字按前缀匹配已足够）；
+    域名、图片数量和下载时间（按小时分桶）各有一个 值 -> 路径集合 的表，过滤条件都是集合运算。
+    文件夹名中没有时间戳的相册以后台统计的文件夹修改时间作为下载时间（置顶排序键不是下载时间）。
+    sync()只处理新增、移除、图片数量变化和下载时间变化（元数据统计完成）的相册，不访问磁盘。
+    """
+    TOKEN_SPLIT = re.compile(r'[\W_]+')
+    # 文件夹名末尾的下载时间：域名_时间戳 或 域名_时间戳_序号
+    FOLDER_TIME = re.compile(r'_(\d{9,10})(?:_\d+)?$')
+    URL_HOST = re.compile(r'^[a-z][a-z0-9+.-]*://(?:[^@/?#]*@)?([^/?#:]+)', re.IGNORECASE)
+    # 比较（>20）和范围（10-20）二选一，>10-20 这类组合视为格式错误
+    COUNT_FILTER = re.compile(r'^(?:(>=|<=|>|<|=)?(\d+)|(\d+)-(\d+))$')
+    COMPARE = {'>': lambda c, n: c > n, '>=': lambda c, n: c >= n, '<': lambda c, n: c < n,
+               '<=': lambda c, n: c <= n, None: lambda c, n: c == n, '=': lambda c, n: c == n}
+
+    def __init__(self):
+        self.entries = {}   # 路径 -> {'text', 'tokens', 'domain', 'time', 'named', 'count'}
+        self.postings = {}  # 词 -> 路径集合
+        self.token_trigrams = {}  # 三元组 -> 词集合
+        self.domains = {}   # 域名 -> 路径集合
+        self.counts = {}    # 图片数量 -> 路径集合
+        self.hours = {}     # 下载时间（小时） -> 路径集合
+        self._sorted_tokens = None  # 前缀匹配用的有序词表，词表变化后在下次短词查询时重建
+
+    @staticmethod
+    def album_domain(album):
+        # 比urlparse快很多，建立索引时每个相册都要调用
+        match = AlbumSearchIndex.URL_HOST.match(album.get('original_url') or '')
+        domain = match.group(1).lower() if match else ''
+        if not domain:
+            domain = album['name'].rsplit('_', 1)[0].lower() if '_' in album['name'] else ''
+        return domain[4:] if domain.startswith('www.') else domain
+
+    @classmethod
+    def album_time(cls, album, meta=None):
+        """相册的下载时间（秒）：优先取文件夹名末尾的时间戳，没有时取元数据中的文件夹修改时间（未统计时为0）"""
+        match = cls.FOLDER_TIME.search(album['name'])
+        if match:
+            return int(match.group(1))
+        return (meta or {}).get('mtime', 0)
+
+    @staticmethod
+    def trigrams_of(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    @staticmethod
+    def _bucket_add(table, key, path):
+        paths = table.get(key)
+        if paths is None:
+            table[key] = {path}
+        else:
+            paths.add(path)
+
+    @staticmethod
+    def _bucket_remove(table, key, path):
+        paths = table.get(key)
+        if paths is not None:
+            paths.discard(path)
+            if not paths:
+                del table[key]
+                return True
+        return False
+
+    def add(self, album, meta=None):
+        """加入或重建一个相册的条目，meta为该相册的元数据（可省略）"""
+        path = album['path']
+        if path in self.entries:
+            self.remove(path)
+        domain = self.album_domain(album)
+        text = f"{album['name']} {domain}".lower()
+        tokens = {token for token in self.TOKEN_SPLIT.split(text) if token}
+        entry = {'text': text, 'tokens': tokens, 'domain': domain, 'time': self.album_time(album, meta),
+                 'named': self.FOLDER_TIME.search(album['name']) is not None, 'count': len(album['images'])}
+        self.entries[path] = entry
+        postings, token_trigrams = self.postings, self.token_trigrams
+        for token in tokens:
+            paths = postings.get(token)
+            if paths is not None:
+                paths.add(path)
+                continue
+            postings[token] = {path}
+            self._sorted_tokens = None
+            if not token.isdigit():
+                for trigram in self.trigrams_of(token):
+                    tokens_with = token_trigrams.get(trigram)
+                    if tokens_with is None:
+                        token_trigrams[trigram] = {token}
+                    else:
+                        tokens_with.add(token)
+        self._bucket_add(self.domains, domain, path)
+        self._bucket_add(self.counts, entry['count'], path)
+        self._bucket_add(self.hours, int(entry['time'] // 3600), path)
+
+    def remove(self, path):
+        entry = self.entries.pop(path, None)
+        if entry is None:
+            return
+        for token in entry['tokens']:
+            if self._bucket_remove(self.postings, token, path) and not token.isdigit():
+                for trigram in self.trigrams_of(token):
+                    self._bucket_remove(self.token_trigrams, trigram, token)
+                self._sorted_tokens = None
+        self._bucket_remove(self.domains, entry['domain'], path)
+        self._bucket_remove(self.counts, entry['count'], path)
+        self._bucket_remove(self.hours, int(entry['time'] // 3600), path)
+
+    def sync(self, albums, meta=None):
+        """与相册列表同步：只增删变化的相册，已有相册只更新图片数量和下载时间
+
+        meta为 文件夹名 -> 元数据 的字典（AlbumCatalog.meta），文件夹名中没有时间戳的相册从中取下载时间，
+        元数据统计完成或文件夹重建后时间变化的条目重新分桶。
+        """
+        meta = meta or {}
+        current = {album['path']: album for album in albums}
+        for path in [path for path in self.entries if path not in current]:
+            self.remove(path)
+        for path, album in current.items():
+            entry = self.entries.get(path)
+            if entry is None:
+                self.add(album, meta.get(album['name']))
+                continue
+            if entry['count'] != len(album['images']):
+                self._bucket_remove(self.counts, entry['count'], path)
+                entry['count'] = len(album['images'])
+                self._bucket_add(self.counts, entry['count'], path)
+            if not entry['named']:
+                album_time = self.album_time(album, meta.get(album['name']))
+                if album_time != entry['time']:
+                    self._bucket_remove(self.hours, int(entry['time'] // 3600), path)
+                    entry['time'] = album_time
+                    self._bucket_add(self.hours, int(album_time // 3600), path)
+
+    def _tokens_matching(self, part):
+        """包含part的词（少于3个字符或纯数字时为以part开头的词）"""
+        if len(part) < 3 or part.isdigit():
+            if self._sorted_tokens is None:
+                self._sorted_tokens = sorted(self.postings)
+            start = bisect.bisect_left(self._sorted_tokens, part)
+            tokens = []
+            for token in self._sorted_tokens[start:]:
+                if not token.startswith(part):
+                    break
+                tokens.append(token)
+            return tokens
+        sets = sorted((self.token_trigrams.get(trigram, set()) for trigram in self.trigrams_of(part)), key=len)
+        candidates = set(sets[0])
+        for tokens in sets[1:]:
+            candidates &= tokens
+        # 三元组都命中不代表连续出现，再核对一次子串
+        return [token for token in candidates if part in token]
+
+    def _term_matches(self, term):
+        """名称或域名包含term的相册；含分隔符的查询（如site1.example）先按各部分取交集再核对整串"""
+        parts = [part for part in self.TOKEN_SPLIT.split(term) if part]
+        if not parts:
+            return set(self.entries)
+        matched = None
+        for part in sorted(parts, key=len, reverse=True):
+            paths = set()
+            for token in self._tokens_matching(part):
+                paths |= self.postings[token]
+            matched = paths if matched is None else matched & paths
+            if not matched:
+                return set()
+        if parts != [term]:
+            matched = {path for path in matched if term in self.entries[path]['text']}
+        return matched
+
+    @staticmethod
+    def parse_date(value, upper):
+        """解析 年 / 年-月 / 年-月-日，upper为True时返回该时间段的结束时间"""
+        parts = [int(p) for p in value.split('-')]
+        year, month, day = (parts + [1, 1])[:3]
+        if upper:
+            if len(parts) == 1:
+                year += 1
+            elif len(parts) == 2:
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            else:
+                return time.mktime((year, month, day, 0, 0, 0, 0, 0, -1)) + 86400
+        return time.mktime((year, month, day, 0, 0, 0, 0, 0, -1))
+
+    def _date_matches(self, low, high):
+        matched = set()
+        low_hour, high_hour = low // 3600, high // 3600
+        for hour, paths in self.hours.items():
+            if low_hour < hour < high_hour:
+                matched |= paths
+            elif low_hour <= hour <= high_hour:
+                # 边界上的小时桶逐个核对
+                matched.update(path for path in paths if low <= self.entries[path]['time'] < high)
+        return matched
+
+    def _filter_matches(self, key, value):
+        """单个过滤条件匹配的相册，格式错误时抛出ValueError"""
+        if key == 'domain':
+            matched = set()
+            for domain, paths in self.domains.items():
+                if value in domain:
+                    matched |= paths
+            return matched
+        if key == 'count':
+            match = self.COUNT_FILTER.match(value)
+            if not match:
+                raise ValueError(f"无法识别的数量条件: {value}")
+            op, number, low, high = match.groups()
+            if low is not None:
+                accept = lambda count: int(low) <= count <= int(high)
+            else:
+                accept = lambda count: self.COMPARE[op](count, int(number))
+            matched = set()
+            for count, paths in self.counts.items():
+                if accept(count):
+                    matched |= paths
+            return matched
+        start, dots, end = value.partition('..')
+        try:
+            low = self.parse_date(start, False) if start else float('-inf')
+            high = self.parse_date(end if dots else start, True) if (end or not dots) else float('inf')
+        except (ValueError, OverflowError):
+            raise ValueError(f"无法识别的日期条件: {value}")
+        return self._date_matches(low, high)
+
+    def search(self, text):
+        """返回匹配的相册路径集合，查询条件格式错误时抛出ValueError"""
+        terms, conditions = [], []
+        for part in text.lower().split():
+            key, sep, value = part.partition(':')
+            if sep and value and key in ('domain', 'count', 'date'):
+                conditions.append((key, value))
+            else:
+                terms.append(part)
+        matched = None
+        # 先算所有过滤条件（集合运算，代价低），再按从长到短的顺序匹配普通词
+        for key, value in conditions:
+            paths = self._filter_matches(key, value)
+            matched = paths if matched is None else matched & paths
+        for term in sorted(terms, key=len, reverse=True):
+            if matched is not None and not matched:
+                break
+            paths = self._term_matches(term)
+            matched = paths if matched is None else matched & paths
+        return set(self.entries) if matched is None else matched
+
+
+class TrashManager:
+    """回收区：删除只是把文件夹/文件改名移入同一文件系统上的<图片文件夹>/.trash，瞬间完成且可撤销
+
+    每次操作是一个批次（一组移动记录：原路径 -> 回收区路径），批次清单保存在.trash/manifest.json，
+    程序重启后仍可撤销或清理。真正的删除由TrashPurgeWorker在后台低优先级执行。
+    批次在第一次移动之前就以"进行中"（pending）写入清单，移动期间（进度对话框会运行事件循环，
+    定时清理可能在此时触发）不会被当作残留目录清理；回滚时移除该条目。
+    """
+    def __init__(self, root_folder):
+        self.trash_dir = os.path.join(root_folder, ".trash")
+        self.manifest_file = os.path.join(self.trash_dir, "manifest.json")
+        self.lock = threading.Lock()
+        self.batches = self._load()
+
+    def _load(self):
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                batches = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # 上次运行在移动途中退出留下的批次：已移入的项目照常保留到过期后清理
+        for batch in batches.values():
+            batch.pop('pending', None)
+        return batches
+
+    def _save(self):
+        """原子写入批次清单（调用方持有锁）"""
+        os.makedirs(self.trash_dir, exist_ok=True)
+        tmp_file = self.manifest_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.batches, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+
+    @staticmethod
+    def move_paths(moves, progress=None, mover=os.rename):
+        """批量移动[(源路径, 目标路径)]：全部成功，或在任一失败时回滚已移动的项目并抛出异常
+
+        progress(已完成数)在每移动一项后调用，用于显示进度。
+        """
+        done = []
+        try:
+            for source, target in moves:
+                mover(source, target)
+                done.append((source, target))
+                if progress:
+                    progress(len(done))
+        except OSError:
+            for source, target in reversed(done):
+                try:
+                    mover(target, source)
+                except OSError as e:
+                    print(f"回滚移动失败 {target}: {e}")
+            raise
+
+    def move_to_trash(self, paths, label="", progress=None):
+        """把一组路径移入回收区，返回批次ID；任一移动失败时回滚已移动的项目并抛出异常"""
+        with self.lock:
+            batch_id = f"{int(time.time() * 1000)}_{len(self.batches)}"
+            batch_dir = os.path.join(self.trash_dir, batch_id)
+            # 批次内加序号，避免不同目录下的同名文件冲突
+            moves = [[path, os.path.join(batch_dir, f"{i}_{os.path.basename(path)}")] for i, path in enumerate(paths)]
+            # 先写入清单再移动，移动途中触发的清理不会把批次目录当作残留删除
+            self.batches[batch_id] = {'created': time.time(), 'label': label, 'dir': batch_dir, 'moves': moves,
+                                      'pending': True}
+            self._save()
+        os.makedirs(batch_dir, exist_ok=True)
+        try:
+            self.move_paths(moves, progress)
+        except OSError:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            with self.lock:
+                self.batches.pop(batch_id, None)
+                self._save()
+            raise
+        with self.lock:
+            batch = self.batches[batch_id]
+            del batch['pending']
+            # 保留时间从移动完成时算起
+            batch['created'] = time.time()
+            self._save()
+        return batch_id
+
+    def restore(self, batch_id):
+        """撤销：把批次中的项目移回原位置，返回已恢复的原路径列表"""
+        with self.lock:
+            batch = self.batches.pop(batch_id, None)
+            if batch is None:
+                return []
+            restored = []
+            for original, trash_path in batch['moves']:
+                if os.path.lexists(original) or not os.path.lexists(trash_path):
+                    print(f"无法恢复 {original}：原位置已存在或回收区中已不存在")
+                    continue
+                os.makedirs(os.path.dirname(original), exist_ok=True)
+                os.rename(trash_path, original)
+                restored.append(original)
+            shutil.rmtree(batch['dir'], ignore_errors=True)
+            self._save()
+        return restored
+
+    def is_restorable(self, batch_id):
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            return batch is not None and not batch.get('pending')
+
+    def expired_batches(self, retention_seconds):
+        """超过保留时间、可以彻底删除的批次：[(批次ID, 批次目录)]
+
+        也包括清单中已没有记录的残留目录（例如上次清理到一半被取消）；正在移入的批次不算过期。
+        """
+        now = time.time()
+        with self.lock:
+            expired = [(batch_id, batch['dir']) for batch_id, batch in self.batches.items()
+                       if not batch.get('pending') and now - batch['created'] >= retention_seconds]
+            known = set(self.batches)
+        if os.path.isdir(self.trash_dir):
+            for entry in os.scandir(self.trash_dir):
+                if entry.is_dir(follow_symlinks=False) and entry.name not in known:
+                    expired.append((entry.name, entry.path))
+        return expired
+
+    def forget(self, batch_id):
+        """批次已彻底删除，从清单中移除"""
+        with self.lock:
+            if self.batches.pop(batch_id, None) is not None:
+                self._save()
+
+
+class TrashPurgeWorker(QRunnable):
+    """后台低优先级清理回收区中过期的批次，可随时取消（已删除一半的批次下次继续）"""
+    def __init__(self, jobs):
+        super().__init__()
+        # [(回收区, [(批次ID, 批次目录)])]，可同时清理多个图片文件夹的回收区
+        self.jobs = jobs
+        self.cancelled = False
+        self.done = False
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        QThread.currentThread().setPriority(QThread.Priority.LowestPriority)
+        try:
+            self._purge()
+        finally:
+            self.done = True
+
+    def _purge(self):
+        for trash_manager, batches in self.jobs:
+            for batch_id, batch_dir in batches:
+                if self.cancelled:
+                    return
+                self._purge_batch(trash_manager, batch_id, batch_dir)
+
+    def _purge_batch(self, trash_manager, batch_id, batch_dir):
+        # 先从清单移除，之后不能再撤销，避免撤销到删了一半的相册
+        trash_manager.forget(batch_id)
+        with perf_recorder.span('trash.purge', batch=batch_id):
+            for dirpath, dirnames, filenames in os.walk(batch_dir, topdown=False):
+                for name in filenames:
+                    if self.cancelled:
+                        return
+                    try:
+                        os.remove(os.path.join(dirpath, name))
+                    except OSError as e:
+                        print(f"清理回收区失败 {name}: {e}")
+                for name in dirnames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        # 符号链接指向的目录不展开，直接删除链接本身
+                        os.unlink(path) if os.path.islink(path) else os.rmdir(path)
+                    except OSError:
+                        pass
+            try:
+                os.rmdir(batch_dir)
+            except OSError:
+                pass
+
+
 class Styles:
     CONTAINER_CARD = """
         QWidget {
@@ -1064,6 +4501,17 @@ class Styles:
         }
     """
 
+    PERF_OVERLAY = """
+        QLabel {
+            font-family: 'Courier New';
+            font-size: 11px;
+            color: #e9ecef;
+            background: rgba(33, 37, 41, 200);
+            border-radius: 6px;
+            padding: 8px;
+        }
+    """
+
     BADGE_BLUE = """
         QLabel {
             font-size: 14px;
@@ -1201,7 +4649,21 @@ class Styles:
             background: white;
             border: 1px solid #e0e0e0;
             border-radius: 8px;
-            selection-background-color: #e3f2fd;
+            selection-background-color: #e3f2fd;
+        }
+    """
+
+    SEARCH_EDIT = """
+        QLineEdit {
+            background: white;
+            border: 2px solid #e0e0e0;
+            border-radius: 8px;
+            padding: 8px 12px;
+            font-size: 14px;
+            min-width: 260px;
+        }
+        QLineEdit:focus {
+            border-color: #4fc3f7;
         }
     """
 
@@ -1220,6 +4682,16 @@ class Styles:
         }
     """
 
+    IMAGE_LABEL_SELECTED = """
+        QLabel {
+            border: 3px solid #1e88e5;
+            border-radius: 12px;
+            background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                stop:0 #e3f2fd, stop:1 #bbdefb);
+            padding: 7px;
+        }
+    """
+
     IMAGE_LABEL_ERROR = """
         QLabel {
             border: 2px solid #ffcdd2;
@@ -1243,6 +4715,16 @@ class Styles:
         }
     """
 
+    THUMB_SELECTED = """
+        QLabel {
+            border: 3px solid #1e88e5;
+            border-radius: 8px;
+            background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                stop:0 #e3f2fd, stop:1 #bbdefb);
+            padding: 4px;
+        }
+    """
+
     THUMB_NORMAL = """
         QLabel {
             border: 2px solid #e0e0e0;
@@ -1255,6 +4737,8 @@ class Styles:
 
 class ClickableLabel(QLabel):
     clicked = pyqtSignal(int)
+    # 按住Ctrl（macOS为Cmd）或Shift点击时发出，用于多选：(索引, 是否Shift范围选择)
+    select_clicked = pyqtSignal(int, bool)
 
     def __init__(self, index: int = -1, parent=None):
         super().__init__(parent)
@@ -1265,7 +4749,11 @@ class ClickableLabel(QLabel):
 
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
-            self.clicked.emit(self._index)
+            modifiers = event.modifiers()
+            if modifiers & (Qt.KeyboardModifier.ControlModifier | Qt.KeyboardModifier.ShiftModifier):
+                self.select_clicked.emit(self._index, bool(modifiers & Qt.KeyboardModifier.ShiftModifier))
+            else:
+                self.clicked.emit(self._index)
         super().mousePressEvent(event)
 
 
@@ -1285,12 +4773,20 @@ class MyApp(QMainWindow):
     def __init__(self):
         super().__init__()
         
-        # 初始化配置管理器
+        # 初始化配置管理器（配置变化时只应用变化的部分）
         self.config_manager = ConfigManager()
+        self.config_manager.config_changed.connect(self.apply_config_changes)
         config = self.config_manager.load_config()
+        # 尽早开启性能统计，以便记录启动时的相册扫描
+        perf_recorder.enabled = config.get('perf_enabled', False) or perf_recorder.enabled
         self.image_folder = config.get('image_folder', '/Users/jiangjie/Downloads/img')
         self.items_per_page = config.get('items_per_page', 9)
         self.cache_max_mb = config.get('cache_size_gb', 1) * 1024  # 转换为MB
+        # 排序目录：置顶只更新排序键，不改名文件夹和文件；相册排序方式可在工具栏切换
+        self.catalog = AlbumCatalog(self.image_folder)
+        self.album_sort = config.get('album_sort', 'time')
+        self.metadata_worker = None
+        self.meta_saved_at = time.time()
         
         # 支持的图片格式
         self.image_extensions = ['*.jpg', '*.jpeg', '*.png', '*.gif', '*.bmp', '*.webp', '*.jfif']
@@ -1302,9 +4798,23 @@ class MyApp(QMainWindow):
         # 相册（子目录）列表
         self.albums = self.load_albums()
         self.total_pages = math.ceil(len(self.albums) / self.items_per_page)
+        # 搜索索引（第一次搜索时建立，之后随相册列表增量同步）与过滤后的视图
+        self.search_index = AlbumSearchIndex()
+        self.search_text = ""
+        self.visible_albums = None  # 过滤后视图中的相册索引，None表示全部相册
         
         # 线程池用于并行加载图片
         self.thread_pool = QThreadPool()
+        # 后台任务线程池（单线程），避免与交互式图片加载争抢线程
+        self.background_pool = QThreadPool()
+        self.background_pool.setMaxThreadCount(1)
+        # 回收区清理单独一个线程池，不必排在整库的哈希和元数据统计之后
+        self.purge_pool = QThreadPool()
+        self.purge_pool.setMaxThreadCount(1)
+        # 感知哈希索引，用于查找相似图片
+        self.hash_index = ImageHashIndex()
+        self.hash_worker = None
+        self.similar_max_distance = config.get('similar_max_distance', 10)
         # 保存当前页面标签，按全局索引映射
         self.label_by_index = {}
         # 图片缓存（FIFO）：按(路径, 目标宽, 目标高)缓存缩放后的QPixmap
@@ -1316,6 +4826,11 @@ class MyApp(QMainWindow):
         self.current_image_index: int = -1
         # 缩略图标签列表，用于更新高亮状态
         self.thumb_labels: list[ClickableLabel] = []
+        # 多选（Ctrl/Shift点击）：按路径记录，翻页、置顶后仍然有效；锚点用于Shift范围选择
+        self.selected_albums: set[str] = set()
+        self.selected_images: set[str] = set()
+        self.album_anchor: int = -1
+        self.image_anchor: int = -1
         
         # UI组件
         self.folder_button = None
@@ -1323,13 +4838,168 @@ class MyApp(QMainWindow):
         # 粘贴板监听和图片下载
         self.clipboard_monitor = ClipboardMonitor()
         self.clipboard_monitor.clipboard_changed.connect(self.on_clipboard_url)
-        self.web_scraper = WebScraper()
+        self.web_scraper = WebScraper(HttpCache(), config.get('max_image_width', 0))
+        self.gallery_crawler = GalleryCrawler(self.web_scraper)
+        # 剪贴板URL的域名匹配器
+        self.domain_matcher = DomainMatcher(config.get('xpath_configs', []))
         self.image_downloader = None
         self.ignored_urls = set()  # 本次程序运行期间忽略的URL
+        # 下载重试策略与按主机熔断器（所有下载任务共享）
+        self.retry_policy = RetryPolicy()
+        self.host_breaker = HostCircuitBreaker()
+        # 按域名限速
+        self.rate_limiter = DownloadRateLimiter()
+        self.rate_limiter.configure(config.get('xpath_configs', []), config.get('download_global_kbps', 0))
+        # 下载前预检（与下载共用按域名限速）
+        self.image_probe = ImageProbe(self.web_scraper, self.rate_limiter)
+        self.image_probe.configure(config)
+        # 网页提取与预检在后台进行，按网址记录进行中的任务
+        self.extract_pool = QThreadPool()
+        self.extract_pool.setMaxThreadCount(2)
+        self.extract_workers = {}
+        # 持久化下载队列
+        self.download_queue = DownloadQueue(
+            max_jobs=config.get('download_max_jobs', 3),
+            retry_policy=self.retry_policy,
+            circuit_breaker=self.host_breaker,
+            rate_limiter=self.rate_limiter)
+        self.download_queue.job_finished.connect(self.on_download_finished)
+        self.download_queue_dialog = None
 
         self.setup_ui()
+        # 性能统计浮层（F12切换），启用统计时定时采样线程池占用
+        self.perf_overlay = QLabel(self)
+        self.perf_overlay.setStyleSheet(Styles.PERF_OVERLAY)
+        self.perf_overlay.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.perf_overlay.hide()
+        self.perf_timer = QTimer(self)
+        self.perf_timer.setInterval(500)
+        self.perf_timer.timeout.connect(self.update_perf_overlay)
+        QShortcut(QKeySequence("F12"), self, self.toggle_perf_overlay)
+        self.set_perf_enabled(perf_recorder.enabled)
+        # 回收区：删除相册只是移入.trash，可撤销；过期后在后台彻底删除
+        self.trash_manager = TrashManager(self.image_folder)
+        self.trash_retention = config.get('trash_retention_minutes', 30) * 60
+        # [{'batch': 批次ID, 'albums': [相册], 'images': 图片删除记录或None, 'label': 描述, ...}]
+        self.undo_stack = []
+        self.purge_worker = None
+        self.undo_button = QPushButton("↩️ 撤销删除")
+        self.undo_button.setStyleSheet(Styles.BUTTON_SECONDARY)
+        self.undo_button.clicked.connect(self.undo_last_delete)
+        self.undo_button.hide()
+        self.statusBar().addPermanentWidget(self.undo_button)
+        self.purge_timer = QTimer(self)
+        self.purge_timer.setInterval(60 * 1000)
+        self.purge_timer.timeout.connect(self.purge_trash)
+        self.purge_timer.start()
+        QTimer.singleShot(5000, self.purge_trash)
+        # GUI线程卡顿看门狗（记录到滚动日志，统计面板中可查看摘要）
+        self.stall_watchdog = StallWatchdog(config.get('stall_threshold_ms', 250), parent=self)
+        self.stall_watchdog.start()
         # 设置窗口标题（相册数量）
         self.setWindowTitle(f"🖼️ 图片分页展示 - 共{len(self.albums)}个相册")
+        # 启动后稍后在后台统计相册元数据、建立哈希索引
+        QTimer.singleShot(1000, self.start_metadata_scan)
+        QTimer.singleShot(2000, self.start_hash_indexing)
+        # 继续上次未完成的下载任务
+        QTimer.singleShot(0, self.download_queue.resume)
+
+    def start_hash_indexing(self):
+        """在后台为所有相册图片计算感知哈希"""
+        if self.hash_worker is not None:
+            self.hash_worker.cancel()
+        self.hash_worker = ImageHashWorker(self.hash_index, [album['images'] for album in self.albums])
+        self.hash_worker.signals.index_loaded.connect(self.hash_index.install)
+        self.hash_worker.signals.hashes_ready.connect(self.on_hashes_ready)
+        self.hash_worker.signals.hashes_removed.connect(self.hash_index.remove)
+        self.background_pool.start(self.hash_worker)
+
+    def start_metadata_scan(self):
+        """在后台统计相册元数据（只处理新增或有变化的相册），用于按修改时间/空间/分辨率排序"""
+        if self.metadata_worker is not None:
+            self.metadata_worker.cancel()
+        albums = [(album['name'], album['path'], list(album['images'])) for album in self.albums]
+        known = {name: meta.get('sig') for name, meta in self.catalog.meta.items()}
+        worker = AlbumMetadataWorker(albums, known)
+        catalog = self.catalog  # 统计结果属于开始统计时的图片文件夹
+        worker.signals.meta_ready.connect(lambda batch: self.on_meta_ready(catalog, batch))
+        worker.signals.finished.connect(lambda: self.on_metadata_finished(worker))
+        self.metadata_worker = worker
+        self.meta_saved_at = time.time()
+        self.background_pool.start(worker)
+
+    def on_meta_ready(self, catalog, batch):
+        """写入一批元数据，统计大图库时定期保存，中途退出或崩溃不必从头统计"""
+        catalog.update_meta(batch)
+        if time.time() - self.meta_saved_at > AlbumMetadataWorker.SAVE_INTERVAL:
+            catalog.save_meta()
+            self.meta_saved_at = time.time()
+
+    def on_metadata_finished(self, worker):
+        """元数据统计完成：保存，当前排序方式依赖元数据时重新排序一次（文件夹名中没有时间戳的相册按修改时间排序和过滤）"""
+        self.catalog.save_meta()
+        if worker is not self.metadata_worker:
+            return  # 已被新的统计任务取代
+        self.metadata_worker = None
+        if self.album_sort in (*AlbumCatalog.META_SORT_MODES, 'time', 'domain'):
+            self.sort_albums()
+        elif self.search_text:
+            self.refresh_pagination()
+
+    def sort_albums(self):
+        """按当前排序方式在内存中重排相册（排序键都已缓存，不访问磁盘），保持当前打开的相册"""
+        current = self.albums[self.current_album_index] if 0 <= self.current_album_index < len(self.albums) else None
+        with perf_recorder.span('albums.sort'):
+            self.catalog.sort_albums(self.albums, self.album_sort)
+        if current is not None:
+            self.current_album_index = next(i for i, album in enumerate(self.albums) if album is current)
+        self.refresh_pagination()
+
+    def on_sort_changed(self, index):
+        mode = self.sort_combo.itemData(index)
+        if mode and mode != self.album_sort:
+            # 保存后由config_changed信号应用
+            self.config_manager.set('album_sort', mode)
+
+    def on_hashes_ready(self, batch):
+        """后台哈希结果写入索引"""
+        for path, signature, value in batch:
+            self.hash_index.add(path, signature, value)
+
+    def show_similar_images(self, thumb_index: int):
+        """查找并显示与指定缩略图相似的图片"""
+        if self.current_album_index < 0:
+            return
+        images = self.albums[self.current_album_index]['images']
+        if thumb_index < 0 or thumb_index >= len(images):
+            return
+        path = images[thumb_index]
+        try:
+            signature = ImageHashIndex.file_signature(path)
+            if not self.hash_index.is_current(path, signature):
+                value = PerceptualHasher.hash_file(path)
+                if value is not None:
+                    self.hash_index.add(path, signature, value)
+        except OSError as e:
+            print(f"计算图片哈希失败: {e}")
+        results = self.hash_index.find_similar(path, self.similar_max_distance)
+        # 过滤已不存在的文件
+        results = [(d, p) for d, p in results if os.path.exists(p)][:100]
+        if not results:
+            QMessageBox.information(self, "相似图片", "没有找到相似的图片（后台索引可能仍在建立中）")
+            return
+        dialog = SimilarImagesDialog(path, results, self)
+        dialog.image_activated.connect(self.open_image_in_detail)
+        dialog.exec()
+
+    def open_image_in_detail(self, image_path: str):
+        """在详情页打开指定路径的图片"""
+        for album_index, album in enumerate(self.albums):
+            if image_path in album['images']:
+                self.current_album_index = album_index
+                self.current_image_index = album['images'].index(image_path)
+                self.show_detail_page()
+                return
 
     def on_clipboard_url(self, url):
         """处理粘贴板中的URL"""
@@ -1337,157 +5007,274 @@ class MyApp(QMainWindow):
         if url in self.ignored_urls:
             return
         
-        # 获取XPath配置
-        config = self.config_manager.load_config()
-        xpath_configs = config.get('xpath_configs', [])
-        
-        # 检查URL是否匹配任何配置的域名
-        matched_config = None
-        for xpath_config in xpath_configs:
-            domain = xpath_config.get('domain', '')
-            if domain and domain in url:
-                matched_config = xpath_config
-                break
-        
-        if not matched_config:
+        # 按主机名匹配配置的域名（匹配器在配置变化时重建）
+        matched_configs = self.domain_matcher.match(url)
+        if not matched_configs:
             return
         
         # 异步处理URL
-        QTimer.singleShot(100, lambda: self.process_url(url, matched_config))
+        QTimer.singleShot(100, lambda: self.process_url(url, matched_configs))
     
-    def process_url(self, url, xpath_config):
-        """处理URL，提取图片并询问是否下载"""
-        try:
-            # 获取网页内容
-            html_content = self.web_scraper.get_webpage_content(url)
-            if not html_content:
-                return
-            
-            # 提取图片URL
-            xpath = xpath_config.get('xpath', '')
-            image_urls = self.web_scraper.extract_images_by_xpath(html_content, xpath)
-            
-            if not image_urls:
-                return
-            
-            # 显示下载确认对话框
-            dialog = DownloadConfirmDialog(url, len(image_urls), self)
-            if dialog.should_download():
-                self.download_images(url, image_urls)
-            elif dialog.dont_ask_again():
-                self.ignored_urls.add(url)
-                
-        except Exception as e:
-            print(f"处理URL失败: {e}")
+    def process_url(self, url, xpath_configs):
+        """处理URL：在后台提取图片并预检，完成后询问是否下载"""
+        if url in self.extract_workers:
+            return
+        worker = UrlExtractWorker(url, xpath_configs, self.gallery_crawler, self.image_probe)
+        worker.signals.progress.connect(self.on_extract_progress)
+        worker.signals.finished.connect(self.on_extract_finished)
+        self.extract_workers[url] = worker
+        self.statusBar().showMessage(f"正在提取图片: {url}")
+        self.extract_pool.start(worker)
+    
+    def on_extract_progress(self, url, found_count):
+        """提取进度（流式解析和分页抓取时逐批更新）"""
+        if url in self.extract_workers:
+            self.statusBar().showMessage(f"正在提取图片: {url}（已找到 {found_count} 张）")
+    
+    def on_extract_finished(self, url, image_urls, filtered_count):
+        """提取与预检完成，询问是否下载"""
+        if self.extract_workers.pop(url, None) is None:
+            return
+        self.statusBar().clearMessage()
+        if not image_urls:
+            if filtered_count:
+                self.statusBar().showMessage(f"已过滤全部 {filtered_count} 张图片（小图或非图片）", 8000)
+            return
+        
+        # 显示下载确认对话框
+        dialog = DownloadConfirmDialog(url, len(image_urls), self, filtered_count)
+        if dialog.should_download():
+            self.download_images(url, image_urls)
+        elif dialog.dont_ask_again():
+            self.ignored_urls.add(url)
     
     def download_images(self, url, image_urls):
         """下载图片（多线程版本）"""
         try:
             # 获取配置
-            config = self.config_manager.load_config()
-            base_folder = config.get('image_folder', '/Users/jiangjie/Downloads/img')
-            
-            # 生成文件夹名称：域名+时间戳
-            parsed_url = urlparse(url)
-            domain = parsed_url.netloc.replace('www.', '')
-            timestamp = int(time.time())
-            folder_name = f"{domain}_{timestamp}"
-            
-            # 创建下载文件夹
-            download_folder = os.path.join(base_folder, folder_name)
-            os.makedirs(download_folder, exist_ok=True)
-            
-            # 显示进度对话框
-            self.progress_dialog = DownloadProgressDialog(len(image_urls), self)
-            
-            # 创建下载工作线程
-            self.download_worker = ImageDownloadWorker(image_urls, download_folder, url, url)
+            base_folder = self.config_manager.get_str('image_folder', '/Users/jiangjie/Downloads/img')
             
-            # 连接信号
-            self.download_worker.signals.progress.connect(self.progress_dialog.update_progress)
-            self.download_worker.signals.finished.connect(self.on_download_finished)
-            self.download_worker.signals.error.connect(self.on_download_error)
+            # 创建下载文件夹：域名+时间戳
+            download_folder = ImageDownloadWorker.make_album_folder(base_folder, url)
             
-            # 启动下载线程
-            self.thread_pool.start(self.download_worker)
-            
-            # 显示进度对话框
-            self.progress_dialog.show()
+            # 加入下载队列并显示队列面板
+            self.download_queue.enqueue(url, image_urls, download_folder)
+            self.show_download_queue()
                 
         except Exception as e:
             QMessageBox.critical(self, "下载错误", f"启动下载时发生错误: {e}")
     
-    def on_download_finished(self, downloaded_files):
-        """下载完成处理"""
-        try:
-            # 关闭进度对话框
-            if hasattr(self, 'progress_dialog'):
-                self.progress_dialog.close()
-            
-            if downloaded_files:
-                # 显示成功消息
-                QMessageBox.information(
-                    self, 
-                    "下载完成", 
-                    f"成功下载 {len(downloaded_files)} 张图片"
-                )
-                
-                # 刷新相册列表
-                self.albums = self.load_albums()
-                self.total_pages = math.ceil(len(self.albums) / self.items_per_page)
-                self.current_page = 1
-                self.display_current_page()
-                self.setWindowTitle(f"🖼️ 图片分页展示 - 共{len(self.albums)}个相册")
-            else:
-                QMessageBox.warning(self, "下载失败", "没有成功下载任何图片")
-                
-        except Exception as e:
-            QMessageBox.critical(self, "处理错误", f"处理下载结果时发生错误: {e}")
-    
-    def on_download_error(self, error_message):
-        """下载错误处理"""
-        if hasattr(self, 'progress_dialog'):
-            self.progress_dialog.close()
-        QMessageBox.critical(self, "下载错误", f"下载过程中发生错误: {error_message}")
+    def show_download_queue(self):
+        """显示下载队列面板"""
+        if self.download_queue_dialog is None:
+            self.download_queue_dialog = DownloadQueueDialog(self.download_queue, self)
+        self.download_queue_dialog.show()
+        self.download_queue_dialog.raise_()
+        self.download_queue_dialog.activateWindow()
+
+    def on_download_finished(self, job_id, downloaded_files):
+        """下载任务完成处理"""
+        job = self.download_queue.jobs.get(job_id)
+        failed_count = len(job['failed']) if job else 0
+        message = f"下载完成：成功 {len(downloaded_files)} 张"
+        if failed_count:
+            message += f"，失败 {failed_count} 张（可在下载队列中重试）"
+        self.statusBar().showMessage(message, 8000)
+        
+        if downloaded_files:
+            # 刷新相册列表（搜索索引在刷新时增量同步）
+            self.albums = self.load_albums()
+            self.current_page = 1
+            self.refresh_pagination()
+            # 统计新相册的元数据（已有相册签名不变会跳过）
+            self.start_metadata_scan()
+
+    def closeEvent(self, event):
+        """退出前停止后台任务，保存下载队列、相册元数据和哈希索引"""
+        self.stall_watchdog.stop()
+        if self.purge_worker is not None:
+            self.purge_worker.cancel()
+        if self.metadata_worker is not None:
+            self.metadata_worker.cancel()
+            self.metadata_worker = None  # 迟到的finished信号不再触发重新排序
+        if self.hash_worker is not None:
+            self.hash_worker.cancel()
+        for worker in self.extract_workers.values():
+            worker.cancel()
+        self.extract_workers.clear()
+        self.download_queue.shutdown()
+        self.extract_pool.waitForDone(3000)
+        self.purge_pool.waitForDone(3000)
+        # 等后台任务停下、处理完它们排队中的信号后，保存元数据和哈希索引（合并哈希任务尚未交给GUI线程的结果）
+        self.background_pool.waitForDone(5000)
+        QCoreApplication.sendPostedEvents()
+        self.catalog.save_meta()
+        if self.hash_worker is not None:
+            self.hash_index.save(self.hash_worker.results, self.hash_worker.removed, self.hash_worker.base)
+        else:
+            self.hash_index.save()
+        super().closeEvent(event)
 
     def show_config_dialog(self):
         """显示配置对话框"""
         dialog = ConfigDialog(self.config_manager, self)
         # 在显示对话框前更新缓存使用情况
         dialog.update_cache_usage_display()
-        if dialog.exec() == QDialog.DialogCode.Accepted:
-            # 配置已更新，重新加载应用
-            self.reload_application()
+        # 保存后由config_changed信号应用变化的配置项
+        dialog.exec()
     
-    def reload_application(self):
-        """重新加载应用配置"""
-        config = self.config_manager.load_config()
-        
-        # 检查是否需要更新文件夹
-        new_folder = config.get('image_folder', self.image_folder)
-        if new_folder != self.image_folder:
-            self.image_folder = new_folder
+    def apply_config_changes(self, changed):
+        """只应用实际变化的配置项，无需重新加载整个应用"""
+        if 'xpath_configs' in changed:
+            # 重建域名匹配器
+            self.domain_matcher = DomainMatcher(changed['xpath_configs'])
+        
+        if 'xpath_configs' in changed or 'download_global_kbps' in changed:
+            # 更新下载限速
+            self.rate_limiter.configure(
+                self.config_manager.get_list('xpath_configs'),
+                self.config_manager.get_int('download_global_kbps', 0))
+        
+        if 'download_max_jobs' in changed:
+            self.download_queue.set_max_jobs(self.config_manager.get_int('download_max_jobs', 3))
+        
+        if any(key.startswith('probe_') for key in changed):
+            self.image_probe.configure(self.config_manager.load_config())
+        
+        if 'stall_threshold_ms' in changed:
+            self.stall_watchdog.threshold = self.config_manager.get_int('stall_threshold_ms', 250) / 1000.0
+        
+        if 'perf_enabled' in changed:
+            self.set_perf_enabled(changed['perf_enabled'])
+        
+        if 'max_image_width' in changed:
+            self.web_scraper.max_image_width = self.config_manager.get_int('max_image_width', 0)
+        
+        if 'similar_max_distance' in changed:
+            self.similar_max_distance = self.config_manager.get_int('similar_max_distance', 10)
+        
+        if 'cache_size_gb' in changed:
+            self.cache_max_mb = self.config_manager.get_float('cache_size_gb', 1) * 1024
+            self._cache_evict(self.cache_max_mb)
+        
+        if 'trash_retention_minutes' in changed:
+            self.trash_retention = self.config_manager.get_int('trash_retention_minutes', 30) * 60
+        
+        if 'album_sort' in changed and changed['album_sort'] != self.album_sort:
+            self.album_sort = self.config_manager.get_str('album_sort', 'time')
+            self.sort_combo.blockSignals(True)
+            self.sort_combo.setCurrentIndex(max(0, self.sort_combo.findData(self.album_sort)))
+            self.sort_combo.blockSignals(False)
+            if 'image_folder' not in changed:
+                self.sort_albums()
+            if self.album_sort in AlbumCatalog.META_SORT_MODES and self.metadata_worker is not None:
+                self.statusBar().showMessage("正在后台统计相册信息，完成后会自动重新排序", 5000)
+        
+        if 'image_folder' in changed and changed['image_folder'] != self.image_folder:
+            # 旧文件夹的回收区记下来，之后在后台清理
+            if os.path.isdir(self.trash_manager.trash_dir):
+                roots = self.config_manager.get('trash_roots', [])
+                if self.image_folder not in roots:
+                    self.config_manager.set('trash_roots', roots + [self.image_folder])
+            self.image_folder = changed['image_folder']
+            # 回收区跟随图片文件夹（撤销记录属于旧文件夹）
+            self.trash_manager = TrashManager(self.image_folder)
+            self.catalog = AlbumCatalog(self.image_folder)
+            self.undo_stack.clear()
+            self.selected_albums.clear()
+            self.update_undo_button()
             # 清空缓存
             self.pixmap_cache.clear()
             self.cache_current_mb = 0.0
-        
-        # 更新其他配置
-        new_items_per_page = config.get('items_per_page', self.items_per_page)
-        if new_items_per_page != self.items_per_page:
-            self.items_per_page = new_items_per_page
-        
-        new_cache_size_gb = config.get('cache_size_gb', self.cache_max_mb / 1024)
-        new_cache_size_mb = new_cache_size_gb * 1024
-        if new_cache_size_mb != self.cache_max_mb:
-            self.cache_max_mb = new_cache_size_mb
-        
-        # 重新加载相册
-        self.albums = self.load_albums()
-        self.total_pages = math.ceil(len(self.albums) / self.items_per_page)
+            # 重新加载相册
+            self.albums = self.load_albums()
+            self.current_page = 1
+            self.refresh_pagination()
+            # 为新文件夹统计元数据、重建哈希索引
+            QTimer.singleShot(0, self.start_metadata_scan)
+            QTimer.singleShot(0, self.start_hash_indexing)
+        elif 'items_per_page' in changed:
+            self.items_per_page = self.config_manager.get_int('items_per_page', self.items_per_page)
+            self.refresh_pagination()
+    
+    def set_perf_enabled(self, enabled):
+        """开启或关闭性能统计"""
+        perf_recorder.enabled = bool(enabled)
+        if perf_recorder.enabled:
+            self.perf_timer.start()
+        else:
+            self.perf_timer.stop()
+            self.perf_overlay.hide()
+    
+    def toggle_perf_overlay(self):
+        """显示或隐藏性能浮层"""
+        if self.perf_overlay.isVisible():
+            self.perf_overlay.hide()
+            return
+        self.perf_overlay.show()
+        self.perf_overlay.raise_()
+        self.update_perf_overlay()
+    
+    def pool_occupancy_text(self):
+        """线程池占用情况"""
+        return (f"图片线程池: {self.thread_pool.activeThreadCount()}/{self.thread_pool.maxThreadCount()}  "
+                f"后台线程池: {self.background_pool.activeThreadCount()}/{self.background_pool.maxThreadCount()}  "
+                f"缓存: {self.cache_current_mb:.0f}/{self.cache_max_mb:.0f}MB")
+    
+    def update_perf_overlay(self):
+        """采样线程池占用并刷新浮层"""
+        perf_recorder.sample('pool.image.active', self.thread_pool.activeThreadCount())
+        perf_recorder.sample('pool.background.active', self.background_pool.activeThreadCount())
+        if not self.perf_overlay.isVisible():
+            return
+        self.perf_overlay.setText(perf_recorder.summary_text(limit=8) + "\n" + self.pool_occupancy_text())
+        self.perf_overlay.adjustSize()
+        self.perf_overlay.move(self.width() - self.perf_overlay.width() - 10, 10)
+    
+    def apply_search(self):
+        """按搜索框内容过滤相册网格（只查询内存索引，不扫描磁盘）"""
+        self.search_timer.stop()
+        text = self.search_edit.text().strip()
+        if text == self.search_text:
+            return
+        self.search_text = text
         self.current_page = 1
-        
-        # 更新UI显示
-        self.total_label.setText(f"共 {len(self.albums)} 个相册")
+        self.refresh_pagination()
+
+    def update_visible_albums(self):
+        """相册列表或搜索内容变化后重新计算视图（相册增删后索引增量同步）"""
+        if not self.search_text:
+            self.visible_albums = None
+            return
+        with perf_recorder.span('search.filter'):
+            self.search_index.sync(self.albums, self.catalog.meta)
+            try:
+                matched = self.search_index.search(self.search_text)
+            except ValueError as e:
+                self.statusBar().showMessage(f"⚠️ {e}", 5000)
+                matched = set()
+            self.visible_albums = [i for i, album in enumerate(self.albums) if album['path'] in matched]
+
+    def visible_album_indices(self):
+        """当前视图中的相册索引（按显示顺序）"""
+        return range(len(self.albums)) if self.visible_albums is None else self.visible_albums
+
+    def refresh_pagination(self):
+        """重新计算页数、刷新页码下拉框和标签，并显示当前页"""
+        self.items_per_page = self.config_manager.get_int('items_per_page', self.items_per_page) or 9
+        self.update_visible_albums()
+        visible_count = len(self.visible_album_indices())
+        self.total_pages = math.ceil(visible_count / self.items_per_page)
+        self.current_page = max(1, min(self.current_page, self.total_pages))
+        self.page_combo.blockSignals(True)
+        self.page_combo.clear()
+        for i in range(1, self.total_pages + 1):
+            self.page_combo.addItem(f"第 {i} 页")
+        self.page_combo.blockSignals(False)
+        if self.visible_albums is None:
+            self.total_label.setText(f"共 {len(self.albums)} 个相册")
+        else:
+            self.total_label.setText(f"筛选出 {visible_count} / {len(self.albums)} 个相册")
         self.setWindowTitle(f"🖼️ 图片分页展示 - 共{len(self.albums)}个相册")
         self.display_current_page()
 
@@ -1496,7 +5283,26 @@ class MyApp(QMainWindow):
             return 0.0
         return (pixmap.width() * pixmap.height() * 4) / (1024 * 1024)
 
+    def _cache_evict(self, limit_mb: float):
+        """按FIFO淘汰最早插入的条目，直到占用不超过limit_mb"""
+        while self.cache_current_mb > limit_mb and self.pixmap_cache:
+            oldest_key, oldest_pix = self.pixmap_cache.popitem(last=False)
+            self.cache_current_mb -= max(0.0, self._estimate_pixmap_mb(oldest_pix))
+
+    def _cache_get(self, key: tuple):
+        """查询缓存并统计命中率，未命中返回None"""
+        cached = self.pixmap_cache.get(key)
+        if cached is not None and not cached.isNull():
+            perf_recorder.count('cache.hit')
+            return cached
+        perf_recorder.count('cache.miss')
+        return None
+
     def _cache_put(self, key: tuple, pixmap: QPixmap):
+        with perf_recorder.span('cache.put'):
+            self._cache_insert(key, pixmap)
+
+    def _cache_insert(self, key: tuple, pixmap: QPixmap):
         # 跳过无效或超过最大容量的单张图片
         new_mb = self._estimate_pixmap_mb(pixmap)
         if new_mb <= 0 or new_mb > self.cache_max_mb:
@@ -1539,23 +5345,15 @@ class MyApp(QMainWindow):
             images.extend(glob.glob(os.path.join(folder_path, ext)))
             images.extend(glob.glob(os.path.join(folder_path, ext.upper())))
         
-        # 按照时间戳排序
-        def get_timestamp_from_path(path):
+        return self.sort_images(os.path.basename(folder_path), set(images))
+
+    def sort_images(self, album_name, images):
+        """按排序键从大到小排序（置顶的在前），排序键相同则按文件名自然排序，
+        使下载序号前缀的文件保持图集原始顺序（2.jpg在10.jpg之前）"""
+        def key(path):
             filename = os.path.basename(path)
-            if filename.count('_') >= 2:  # 时间戳格式：1234567890_原文件名
-                try:
-                    first_underscore = filename.find('_')
-                    if first_underscore > 0:
-                        potential_timestamp = filename[:first_underscore]
-                        return int(potential_timestamp)
-                except ValueError:
-                    pass
-            return 0  # 没有时间戳的文件视为0
-        
-        # 按照时间戳从大到小排序（最新的在前）
-        images = list(set(images))
-        images.sort(key=get_timestamp_from_path, reverse=True)
-        return images
+            return -self.catalog.image_key(album_name, filename), AlbumCatalog.natural_key(filename)
+        return sorted(images, key=key)
 
     def get_original_url_from_folder(self, folder_path):
         """从文件夹中获取原始URL"""
@@ -1604,24 +5402,21 @@ class MyApp(QMainWindow):
 
     def load_albums(self):
         """扫描根目录子目录，构建相册列表（封面为第一张图片）"""
+        with perf_recorder.span('load_albums'):
+            return self._scan_albums()
+
+    def _scan_albums(self):
         albums = []
         if not os.path.isdir(self.image_folder):
             return albums
         for entry in os.listdir(self.image_folder):
             subdir = os.path.join(self.image_folder, entry)
-            if os.path.isdir(subdir):
+            # 跳过隐藏目录（如生成图库的.pool图片池）
+            if not entry.startswith('.') and os.path.isdir(subdir):
                 imgs = self.find_images_in_folder(subdir)
                 if imgs:
-                    # 提取时间戳用于排序
-                    timestamp = 0
-                    if entry.count('_') >= 2:  # 时间戳格式：1234567890_原名称
-                        try:
-                            first_underscore = entry.find('_')
-                            if first_underscore > 0:
-                                potential_timestamp = entry[:first_underscore]
-                                timestamp = int(potential_timestamp)
-                        except ValueError:
-                            pass  # 不是时间戳格式，保持0
+                    # 排序键：置顶时间（排序目录或旧版文件夹名前缀）
+                    timestamp = self.catalog.album_key(entry)
                     
                     # 获取原始URL
                     original_url = self.get_original_url_from_folder(subdir)
@@ -1635,8 +5430,10 @@ class MyApp(QMainWindow):
                         'original_url': original_url
                     })
         
-        # 按照时间戳从大到小排序（最新的在前）
-        albums.sort(key=lambda x: x['timestamp'], reverse=True)
+        # 清理排序目录中已不存在的相册和图片
+        self.catalog.prune(albums)
+        # 置顶的在前，其余按当前排序方式
+        self.catalog.sort_albums(albums, self.album_sort)
         return albums
     
     # 删除缓存与懒加载相关方法，改为线程并行加载
@@ -1670,9 +5467,39 @@ class MyApp(QMainWindow):
         self.total_label.setStyleSheet(Styles.BADGE_PURPLE)
         control_layout.addWidget(self.total_label)
         
+        # 搜索框：输入停顿后再过滤，避免每个按键都刷新网格
+        self.search_edit = QLineEdit()
+        self.search_edit.setStyleSheet(Styles.SEARCH_EDIT)
+        self.search_edit.setPlaceholderText("🔍 搜索相册（名称/域名）")
+        self.search_edit.setToolTip("普通词匹配名称或域名，可组合条件：\n"
+                                    "domain:sspai  count:>20  count:10-30  date:2024-03  date:2024-01..2024-06")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        self.search_edit.returnPressed.connect(self.apply_search)
+        control_layout.addWidget(self.search_edit)
+        
+        # 相册排序方式
+        self.sort_combo = QComboBox()
+        self.sort_combo.setStyleSheet(Styles.COMBOBOX)
+        for mode, label in AlbumCatalog.SORT_MODES:
+            self.sort_combo.addItem(label, mode)
+        self.sort_combo.setCurrentIndex(max(0, self.sort_combo.findData(self.album_sort)))
+        self.sort_combo.currentIndexChanged.connect(self.on_sort_changed)
+        control_layout.addWidget(self.sort_combo)
+        
         # 添加弹性空间
         control_layout.addStretch()
         
+        # 下载队列按钮
+        self.queue_button = QPushButton("⬇️ 下载队列")
+        self.queue_button.setStyleSheet(Styles.BUTTON_SECONDARY)
+        self.queue_button.clicked.connect(self.show_download_queue)
+        control_layout.addWidget(self.queue_button)
+        
         # 配置按钮
         self.config_button = QPushButton("⚙️ 配置")
         self.config_button.setStyleSheet(Styles.BUTTON_PRIMARY)
@@ -1803,13 +5630,14 @@ class MyApp(QMainWindow):
             self.image_grid.itemAt(i).widget().setParent(None)
         self.label_by_index.clear()
         
-        # 计算当前页面的数据范围（相册）
+        # 计算当前页面的数据范围（过滤后视图中的相册）
+        visible = self.visible_album_indices()
         start_idx = (self.current_page - 1) * self.items_per_page
-        end_idx = min(start_idx + self.items_per_page, len(self.albums))
+        end_idx = min(start_idx + self.items_per_page, len(visible))
         
         # 创建3x3网格显示图片
         target_size = QSize(204, 204)
-        for i, idx in enumerate(range(start_idx, end_idx)):
+        for i, idx in enumerate(visible[start_idx:end_idx]):
             row = i // 3
             col = i % 3
             
@@ -1820,6 +5648,9 @@ class MyApp(QMainWindow):
             image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
             image_label.setScaledContents(True)
             image_label.clicked.connect(self.on_album_clicked)
+            image_label.select_clicked.connect(self.on_album_select_clicked)
+            if self.albums[idx]['path'] in self.selected_albums:
+                image_label.setStyleSheet(Styles.IMAGE_LABEL_SELECTED)
             
             # 占位文本，异步加载后替换
             image_label.setText("加载中…")
@@ -1831,8 +5662,8 @@ class MyApp(QMainWindow):
             # 启动工作线程加载相册封面（带缓存）
             image_path = self.albums[idx]['cover']
             cache_key = (image_path, target_size.width(), target_size.height())
-            cached = self.pixmap_cache.get(cache_key)
-            if cached is not None and not cached.isNull():
+            cached = self._cache_get(cache_key)
+            if cached is not None:
                 image_label.setPixmap(cached)
             else:
                 worker = ImageLoadWorker(idx, image_path, target_size)
@@ -1909,6 +5740,9 @@ class MyApp(QMainWindow):
     def on_album_clicked(self, album_index: int):
         if album_index < 0 or album_index >= len(self.albums):
             return
+        self.clear_album_selection()
+        self.selected_images.clear()
+        self.image_anchor = -1
         self.current_album_index = album_index
         self.current_image_index = 0
         self.show_detail_page()
@@ -1963,13 +5797,29 @@ class MyApp(QMainWindow):
             self.scroll_to_current_thumb()
 
     def keyPressEvent(self, event):
+        if event.matches(QKeySequence.StandardKey.SelectAll):
+            # Ctrl+A：相册网格选中当前页，详情页选中全部图片
+            if self.stacked.currentIndex() == 1:
+                self.selected_images.update(self.albums[self.current_album_index]['images'])
+                self.update_thumb_highlight()
+                self.show_selection_status(len(self.selected_images), "张图片")
+            else:
+                self.selected_albums.update(self.albums[i]['path'] for i in self.label_by_index)
+                self.update_album_selection()
+            return
         if self.stacked.currentIndex() == 1:
             if event.key() in (Qt.Key.Key_Right, Qt.Key.Key_D):
                 self.detail_next()
             elif event.key() in (Qt.Key.Key_Left, Qt.Key.Key_A):
                 self.detail_prev()
+            elif event.key() == Qt.Key.Key_Escape and self.selected_images:
+                self.selected_images.clear()
+                self.update_thumb_highlight()
+                self.statusBar().clearMessage()
             elif event.key() in (Qt.Key.Key_Escape, Qt.Key.Key_Backspace):
                 self.detail_back()
+        elif event.key() == Qt.Key.Key_Escape and self.selected_albums:
+            self.clear_album_selection()
         super().keyPressEvent(event)
 
     def update_detail_image(self):
@@ -1982,8 +5832,8 @@ class MyApp(QMainWindow):
         size = self.detail_label.size()
         target_size = QSize(max(200, size.width() - 30), max(150, size.height() - 30))
         cache_key = (image_path, target_size.width(), target_size.height())
-        cached = self.pixmap_cache.get(cache_key)
-        if cached is not None and not cached.isNull():
+        cached = self._cache_get(cache_key)
+        if cached is not None:
             self.detail_label.setPixmap(cached)
             return
         self.detail_label.setText("加载中…")
@@ -2017,6 +5867,7 @@ class MyApp(QMainWindow):
             lbl.setStyleSheet(Styles.THUMB_NORMAL)
             lbl.setText("···")
             lbl.clicked.connect(self.on_thumb_clicked)
+            lbl.select_clicked.connect(self.on_thumb_select_clicked)
             lbl.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
             def _make_ctx(label_ref=lbl, index=idx):
                 def _ctx_menu(pos):
@@ -2027,16 +5878,17 @@ class MyApp(QMainWindow):
             self.thumb_labels.append(lbl)
 
             key = (path, thumb_size.width(), thumb_size.height())
-            cached = self.pixmap_cache.get(key)
-            if cached is not None and not cached.isNull():
+            cached = self._cache_get(key)
+            if cached is not None:
                 lbl.setPixmap(cached)
             else:
                 worker = ImageLoadWorker(-1000 - idx, path, thumb_size)
-                def _make_handler(label_ref=lbl, k=key):
+                def _make_handler(label_ref=lbl, k=key, image_path=path):
                     def _handler(_, pm: QPixmap):
                         if not pm.isNull():
                             self._cache_put(k, pm)
                             label_ref.setPixmap(pm)
+                            self.index_thumbnail_hash(image_path, pm)
                     return _handler
                 worker.signals.imageLoaded.connect(_make_handler())
                 self.thread_pool.start(worker)
@@ -2044,15 +5896,31 @@ class MyApp(QMainWindow):
         # 设置当前图片的高亮
         self.update_thumb_highlight()
 
+    def index_thumbnail_hash(self, image_path: str, pixmap: QPixmap):
+        """利用已解码的缩略图顺带计算感知哈希"""
+        try:
+            signature = ImageHashIndex.file_signature(image_path)
+        except OSError:
+            return
+        if self.hash_index.is_current(image_path, signature):
+            return
+        value = PerceptualHasher.dhash(pixmap.toImage())
+        if value is not None:
+            self.hash_index.add(image_path, signature, value)
+
     def update_thumb_highlight(self):
-        """更新缩略图的高亮状态"""
+        """更新缩略图的高亮状态（当前图片优先于选中状态）"""
+        images = self.albums[self.current_album_index]['images'] if self.current_album_index >= 0 else []
         for i, label in enumerate(self.thumb_labels):
             if i == self.current_image_index:
                 label.setStyleSheet(Styles.THUMB_ACTIVE)
+            elif i < len(images) and images[i] in self.selected_images:
+                label.setStyleSheet(Styles.THUMB_SELECTED)
             else:
                 label.setStyleSheet(Styles.THUMB_NORMAL)
 
     def on_thumb_clicked(self, thumb_index: int):
+        self.selected_images.clear()
         self.current_image_index = thumb_index
         self.update_detail_image()
         self.update_thumb_highlight()
@@ -2095,7 +5963,10 @@ class MyApp(QMainWindow):
         menu.exec(self.detail_label.mapToGlobal(pos))
 
     def on_album_cover_context_menu(self, album_index: int, global_pos: QPoint):
-        """相册封面的右键菜单"""
+        """相册封面的右键菜单（在选中的相册上右键时为批量操作菜单）"""
+        if album_index < len(self.albums) and self.albums[album_index]['path'] in self.selected_albums:
+            self.show_album_batch_menu(global_pos)
+            return
         menu = QMenu(self)
         
         # 置顶选项
@@ -2117,6 +5988,12 @@ class MyApp(QMainWindow):
                 jump_action.triggered.connect(_do_jump)
                 menu.addAction(jump_action)
         
+        move_action = QAction("📁 移动相册到…", self)
+        def _do_move():
+            self.move_albums([album_index])
+        move_action.triggered.connect(_do_move)
+        menu.addAction(move_action)
+        
         # 分隔线
         menu.addSeparator()
         
@@ -2131,155 +6008,554 @@ class MyApp(QMainWindow):
         
         menu.exec(global_pos)
 
-    def pin_album_to_first(self, album_index: int):
-        """将相册置顶到第一位"""
+    def show_album_batch_menu(self, global_pos: QPoint):
+        """选中相册的批量操作菜单"""
+        indices = self.selected_album_indices()
+        menu = QMenu(self)
+        pin_action = QAction(f"置顶所选 {len(indices)} 个相册", self)
+        pin_action.triggered.connect(lambda: self.pin_albums(indices))
+        menu.addAction(pin_action)
+        move_action = QAction(f"📁 移动所选 {len(indices)} 个相册到…", self)
+        move_action.triggered.connect(lambda: self.move_albums(indices))
+        menu.addAction(move_action)
+        clear_action = QAction("取消选择", self)
+        clear_action.triggered.connect(self.clear_album_selection)
+        menu.addAction(clear_action)
+        menu.addSeparator()
+        delete_action = QAction(f"🗑️ 删除所选 {len(indices)} 个相册", self)
+        delete_action.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_DialogCancelButton))
+        delete_action.triggered.connect(lambda: self.delete_albums(indices))
+        menu.addAction(delete_action)
+        menu.exec(global_pos)
+
+    def on_album_select_clicked(self, album_index: int, extend: bool):
+        """Ctrl点击切换相册的选中状态，Shift点击选中从上次点击的相册到当前相册的范围"""
         if album_index < 0 or album_index >= len(self.albums):
             return
-        
-        album = self.albums[album_index]
-        album_name = album['name']
-        album_path = album['path']
-        
-        # 获取父目录
-        parent_dir = os.path.dirname(album_path)
-        
-        # 生成当前时间戳（毫秒级，确保唯一性）
-        import time
-        timestamp = int(time.time() * 1000)
-        
-        # 如果当前文件夹已经有时间戳前缀，先去掉
-        original_name = album_name
-        if album_name.count('_') >= 2:  # 时间戳格式：1234567890_原名称
-            try:
-                # 检查第一个下划线前是否是数字（时间戳）
-                first_underscore = album_name.find('_')
-                if first_underscore > 0:
-                    potential_timestamp = album_name[:first_underscore]
-                    int(potential_timestamp)  # 如果能转换为整数，说明是时间戳
-                    original_name = album_name[first_underscore + 1:]  # 去掉时间戳前缀
-            except ValueError:
-                pass  # 不是时间戳格式，保持原名
-        
-        # 生成新的文件夹名：时间戳_原名称
-        new_name = f"{timestamp}_{original_name}"
-        
+        visible = self.visible_album_indices()
+        if extend and self.album_anchor in visible:
+            # 范围按当前视图计算，不会选中被搜索过滤掉的相册
+            low, high = sorted((visible.index(self.album_anchor), visible.index(album_index)))
+            self.selected_albums.update(self.albums[i]['path'] for i in visible[low:high + 1])
+        else:
+            path = self.albums[album_index]['path']
+            if path in self.selected_albums:
+                self.selected_albums.discard(path)
+            else:
+                self.selected_albums.add(path)
+            self.album_anchor = album_index
+        self.update_album_selection()
+
+    def selected_album_indices(self):
+        """选中相册在当前列表中的索引（升序）"""
+        return [i for i, album in enumerate(self.albums) if album['path'] in self.selected_albums]
+
+    def clear_album_selection(self):
+        if self.selected_albums:
+            self.selected_albums.clear()
+            self.update_album_selection()
+            self.statusBar().clearMessage()
+        self.album_anchor = -1
+
+    def update_album_selection(self):
+        """只更新当前页封面的边框样式，不重新加载图片"""
+        for idx, label in self.label_by_index.items():
+            if self.albums[idx]['path'] in self.selected_albums:
+                label.setStyleSheet(Styles.IMAGE_LABEL_SELECTED)
+            elif label.text().startswith("❌"):
+                label.setStyleSheet(Styles.IMAGE_LABEL_ERROR)
+            else:
+                label.setStyleSheet(Styles.IMAGE_LABEL)
+        if self.selected_albums:
+            self.show_selection_status(len(self.selected_albums), "个相册")
+
+    def show_selection_status(self, count, unit):
+        self.statusBar().showMessage(f"已选择 {count} {unit}（右键所选项目进行批量操作，Esc取消选择）")
+
+    def run_with_progress(self, title, total, action):
+        """执行批量操作action(progress)，项目较多时显示进度对话框
+
+        批量操作是一个整体（失败时整体回滚），因此进度对话框不提供取消按钮。
+        """
+        if total < 20:
+            return action(None)
+        dialog = QProgressDialog(title, "", 0, total, self)
+        dialog.setCancelButton(None)
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(300)
         try:
-            old_path = album_path
-            new_path = os.path.join(parent_dir, new_name)
-            os.rename(old_path, new_path)
-        except Exception as e:
-            QMessageBox.warning(self, "置顶失败", f"无法重命名文件夹:\n{e}")
+            return action(dialog.setValue)
+        finally:
+            dialog.close()
+            dialog.deleteLater()
+
+    def pin_album_to_first(self, album_index: int):
+        """将相册置顶到第一位"""
+        self.pin_albums([album_index])
+
+    def pin_albums(self, album_indices):
+        """置顶一组相册（保持它们之间的相对顺序）：只在排序目录中写入一次排序键并在内存中重排，
+        不改名、不重新扫描，最后只刷新一次"""
+        album_indices = sorted({i for i in album_indices if 0 <= i < len(self.albums)})
+        if not album_indices:
             return
-        
-        # 刷新相册列表
-        self.albums = self.load_albums()
-        self.total_pages = math.ceil(len(self.albums) / self.items_per_page)
-        
-        # 重新显示当前页面
+        pinned = [self.albums[i] for i in album_indices]
+        current = self.albums[self.current_album_index] if 0 <= self.current_album_index < len(self.albums) else None
+        # 新排序键大于所有已有键，相册直接移到最前
+        for album, key in zip(pinned, self.catalog.pin_albums([a['name'] for a in pinned])):
+            album['timestamp'] = key
+        chosen = set(album_indices)
+        self.albums = pinned + [album for i, album in enumerate(self.albums) if i not in chosen]
+        if current is not None:
+            self.current_album_index = next(i for i, album in enumerate(self.albums) if album is current)
+        self.clear_album_selection()
+        
+        # 重新显示当前页面（封面路径不变，缓存仍然有效）
+        self.update_visible_albums()
         self.display_current_page()
+        if len(pinned) > 1:
+            self.statusBar().showMessage(f"已置顶 {len(pinned)} 个相册", 5000)
+
+    def move_albums(self, album_indices):
+        """把一组相册文件夹移动到其他目录（整体成功或整体回滚），并从列表中移除"""
+        album_indices = sorted({i for i in album_indices if 0 <= i < len(self.albums)})
+        if not album_indices:
+            return
+        target_dir = QFileDialog.getExistingDirectory(self, "选择目标文件夹", os.path.dirname(self.image_folder))
+        if not target_dir:
+            return
+        if os.path.abspath(target_dir) == os.path.abspath(self.image_folder):
+            QMessageBox.information(self, "移动相册", "目标文件夹就是当前图片文件夹")
+            return
+        albums = [self.albums[i] for i in album_indices]
+        moves = [(album['path'], os.path.join(target_dir, album['name'])) for album in albums]
+        conflicts = [target for _, target in moves if os.path.lexists(target)]
+        if conflicts:
+            QMessageBox.warning(self, "移动失败", "目标文件夹中已存在同名文件夹:\n" + "\n".join(conflicts[:10]))
+            return
+        try:
+            # 跨文件系统时shutil.move会复制后删除，较慢，显示进度
+            self.run_with_progress(f"正在移动 {len(albums)} 个相册…", len(albums),
+                                   lambda progress: TrashManager.move_paths(moves, progress, shutil.move))
+        except OSError as e:
+            QMessageBox.critical(self, "移动失败", f"移动相册时发生错误（已撤回已移动的相册）:\n{e}")
+            return
+        for i in reversed(album_indices):
+            del self.albums[i]
+        self.selected_albums.difference_update(album['path'] for album in albums)
+        # 排序键随相册转到目标图库（目标文件夹也是图库时），哈希索引改用新路径
+        catalog_entries = self.catalog.take_albums([album['name'] for album in albums])
+        if catalog_entries and os.path.exists(os.path.join(target_dir, ".catalog.json")):
+            AlbumCatalog(target_dir).put_albums(catalog_entries)
+        self.hash_index.move([(path, os.path.join(target, os.path.basename(path)))
+                              for album, (_, target) in zip(albums, moves) for path in album['images']])
+        self.refresh_pagination()
+        self.statusBar().showMessage(f"已移动 {len(albums)} 个相册到 {target_dir}", 8000)
         
     def delete_album(self, album_index: int):
-        """删除相册"""
+        """删除相册：移入回收区并从列表中移除，无需重新扫描，可撤销"""
         if album_index < 0 or album_index >= len(self.albums):
             return
         
         album = self.albums[album_index]
         album_name = album['name']
-        album_path = album['path']
         
         # 确认删除对话框
         reply = QMessageBox.question(
             self, 
             "确认删除相册", 
-            f"确定要删除相册 '{album_name}' 吗？\n\n此操作将永久删除文件夹及其所有内容，无法恢复！",
+            f"确定要删除相册 '{album_name}' 吗？\n\n相册将移入回收区，"
+            f"{self.trash_retention // 60} 分钟内可以撤销，之后在后台彻底删除。",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             QMessageBox.StandardButton.No  # 默认选择"否"
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            try:
-                # 删除文件夹
-                import shutil
-                shutil.rmtree(album_path)
-                
-                # 重新加载相册列表
-                self.albums = self.load_albums()
-                self.total_pages = math.ceil(len(self.albums) / self.items_per_page)
-                
-                # 调整当前页面
-                if self.current_page > self.total_pages and self.total_pages > 0:
-                    self.current_page = self.total_pages
-                elif self.total_pages == 0:
-                    self.current_page = 1
-                
-                # 重新显示当前页面
-                self.display_current_page()
-                
-                # 更新窗口标题
-                self.setWindowTitle(f"🖼️ 图片分页展示 - 共{len(self.albums)}个相册")
-            except Exception as e:
-                QMessageBox.critical(
-                    self, 
-                    "删除失败", 
-                    f"删除相册时发生错误:\n{e}"
-                )
+            self.trash_albums([album_index])
+    
+    def delete_albums(self, album_indices):
+        """批量删除相册：确认一次，作为一个可撤销的批次移入回收区"""
+        if not album_indices:
+            return
+        reply = QMessageBox.question(
+            self,
+            "确认删除相册",
+            f"确定要删除所选的 {len(album_indices)} 个相册吗？\n\n相册将移入回收区，"
+            f"{self.trash_retention // 60} 分钟内可以撤销，之后在后台彻底删除。",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            self.trash_albums(album_indices)
+    
+    def trash_albums(self, album_indices):
+        """把一组相册移入回收区（一个可撤销的批次），返回是否成功"""
+        album_indices = sorted(set(album_indices))
+        albums = [self.albums[i] for i in album_indices]
+        label = albums[0]['name'] if len(albums) == 1 else f"{len(albums)} 个相册"
+        try:
+            batch_id = self.run_with_progress(
+                f"正在删除 {len(albums)} 个相册…", len(albums),
+                lambda progress: self.trash_manager.move_to_trash([a['path'] for a in albums], label, progress))
+        except OSError as e:
+            QMessageBox.critical(self, "删除失败", f"删除相册时发生错误:\n{e}")
+            return False
+        
+        # 从后往前移除，保持前面的索引不变
+        for i in reversed(album_indices):
+            del self.albums[i]
+        self.selected_albums.difference_update(album['path'] for album in albums)
+        # 排序键和元数据随相册移出，撤销时写回
+        catalog_entries = self.catalog.take_albums([album['name'] for album in albums])
+        hash_entries = self.hash_index.remove([path for album in albums for path in album['images']])
+        self.undo_stack.append({'batch': batch_id, 'albums': albums, 'images': None,
+                                'label': label, 'catalog': catalog_entries, 'hashes': hash_entries})
+        self.refresh_pagination()
+        self.update_undo_button()
+        self.statusBar().showMessage(f"已删除 {label}（可撤销）", 8000)
+        return True
+    
+    def undo_last_delete(self):
+        """撤销最近一次删除：移回原位置，按当前排序方式把相册和图片放回列表中"""
+        while self.undo_stack:
+            entry = self.undo_stack.pop()
+            if not self.trash_manager.is_restorable(entry['batch']):
+                continue  # 已被彻底删除
+            restored = set(self.trash_manager.restore(entry['batch']))
+            catalog_entries = entry.get('catalog', {})
+            restored_entries = {}
+            for album in entry['albums']:
+                if album['path'] in restored:
+                    self.albums.append(album)
+                    if album['name'] in catalog_entries:
+                        restored_entries[album['name']] = catalog_entries[album['name']]
+            self.catalog.put_albums(restored_entries)
+            if entry.get('images'):
+                self.restore_album_images(entry['images'], restored)
+            self.hash_index.restore({path: value for path, value in entry.get('hashes', {}).items()
+                                     if path in restored or os.path.dirname(path) in restored})
+            # 删除之后列表可能已经置顶、移动或重新排序，原索引已不可靠，按排序键重新排序
+            self.sort_albums()
+            self.statusBar().showMessage(f"已恢复 {entry['label']}", 5000)
+            break
+        self.update_undo_button()
+    
+    def update_undo_button(self):
+        """只有存在可撤销的删除时才显示撤销按钮"""
+        self.undo_stack = [e for e in self.undo_stack if self.trash_manager.is_restorable(e['batch'])]
+        if self.undo_stack:
+            self.undo_button.setText(f"↩️ 撤销删除 {self.undo_stack[-1]['label']}")
+            self.undo_button.show()
+        else:
+            self.undo_button.hide()
+    
+    def purge_trash(self):
+        """在后台线程池中彻底删除过期的回收区批次，以及以前的图片文件夹留下的回收区"""
+        if self.purge_worker is not None and not self.purge_worker.done:
+            return
+        jobs = []
+        batches = self.trash_manager.expired_batches(self.trash_retention)
+        if batches:
+            jobs.append((self.trash_manager, batches))
+        # 切换图片文件夹后旧回收区中的批次已不能撤销，不等保留时间全部清理，清理完后不再记录
+        roots = self.config_manager.get('trash_roots', [])
+        remaining = []
+        for root in roots:
+            if os.path.abspath(root) == os.path.abspath(self.image_folder):
+                continue
+            manager = TrashManager(root)
+            old_batches = manager.expired_batches(0)
+            if old_batches:
+                jobs.append((manager, old_batches))
+                remaining.append(root)
+        if remaining != roots:
+            self.config_manager.set('trash_roots', remaining)
+        if not jobs:
+            return
+        self.purge_worker = TrashPurgeWorker(jobs)
+        self.purge_pool.start(self.purge_worker)
+        # 过期批次已不可撤销
+        purged = {batch_id for batch_id, _ in batches}
+        self.undo_stack = [e for e in self.undo_stack if e['batch'] not in purged]
+        self.update_undo_button()
 
     def on_thumb_context_menu(self, thumb_index: int, global_pos: QPoint):
+        images = self.albums[self.current_album_index]['images']
+        if thumb_index < len(images) and images[thumb_index] in self.selected_images:
+            self.show_image_batch_menu(global_pos)
+            return
         menu = QMenu(self)
         pin_action = QAction("置顶到第一张", self)
         def _do_pin():
             self.pin_image_to_first(thumb_index)
         pin_action.triggered.connect(_do_pin)
         menu.addAction(pin_action)
+        similar_action = QAction("🔍 查找相似图片", self)
+        def _do_similar():
+            self.show_similar_images(thumb_index)
+        similar_action.triggered.connect(_do_similar)
+        menu.addAction(similar_action)
+        move_action = QAction("📁 移动到其他相册…", self)
+        move_action.triggered.connect(lambda: self.move_images([thumb_index]))
+        menu.addAction(move_action)
+        menu.addSeparator()
+        delete_action = QAction("🗑️ 删除图片", self)
+        delete_action.triggered.connect(lambda: self.delete_images([thumb_index]))
+        menu.addAction(delete_action)
+        menu.exec(global_pos)
+
+    def show_image_batch_menu(self, global_pos: QPoint):
+        """选中图片的批量操作菜单"""
+        indices = self.selected_image_indices()
+        menu = QMenu(self)
+        pin_action = QAction(f"置顶所选 {len(indices)} 张图片", self)
+        pin_action.triggered.connect(lambda: self.pin_images(indices))
+        menu.addAction(pin_action)
+        move_action = QAction(f"📁 移动所选 {len(indices)} 张图片到其他相册…", self)
+        move_action.triggered.connect(lambda: self.move_images(indices))
+        menu.addAction(move_action)
+        clear_action = QAction("取消选择", self)
+        def _do_clear():
+            self.selected_images.clear()
+            self.update_thumb_highlight()
+            self.statusBar().clearMessage()
+        clear_action.triggered.connect(_do_clear)
+        menu.addAction(clear_action)
+        menu.addSeparator()
+        delete_action = QAction(f"🗑️ 删除所选 {len(indices)} 张图片", self)
+        delete_action.triggered.connect(lambda: self.delete_images(indices))
+        menu.addAction(delete_action)
         menu.exec(global_pos)
 
+    def on_thumb_select_clicked(self, thumb_index: int, extend: bool):
+        """Ctrl点击切换图片的选中状态，Shift点击选中范围"""
+        images = self.albums[self.current_album_index]['images']
+        if thumb_index < 0 or thumb_index >= len(images):
+            return
+        if extend and 0 <= self.image_anchor < len(images):
+            low, high = sorted((self.image_anchor, thumb_index))
+            self.selected_images.update(images[low:high + 1])
+        else:
+            path = images[thumb_index]
+            if path in self.selected_images:
+                self.selected_images.discard(path)
+            else:
+                self.selected_images.add(path)
+            self.image_anchor = thumb_index
+        self.update_thumb_highlight()
+        if self.selected_images:
+            self.show_selection_status(len(self.selected_images), "张图片")
+        else:
+            self.statusBar().clearMessage()
+
+    def selected_image_indices(self):
+        """当前相册中选中图片的索引（升序）"""
+        images = self.albums[self.current_album_index]['images']
+        return [i for i, path in enumerate(images) if path in self.selected_images]
+
     def pin_image_to_first(self, thumb_index: int):
+        """将图片置顶到第一张"""
+        self.pin_images([thumb_index])
+
+    def pin_images(self, thumb_indices):
+        """置顶一组图片（保持相对顺序）：只更新排序目录，文件路径不变，已缓存的图片继续有效"""
         if self.current_album_index < 0:
             return
         album = self.albums[self.current_album_index]
         images = album['images']
-        if thumb_index < 0 or thumb_index >= len(images):
-            return
-        path = images[thumb_index]
-        folder, filename = os.path.split(path)
-        # 生成当前时间戳（毫秒级，确保唯一性）
-        import time
-        timestamp = int(time.time() * 1000)
-        
-        # 如果当前文件已经有时间戳前缀，先去掉
-        original_filename = filename
-        if filename.count('_') >= 2:  # 时间戳格式：1234567890_原文件名
-            try:
-                # 检查第一个下划线前是否是数字（时间戳）
-                first_underscore = filename.find('_')
-                if first_underscore > 0:
-                    potential_timestamp = filename[:first_underscore]
-                    int(potential_timestamp)  # 如果能转换为整数，说明是时间戳
-                    original_filename = filename[first_underscore + 1:]  # 去掉时间戳前缀
-            except ValueError:
-                pass  # 不是时间戳格式，保持原名
-        
-        # 生成新的文件名：时间戳_原文件名
-        new_filename = f"{timestamp}_{original_filename}"
-        new_path = os.path.join(folder, new_filename)
-        
-        try:
-            os.rename(path, new_path)
-        except Exception as e:
-            QMessageBox.warning(self, "置顶失败", f"无法重命名文件:\n{e}")
+        thumb_indices = sorted({i for i in thumb_indices if 0 <= i < len(images)})
+        if not thumb_indices:
             return
-        # 刷新相册图片顺序与封面
-        album['images'] = self.find_images_in_folder(folder)
-        album['cover'] = album['images'][0] if album['images'] else ''
+        pinned = [images[i] for i in thumb_indices]
+        self.catalog.pin_images(album['name'], [os.path.basename(path) for path in pinned])
+        chosen = set(thumb_indices)
+        album['images'] = pinned + [path for i, path in enumerate(images) if i not in chosen]
+        album['cover'] = album['images'][0]
+        self.selected_images.clear()
         # 当前索引调整为第一张
         self.current_image_index = 0
         # 重建缩略图与主图
         self.build_thumbnails()
         self.update_detail_image()
 
+    def remove_album_images(self, thumb_indices):
+        """从当前相册的列表中移除一组图片（文件已移走），只刷新一次；
+        相册变空时从相册列表中移除并返回网格，返回相册被移除前的索引（未移除为-1）"""
+        album = self.albums[self.current_album_index]
+        removed = set(thumb_indices)
+        current_path = album['images'][self.current_image_index] if 0 <= self.current_image_index < len(album['images']) else None
+        album['images'] = [path for i, path in enumerate(album['images']) if i not in removed]
+        self.selected_images.clear()
+        if not album['images']:
+            album_index = self.current_album_index
+            del self.albums[album_index]
+            self.current_album_index = -1
+            self.detail_back()
+            self.refresh_pagination()
+            return album_index
+        album['cover'] = album['images'][0]
+        if current_path in album['images']:
+            self.current_image_index = album['images'].index(current_path)
+        else:
+            # 当前图片被移走时停在原位置的下一张
+            self.current_image_index = min(self.current_image_index - sum(1 for i in removed if i < self.current_image_index),
+                                           len(album['images']) - 1)
+        self.build_thumbnails()
+        self.update_detail_image()
+        self.update_visible_albums()
+        self.display_current_page()
+        return -1
+
+    def delete_images(self, thumb_indices):
+        """批量删除图片：作为一个可撤销的批次移入回收区"""
+        if self.current_album_index < 0:
+            return
+        album = self.albums[self.current_album_index]
+        thumb_indices = sorted({i for i in thumb_indices if 0 <= i < len(album['images'])})
+        if not thumb_indices:
+            return
+        paths = [album['images'][i] for i in thumb_indices]
+        label = os.path.basename(paths[0]) if len(paths) == 1 else f"{len(paths)} 张图片"
+        if len(paths) > 1:
+            reply = QMessageBox.question(
+                self, "确认删除图片",
+                f"确定要删除所选的 {len(paths)} 张图片吗？\n\n图片将移入回收区，"
+                f"{self.trash_retention // 60} 分钟内可以撤销。",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No)
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+        try:
+            batch_id = self.run_with_progress(
+                f"正在删除 {len(paths)} 张图片…", len(paths),
+                lambda progress: self.trash_manager.move_to_trash(paths, label, progress))
+        except OSError as e:
+            QMessageBox.critical(self, "删除失败", f"删除图片时发生错误:\n{e}")
+            return
+        catalog_keys = self.catalog.take_images(album['name'], [os.path.basename(path) for path in paths])
+        hash_entries = self.hash_index.remove(paths)
+        removed_index = self.remove_album_images(thumb_indices)
+        # 相册因此变空被移除时，撤销需要把相册放回列表
+        self.undo_stack.append({
+            'batch': batch_id,
+            'albums': [],
+            'images': {'album': album, 'paths': paths, 'album_removed': removed_index >= 0, 'catalog': catalog_keys},
+            'label': label,
+            'hashes': hash_entries,
+        })
+        self.update_undo_button()
+        self.statusBar().showMessage(f"已删除 {label}（可撤销）", 8000)
+
+    def restore_album_images(self, record, restored):
+        """撤销删除图片：写回排序键后把恢复的图片按排序规则放回原相册（相册由调用方重新排序）"""
+        album = record['album']
+        self.catalog.put_images(album['name'], {filename: key for filename, key in record.get('catalog', {}).items()
+                                                if os.path.join(album['path'], filename) in restored})
+        album['images'] = self.sort_images(album['name'], album['images'] + [p for p in record['paths'] if p in restored])
+        if not album['images']:
+            return
+        album['cover'] = album['images'][0]
+        if record['album_removed'] and not any(a is album for a in self.albums):
+            self.albums.append(album)
+        elif (self.stacked.currentIndex() == 1 and 0 <= self.current_album_index < len(self.albums)
+              and self.albums[self.current_album_index] is album):
+            self.build_thumbnails()
 
-app = QApplication([])
-myapp = MyApp()
-myapp.show()
+    def move_images(self, thumb_indices):
+        """把一组图片移动到另一个相册（整体成功或整体回滚），两个相册都只在内存中更新"""
+        if self.current_album_index < 0:
+            return
+        album = self.albums[self.current_album_index]
+        thumb_indices = sorted({i for i in thumb_indices if 0 <= i < len(album['images'])})
+        if not thumb_indices:
+            return
+        others = [a for a in self.albums if a is not album]
+        if not others:
+            return
+        name, ok = QInputDialog.getItem(self, "移动图片", f"把 {len(thumb_indices)} 张图片移动到相册:",
+                                        [a['name'] for a in others], 0, False)
+        if not ok:
+            return
+        target = next(a for a in others if a['name'] == name)
+        moves = []
+        taken = set(os.listdir(target['path']))
+        for i in thumb_indices:
+            source = album['images'][i]
+            base, ext = os.path.splitext(os.path.basename(source))
+            filename, n = base + ext, 1
+            while filename in taken:
+                filename = f"{base}_{n}{ext}"
+                n += 1
+            taken.add(filename)
+            moves.append((source, os.path.join(target['path'], filename)))
+        try:
+            self.run_with_progress(f"正在移动 {len(moves)} 张图片…", len(moves),
+                                   lambda progress: TrashManager.move_paths(moves, progress, shutil.move))
+        except OSError as e:
+            QMessageBox.critical(self, "移动失败", f"移动图片时发生错误（已撤回已移动的图片）:\n{e}")
+            return
+        # 置顶的排序键随图片转到目标相册（改名为_N时用新文件名），哈希索引改用新路径
+        keys = self.catalog.take_images(album['name'], [os.path.basename(source) for source, _ in moves])
+        self.catalog.put_images(target['name'], {os.path.basename(new): keys[os.path.basename(source)]
+                                                 for source, new in moves if os.path.basename(source) in keys})
+        self.hash_index.move(moves)
+        target['images'] = self.sort_images(target['name'], target['images'] + [new for _, new in moves])
+        target['cover'] = target['images'][0]
+        self.remove_album_images(thumb_indices)
+        self.statusBar().showMessage(f"已移动 {len(moves)} 张图片到 {target['name']}", 8000)
 
-sys.exit(app.exec())
+
+def run_batch(args):
+    """批量模式入口：处理完所有网址后退出，有失败时返回非零退出码"""
+    urls = list(args.url or [])
+    if args.batch:
+        urls.extend(BatchRunner.read_url_file(args.batch))
+    runner = BatchRunner(ConfigManager(), args.report, args.concurrency)
+    
+    def on_finished(summary):
+        print("批量处理完成: " + "，".join(f"{k} {v}" for k, v in sorted(summary.items())))
+        failed = sum(v for k, v in summary.items() if k in ('failed', 'partial', 'error'))
+        QCoreApplication.exit(1 if failed else 0)
+    
+    runner.finished.connect(on_finished)
+    runner.start(list(dict.fromkeys(urls)))
+    return QCoreApplication.exec()
+
+
+if __name__ == '__main__':
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="图片相册浏览器")
+    arg_parser.add_argument("--batch", metavar="FILE", help="批量导入：网址列表文件（每行一个网址，或JSONL的url字段）")
+    arg_parser.add_argument("--url", action="append", help="批量导入的网址，可多次指定")
+    arg_parser.add_argument("--report", default="batch_report.jsonl", help="批量结果报告（JSONL，追加写入）")
+    arg_parser.add_argument("--concurrency", type=int, default=4, help="批量模式同时处理的网址数")
+    arg_parser.add_argument("--headless", action="store_true", help="不显示界面（使用offscreen平台）")
+    arg_parser.add_argument("--perf", action="store_true", help="启用性能统计（本次运行）")
+    arg_parser.add_argument("--trace", metavar="FILE", help="退出时导出Chrome trace-event JSON（隐含--perf）")
+    arg_parser.add_argument("--profile", action="store_true", help="采样分析模式，退出时在profile_reports中写出报告")
+    args, qt_args = arg_parser.parse_known_args()
+    perf_recorder.enabled = args.perf or bool(args.trace)
+    if args.trace:
+        atexit.register(perf_recorder.export_chrome_trace, args.trace)
+    
+    if args.headless:
+        os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    profiler = None
+    if args.profile or ConfigManager().get_bool('profile_enabled'):
+        profiler = SamplingProfiler()
+        app = ProfilingApplication(sys.argv[:1] + qt_args, profiler)
+        profiler.start()
+    else:
+        app = QApplication(sys.argv[:1] + qt_args)
+    
+    if args.batch or args.url:
+        exit_code = run_batch(args)
+    else:
+        myapp = MyApp()
+        myapp.show()
+        exit_code = app.exec()
+    
+    if profiler is not None:
+        profiler.stop()
+        print(f"📄 分析报告: {profiler.write_report()}")
+    sys.exit(exit_code)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+浏览路径基准
+生成合成图库（N个相册 × M张图片，可配置尺寸和格式），在offscreen平台下驱动MyApp，
+测量首个封面出现时间、整页绘制完成时间、详情页切换延迟（p50/p99）、每秒解码数、峰值内存和GUI卡顿
+
+图库由gen_library.py生成，相同参数和种子得到相同的图库
+
+用法:
+    python bench_browse.py [--albums 60] [--images 30] [--sizes 1920x1080,4000x3000] [--formats jpg,png,webp]
+                           [--pages 5] [--steps 40] [--json result.json] [--compare baseline.json]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QEventLoop
+from PyQt6.QtWidgets import QApplication
+
+from gen_library import generate_library, parse_range, parse_sizes
+
+
+def load_viewer_module():
+    """加载6_open_img.py（文件名以数字开头，无法直接import）"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "6_open_img.py")
+    spec = importlib.util.spec_from_file_location("image_viewer", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, p):
+    """最近秩法百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(p / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class DecodeCounter:
+    """包装ImageLoadWorker.run，统计解码次数和耗时"""
+    def __init__(self, worker_class):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.busy_seconds = 0.0
+        original_run = worker_class.run
+        counter = self
+
+        def run(worker):
+            start = time.perf_counter()
+            original_run(worker)
+            with counter.lock:
+                counter.count += 1
+                counter.busy_seconds += time.perf_counter() - start
+        worker_class.run = run
+
+
+def wait_until(app, predicate, timeout=30.0):
+    """处理事件直到条件满足，返回耗时（秒），超时返回None"""
+    start = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - start > timeout:
+            return None
+        app.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 5)
+    return time.perf_counter() - start
+
+
+def label_done(label):
+    """标签已显示图片或加载失败提示"""
+    return not label.pixmap().isNull() or label.text().startswith("❌")
+
+
+def run_benchmark(args, library):
+    """驱动MyApp执行浏览场景，返回指标字典"""
+    viewer = load_viewer_module()
+    counter = DecodeCounter(viewer.ImageLoadWorker)
+    app = QApplication.instance() or QApplication([])
+
+    with open("image_viewer_config.json", 'w', encoding='utf-8') as f:
+        json.dump({'image_folder': library, 'items_per_page': 9}, f)
+
+    metrics = {}
+    start = time.perf_counter()
+    window = viewer.MyApp()
+    window.resize(1280, 900)
+    window.show()
+    labels = lambda: list(window.label_by_index.values())
+    first = wait_until(app, lambda: any(label_done(l) for l in labels()), args.timeout)
+    metrics['first_cover_ms'] = round((time.perf_counter() - start) * 1000, 2) if first is not None else None
+
+    # 逐页测量整页绘制完成时间（所有封面就绪并完成一次绘制）
+    page_times = []
+    decode_start_count, decode_start_time = counter.count, time.perf_counter()
+    for page in range(min(args.pages, window.total_pages)):
+        if page > 0:
+            page_start = time.perf_counter()
+            window.next_page()
+        else:
+            page_start = start
+        if wait_until(app, lambda: all(label_done(l) for l in labels()), args.timeout) is None:
+            print(f"⚠️ 第{page + 1}页超时")
+            continue
+        window.grab()
+        page_times.append((time.perf_counter() - page_start) * 1000)
+    page_elapsed = time.perf_counter() - decode_start_time
+    metrics['full_page_ms_first'] = round(page_times[0], 2) if page_times else None
+    metrics['full_page_ms_p50'] = round(statistics.median(page_times), 2) if page_times else None
+    metrics['page_decodes_per_s'] = round((counter.count - decode_start_count) / page_elapsed, 1) if page_elapsed else None
+
+    # 详情页：逐张切换到下一张，测量到主图显示完成的延迟
+    nav_times = []
+    window.on_album_clicked(0)
+    detail = window.detail_label
+    wait_until(app, lambda: label_done(detail), args.timeout)
+    for _ in range(args.steps):
+        album = window.albums[window.current_album_index]
+        if window.current_image_index >= len(album['images']) - 1:
+            break
+        step_start = time.perf_counter()
+        window.detail_next()
+        if wait_until(app, lambda: label_done(detail), args.timeout) is None:
+            print("⚠️ 详情页切换超时")
+            continue
+        nav_times.append((time.perf_counter() - step_start) * 1000)
+    metrics['detail_nav_ms_p50'] = round(percentile(nav_times, 50), 2) if nav_times else None
+    metrics['detail_nav_ms_p99'] = round(percentile(nav_times, 99), 2) if nav_times else None
+
+    # 等待缩略图等剩余解码完成后统计总解码吞吐
+    window.thread_pool.waitForDone()
+    app.processEvents()
+    metrics['decodes'] = counter.count
+    metrics['decode_ms_mean'] = round(counter.busy_seconds / counter.count * 1000, 2) if counter.count else None
+    metrics['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    # GUI线程卡顿（看门狗记录），回归时数量或最长时长会明显上升
+    metrics['gui_stalls'] = window.stall_watchdog.stall_count
+    metrics['gui_stall_max_ms'] = round(window.stall_watchdog.max_ms, 1)
+    for record in window.stall_watchdog.stalls:
+        print(f"⚠️ GUI卡顿 {record['duration_ms']:.0f}ms  {record['where']}")
+    window.download_queue.shutdown()
+    window.close()
+    return metrics
+
+
+def compare(current, baseline_path):
+    """与之前保存的结果逐项对比"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['metrics']
+    print(f"\n{'指标':<22} {'基线':>12} {'本次':>12} {'变化':>9}")
+    for key, value in current.items():
+        old = baseline.get(key)
+        if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+            change = f"{(value - old) / old * 100:+.1f}%"
+        else:
+            change = "-"
+        print(f"{key:<22} {str(old):>12} {str(value):>12} {change:>9}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="浏览路径基准（offscreen）")
+    parser.add_argument("--albums", type=int, default=60, help="相册数量")
+    parser.add_argument("--images", default="30", help="每个相册的图片数量（或范围，如5-40）")
+    parser.add_argument("--sizes", default="1920x1080,4000x3000", help="图片尺寸列表")
+    parser.add_argument("--formats", default="jpg,png,webp", help="图片格式列表")
+    parser.add_argument("--giant-ratio", type=float, default=0.0, help="超大图（8000x6000）比例")
+    parser.add_argument("--corrupt-ratio", type=float, default=0.0, help="损坏文件比例")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--library", help="使用已有图库目录（不再生成）")
+    parser.add_argument("--pages", type=int, default=5, help="测量的分页数")
+    parser.add_argument("--steps", type=int, default=40, help="详情页切换次数")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单项等待超时（秒）")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    parser.add_argument("--compare", help="与之前保存的JSON结果对比")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_browse_")
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    library = os.path.abspath(args.library) if args.library else os.path.join(workdir, "library")
+    try:
+        if not args.library:
+            start = time.perf_counter()
+            stats = generate_library(
+                library, args.albums, parse_range(args.images), parse_sizes(args.sizes),
+                [f.strip().lower() for f in args.formats.split(',') if f.strip()], variants=2,
+                giant_ratio=args.giant_ratio, corrupt_ratio=args.corrupt_ratio, domains=max(1, args.albums // 10),
+                seed=args.seed)
+            print(f"✅ 图库已生成: {stats['albums']}个相册、{stats['images']}张图片，耗时 {time.perf_counter() - start:.1f}s")
+        # MyApp在当前目录读写配置、HTTP缓存和下载队列，切到临时目录避免影响真实数据
+        os.chdir(workdir)
+        metrics = run_benchmark(args, library)
+    finally:
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for key, value in metrics.items():
+        print(f"{key:<22} {value}")
+
+    if json_path:
+        params = {k: v for k, v in vars(args).items() if k not in ('json', 'compare')}
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({'params': params, 'metrics': metrics}, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已写入 {json_path}")
+    if compare_path:
+        compare(metrics, compare_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+XPath图片提取微基准
+对保存的真实网页测量每页的提取耗时，对比旧实现（每次新建解析器、重新编译XPath、set去重）
+与WebScraper.extract_images_by_xpath（复用解析器、缓存编译后的XPath、保序去重）
+
+用法:
+    python bench_xpath.py 保存网页的目录 [--xpath XPATH] [--repeat 20]
+未指定--xpath时使用image_viewer_config.json中配置的全部XPath
+"""
+
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+
+import lxml.html
+
+
+def load_viewer_module():
+    """加载6_open_img.py（文件名以数字开头，无法直接import）"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "6_open_img.py")
+    spec = importlib.util.spec_from_file_location("image_viewer", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_extract(html_content, xpath):
+    """旧实现：每次解析都新建解析器并重新编译XPath"""
+    doc = lxml.html.fromstring(html_content)
+    image_urls = []
+    for element in doc.xpath(xpath):
+        if isinstance(element, str):
+            image_urls.append(element)
+        elif element.text:
+            image_urls.append(element.text.strip())
+        else:
+            src = element.get('src') or element.get('data-src') or element.get('href')
+            if src:
+                image_urls.append(src.strip())
+    return list(set(image_urls))
+
+
+def measure(func, html_content, xpath, repeat):
+    """返回每次调用的耗时（毫秒）列表"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(html_content, xpath)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="XPath图片提取微基准")
+    parser.add_argument("pages_dir", help="保存的网页（*.html）所在目录")
+    parser.add_argument("--xpath", action="append", help="要测试的XPath，可多次指定")
+    parser.add_argument("--config", default="image_viewer_config.json", help="未指定--xpath时读取的配置文件")
+    parser.add_argument("--repeat", type=int, default=20, help="每页重复次数")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    xpaths = args.xpath
+    if not xpaths:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            xpaths = [c['xpath'] for c in json.load(f).get('xpath_configs', []) if c.get('xpath')]
+    if not xpaths:
+        print("❌ 没有可测试的XPath")
+        sys.exit(1)
+
+    pages = sorted(glob.glob(os.path.join(args.pages_dir, "*.html")) + glob.glob(os.path.join(args.pages_dir, "*.htm")))
+    if not pages:
+        print(f"❌ 目录中没有网页文件: {args.pages_dir}")
+        sys.exit(1)
+
+    viewer = load_viewer_module()
+    scraper = viewer.WebScraper()
+
+    results = []
+    print(f"{'网页':<40} {'旧实现 p50':>12} {'新实现 p50':>12} {'加速':>8} {'图片数':>8}")
+    for page in pages:
+        with open(page, 'r', encoding='utf-8', errors='replace') as f:
+            html_content = f.read()
+        for xpath in xpaths:
+            # 预热一次，让新实现的XPath编译缓存生效
+            found = scraper.extract_images_by_xpath(html_content, xpath)
+            legacy = measure(legacy_extract, html_content, xpath, args.repeat)
+            cached = measure(scraper.extract_images_by_xpath, html_content, xpath, args.repeat)
+            legacy_p50 = statistics.median(legacy)
+            cached_p50 = statistics.median(cached)
+            results.append({
+                'page': os.path.basename(page),
+                'size_kb': round(len(html_content.encode('utf-8')) / 1024, 1),
+                'xpath': xpath,
+                'images': len(found),
+                'legacy_ms_p50': round(legacy_p50, 3),
+                'cached_ms_p50': round(cached_p50, 3),
+                'legacy_ms_mean': round(statistics.mean(legacy), 3),
+                'cached_ms_mean': round(statistics.mean(cached), 3),
+            })
+            speedup = legacy_p50 / cached_p50 if cached_p50 > 0 else float('inf')
+            print(f"{os.path.basename(page)[:40]:<40} {legacy_p50:>10.3f}ms {cached_p50:>10.3f}ms {speedup:>7.2f}x {len(found):>8}")
+
+    total_legacy = sum(r['legacy_ms_p50'] for r in results)
+    total_cached = sum(r['cached_ms_p50'] for r in results)
+    print(f"\n平均每页: 旧实现 {total_legacy / len(results):.3f}ms, 新实现 {total_cached / len(results):.3f}ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'repeat': args.repeat, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+合成图库生成器
+按随机种子确定性地生成与真实图库结构一致的目录树：domain_timestamp相册文件夹、
+混合JPEG/PNG/WebP/GIF图片、少量超大图和损坏文件、original_url.txt。
+每种图片只在图片池（.pool目录）中编码一份，相册中的文件用硬链接/符号链接指向池中文件，
+百万张图片的图库只占用几十张图片的磁盘空间。
+
+用法:
+    python gen_library.py 输出目录 [--albums 50000] [--images 5-40] [--formats jpg,png,webp,gif]
+                          [--giant-ratio 0.001] [--corrupt-ratio 0.002] [--link hardlink] [--seed 1]
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import struct
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QRect
+from PyQt6.QtGui import QColor, QGuiApplication, QImage, QPainter
+
+# GIF使用自带的编码器写出（Qt默认不带GIF写入插件）
+QT_FORMATS = {'jpg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP', 'bmp': 'BMP'}
+LINK_MODES = ('hardlink', 'symlink', 'copy')
+
+
+def make_image(width, height, rng):
+    """生成带随机色块的图片，避免纯色图片被编码器压缩得过于简单"""
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    painter = QPainter(image)
+    for _ in range(200):
+        w, h = rng.randrange(1, max(2, width // 4)), rng.randrange(1, max(2, height // 4))
+        rect = QRect(rng.randrange(width), rng.randrange(height), w, h)
+        painter.fillRect(rect, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    painter.end()
+    return image
+
+
+def encode_gif(image):
+    """把QImage编码为GIF（216色调色板，不压缩的LZW码流）
+
+    每个像素直接输出为9位的字面码，每254个字面码插入一次清除码，
+    使解码器的字典永远不会增长到需要10位码宽，因此无需真正实现LZW压缩。
+    """
+    width, height = image.width(), image.height()
+    palette = bytearray()
+    for r in range(6):
+        for g in range(6):
+            for b in range(6):
+                palette += bytes((r * 51, g * 51, b * 51))
+    palette += bytes(3 * (256 - 216))
+
+    rgb = image.convertToFormat(QImage.Format.Format_RGB888)
+    stride = rgb.bytesPerLine()
+    data = bytes(rgb.constBits().asarray(stride * height))
+    level = bytes((v + 25) // 51 for v in range(256))  # 0-255 -> 0-5
+
+    clear_code, end_code = 256, 257
+    out = bytearray()
+    bit_buffer = bit_count = 0
+
+    def emit(code):
+        nonlocal bit_buffer, bit_count
+        bit_buffer |= code << bit_count
+        bit_count += 9
+        while bit_count >= 8:
+            out.append(bit_buffer & 0xFF)
+            bit_buffer >>= 8
+            bit_count -= 8
+
+    run = 254
+    for y in range(height):
+        row = data[y * stride:y * stride + width * 3]
+        for x in range(0, width * 3, 3):
+            if run == 254:
+                emit(clear_code)
+                run = 0
+            emit(level[row[x]] * 36 + level[row[x + 1]] * 6 + level[row[x + 2]])
+            run += 1
+    emit(end_code)
+    if bit_count:
+        out.append(bit_buffer & 0xFF)
+
+    gif = bytearray(b"GIF89a")
+    gif += struct.pack("<HHBBB", width, height, 0xF7, 0, 0)  # 全局调色板，256色
+    gif += palette
+    gif += b"," + struct.pack("<HHHHB", 0, 0, width, height, 0)
+    gif.append(8)  # LZW最小码长
+    for i in range(0, len(out), 255):
+        block = out[i:i + 255]
+        gif.append(len(block))
+        gif += block
+    gif += b"\x00;"
+    return bytes(gif)
+
+
+def write_image(path, image, fmt):
+    """按格式写出图片，返回是否成功"""
+    if fmt == 'gif':
+        with open(path, 'wb') as f:
+            f.write(encode_gif(image))
+        return True
+    return image.save(path, QT_FORMATS.get(fmt, fmt.upper()))
+
+
+def build_pool(pool, sizes, formats, variants, giant_size, seed):
+    """生成图片池，返回{'normal': [...], 'giant': [...], 'corrupt': [...]}（已存在的文件直接复用）"""
+    rng = random.Random(seed)
+    os.makedirs(pool, exist_ok=True)
+    entries = {'normal': [], 'giant': [], 'corrupt': []}
+
+    def ensure(name, width, height, fmt):
+        path = os.path.join(pool, name)
+        image = make_image(width, height, rng)  # 无论是否复用都消耗随机数，保证结果与池是否存在无关
+        if os.path.exists(path) or write_image(path, image, fmt):
+            return path
+        print(f"⚠️ 当前Qt不支持写入{fmt}格式，已跳过")
+        return None
+
+    for fmt in formats:
+        for width, height in sizes:
+            for k in range(variants):
+                path = ensure(f"s{seed}_{width}x{height}_{k}.{fmt}", width, height, fmt)
+                if path:
+                    entries['normal'].append(path)
+    if giant_size:
+        width, height = giant_size
+        path = ensure(f"s{seed}_giant_{width}x{height}.jpg", width, height, 'jpg')
+        if path:
+            entries['giant'].append(path)
+
+    # 损坏文件：截断的JPEG、扩展名正确但内容是随机字节的文件
+    if entries['normal']:
+        source = next((p for p in entries['normal'] if p.endswith('.jpg')), entries['normal'][0])
+        with open(source, 'rb') as f:
+            head = f.read()
+        head = head[:len(head) // 2]
+        garbage = rng.randbytes(4096)
+        for name, content in ((f"s{seed}_truncated.jpg", head), (f"s{seed}_garbage.png", garbage)):
+            path = os.path.join(pool, name)
+            if not os.path.exists(path):
+                with open(path, 'wb') as f:
+                    f.write(content)
+            entries['corrupt'].append(path)
+    return entries
+
+
+def place_file(source, target, link_mode):
+    """按链接方式放置文件，硬链接失败（如跨文件系统）时退回复制"""
+    if link_mode == 'hardlink':
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            pass
+    elif link_mode == 'symlink':
+        os.symlink(os.path.abspath(source), target)
+        return
+    shutil.copyfile(source, target)
+
+
+def generate_library(root, albums=50000, images=(5, 40), sizes=((1920, 1080), (1280, 1920), (800, 600)),
+                     formats=('jpg', 'png', 'webp', 'gif'), variants=3, giant_size=(8000, 6000),
+                     giant_ratio=0.001, corrupt_ratio=0.002, domains=500, link_mode='hardlink',
+                     pool=None, seed=1, base_timestamp=1700000000):
+    """生成图库，返回统计信息字典；相同参数和种子得到完全相同的目录树"""
+    if link_mode not in LINK_MODES:
+        raise ValueError(f"未知的链接方式: {link_mode}")
+    QGuiApplication.instance() or QGuiApplication([])
+    rng = random.Random(seed)
+    pool = pool or os.path.join(root, ".pool")
+    entries = build_pool(pool, sizes, formats, variants, giant_size if giant_ratio > 0 else None, seed)
+    if not entries['normal']:
+        raise RuntimeError("没有可用的图片格式")
+
+    stats = {'albums': 0, 'images': 0, 'giant': 0, 'corrupt': 0}
+    os.makedirs(root, exist_ok=True)
+    timestamp = base_timestamp
+    for a in range(albums):
+        # 时间戳严格递增，保证文件夹不重名且排序稳定
+        timestamp += rng.randrange(1, 3600)
+        domain = f"site{rng.randrange(domains)}.example.com"
+        folder = os.path.join(root, f"{domain}_{timestamp}")
+        os.makedirs(folder, exist_ok=True)
+        count = rng.randint(images[0], images[1])
+        width = max(4, len(str(count)))
+        for i in range(count):
+            roll = rng.random()
+            if roll < corrupt_ratio and entries['corrupt']:
+                source = rng.choice(entries['corrupt'])
+                stats['corrupt'] += 1
+            elif roll < corrupt_ratio + giant_ratio and entries['giant']:
+                source = rng.choice(entries['giant'])
+                stats['giant'] += 1
+            else:
+                source = rng.choice(entries['normal'])
+            digest = hashlib.sha1(f"{seed}:{a}:{i}".encode()).hexdigest()[:8]
+            target = os.path.join(folder, f"{i + 1:0{width}d}_{digest}{os.path.splitext(source)[1]}")
+            if not os.path.lexists(target):
+                place_file(source, target, link_mode)
+            stats['images'] += 1
+        with open(os.path.join(folder, "original_url.txt"), 'w', encoding='utf-8') as f:
+            f.write(f"https://{domain}/gallery/{a}")
+        os.utime(folder, (timestamp, timestamp))
+        stats['albums'] += 1
+    return stats
+
+
+def parse_sizes(value):
+    """解析"1920x1080,800x600"形式的尺寸列表"""
+    sizes = []
+    for part in value.split(','):
+        width, height = part.lower().split('x')
+        sizes.append((int(width), int(height)))
+    return sizes
+
+
+def parse_range(value):
+    """解析"5-40"或"20"形式的数量范围"""
+    low, _, high = value.partition('-')
+    return int(low), int(high or low)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="合成图库生成器")
+    parser.add_argument("root", help="输出目录（作为image_folder使用）")
+    parser.add_argument("--albums", type=int, default=50000, help="相册数量")
+    parser.add_argument("--images", default="5-40", help="每个相册的图片数量范围，如5-40")
+    parser.add_argument("--sizes", default="1920x1080,1280x1920,800x600", help="普通图片尺寸列表")
+    parser.add_argument("--formats", default="jpg,png,webp,gif", help="图片格式列表")
+    parser.add_argument("--variants", type=int, default=3, help="每种格式和尺寸的不同图片数量")
+    parser.add_argument("--giant-size", default="8000x6000", help="超大图尺寸")
+    parser.add_argument("--giant-ratio", type=float, default=0.001, help="超大图比例")
+    parser.add_argument("--corrupt-ratio", type=float, default=0.002, help="损坏文件比例")
+    parser.add_argument("--domains", type=int, default=500, help="不同域名数量")
+    parser.add_argument("--link", choices=LINK_MODES, default='hardlink', help="相册文件与图片池的关联方式")
+    parser.add_argument("--pool", help="图片池目录（默认为输出目录下的.pool）")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        stats = generate_library(
+            args.root, args.albums, parse_range(args.images), parse_sizes(args.sizes),
+            [f.strip().lower() for f in args.formats.split(',') if f.strip()], args.variants,
+            parse_sizes(args.giant_size)[0], args.giant_ratio, args.corrupt_ratio, args.domains,
+            args.link, args.pool, args.seed)
+    except (RuntimeError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ 已生成 {stats['albums']} 个相册、{stats['images']} 张图片"
+          f"（超大图 {stats['giant']}，损坏 {stats['corrupt']}），耗时 {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+AlbumSearchIndex查询测试：图片数量过滤条件的比较与范围两种写法
+
+用法:
+    python -m pytest tests/test_album_search.py
+"""
+
+import importlib.util
+import os
+
+import pytest
+
+
+def load_viewer_module():
+    """加载6_open_img.py（文件名以数字开头，无法直接import）"""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "6_open_img.py")
+    spec = importlib.util.spec_from_file_location("image_viewer", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+viewer = load_viewer_module()
+
+
+@pytest.fixture
+def index():
+    index = viewer.AlbumSearchIndex()
+    albums = [{'name': f'site_{1700000000 + count}', 'path': f'/img/{count}', 'images': ['x.jpg'] * count,
+               'timestamp': 0, 'original_url': ''} for count in (5, 10, 15, 20, 25)]
+    index.sync(albums)
+    return index
+
+
+@pytest.mark.parametrize('query, counts', [
+    ('count:>10', {15, 20, 25}),
+    ('count:>=10', {10, 15, 20, 25}),
+    ('count:<=10', {5, 10}),
+    ('count:15', {15}),
+    ('count:=20', {20}),
+    ('count:10-20', {10, 15, 20}),
+])
+def test_count_filter(index, query, counts):
+    assert index.search(query) == {f'/img/{count}' for count in counts}
+
+
+@pytest.mark.parametrize('query', ['count:>10-20', 'count:=10-20', 'count:10-', 'count:abc'])
+def test_count_filter_rejects_malformed(index, query):
+    with pytest.raises(ValueError):
+        index.search(query)
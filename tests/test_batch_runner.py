@@ -0,0 +1,116 @@
+"""
+BatchRunner重复运行测试：上次失败或部分失败的网址在再次运行时重新处理，成功的网址跳过
+
+用法:
+    python -m pytest tests/test_batch_runner.py
+"""
+
+import importlib.util
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PyQt6.QtCore import QCoreApplication, QEventLoop, QTimer
+
+
+def load_viewer_module():
+    """加载6_open_img.py（文件名以数字开头，无法直接import）"""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "6_open_img.py")
+    spec = importlib.util.spec_from_file_location("image_viewer", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+viewer = load_viewer_module()
+app = QCoreApplication.instance() or QCoreApplication([])
+
+
+class GalleryHandler(BaseHTTPRequestHandler):
+    """/gallery：两张图片的图集；broken中的图片返回404"""
+    broken = set()
+
+    def do_GET(self):
+        if self.path == '/gallery':
+            body, content_type = b'<html><body><img src="/img/1.png"><img src="/img/2.png"></body></html>', 'text/html'
+        elif self.path in GalleryHandler.broken:
+            self.send_error(404)
+            return
+        else:
+            body, content_type = self.path.encode('utf-8') * 64, 'image/png'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), GalleryHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """在临时目录中运行：配置文件、HTTP缓存和报告都写在这里"""
+    monkeypatch.chdir(tmp_path)
+    config = {
+        'image_folder': str(tmp_path / 'img'),
+        'xpath_configs': [{'domain': '127.0.0.1', 'xpath': '//img/@src'}],
+        'probe_enabled': False,
+    }
+    (tmp_path / 'image_viewer_config.json').write_text(json.dumps(config), encoding='utf-8')
+    os.makedirs(config['image_folder'])
+    return tmp_path
+
+
+def run_batch(urls):
+    """运行一次批量导入，返回(提交的网址数, 汇总)"""
+    runner = viewer.BatchRunner(viewer.ConfigManager(), 'batch_report.jsonl', concurrency=2)
+    loop = QEventLoop()
+    summary = {}
+    runner.finished.connect(lambda result: (summary.update(result), loop.quit()))
+    submitted = runner.start(urls)
+    QTimer.singleShot(30000, loop.quit)
+    loop.exec()
+    return submitted, summary
+
+
+def album_files(workspace):
+    albums = sorted(os.listdir(workspace / 'img'))
+    return albums, sorted(f for album in albums for f in os.listdir(workspace / 'img' / album))
+
+
+def test_rerun_retries_partially_failed_url(server, workspace):
+    url = f'{server}/gallery'
+    GalleryHandler.broken = {'/img/2.png'}
+    assert run_batch([url]) == (1, {'partial': 1})
+    albums, files = album_files(workspace)
+    assert len(albums) == 1 and len([f for f in files if f.endswith('.png')]) == 1
+
+    # 图片恢复后再次运行：重新处理并沿用原相册
+    GalleryHandler.broken = set()
+    assert run_batch([url]) == (1, {'ok': 1})
+    assert album_files(workspace)[0] == albums
+    assert len([f for f in album_files(workspace)[1] if f.endswith('.png')]) == 2
+
+    # 成功后不再处理
+    assert run_batch([url]) == (0, {'skipped': 1})
+
+
+def test_rerun_retries_failed_url(server, workspace):
+    url = f'{server}/gallery'
+    GalleryHandler.broken = {'/img/1.png', '/img/2.png'}
+    assert run_batch([url]) == (1, {'failed': 1})
+    GalleryHandler.broken = set()
+    assert run_batch([url]) == (1, {'ok': 1})
@@ -0,0 +1,95 @@
+"""
+GalleryCrawler分页抓取测试：用本地http.server提供多页图集，
+验证沿"下一页"链接抓取、max_pages上限和循环链接检测
+
+用法:
+    python -m pytest tests/test_gallery_crawler.py
+"""
+
+import importlib.util
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+def load_viewer_module():
+    """加载6_open_img.py（文件名以数字开头，无法直接import）"""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "6_open_img.py")
+    spec = importlib.util.spec_from_file_location("image_viewer", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+viewer = load_viewer_module()
+
+
+class GalleryHandler(BaseHTTPRequestHandler):
+    """/chain/N：共10页的链式图集；/loop/N：第3页的下一页指回第1页（带#片段）"""
+    requests_seen = []
+
+    def do_GET(self):
+        GalleryHandler.requests_seen.append(self.path)
+        kind, _, number = self.path.strip('/').partition('/')
+        number = int(number)
+        if kind == 'chain':
+            next_link = f'<a class="next" href="{number + 1}">下一页</a>' if number < 10 else ''
+        else:
+            next_link = f'<a class="next" href="{number % 3 + 1}#top">下一页</a>'
+        body = (f'<html><body><img src="/img/{kind}-{number}-a.jpg"><img src="/img/{kind}-{number}-b.jpg">'
+                f'{next_link}</body></html>').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    GalleryHandler.requests_seen = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), GalleryHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_configs(max_pages):
+    return [{'xpath': '//img/@src', 'next_page_xpath': '//a[@class="next"]/@href', 'max_pages': max_pages}]
+
+
+def crawl(url, max_pages):
+    crawler = viewer.GalleryCrawler(viewer.WebScraper(), max_workers=4)
+    return crawler.crawl(url, make_configs(max_pages))
+
+
+def test_follows_next_links_in_page_order(server):
+    images = crawl(f'{server}/chain/1', max_pages=10)
+    expected = [f'{server}/img/chain-{n}-{suffix}.jpg' for n in range(1, 11) for suffix in ('a', 'b')]
+    assert images == expected
+
+
+def test_stops_at_page_limit(server):
+    images = crawl(f'{server}/chain/1', max_pages=3)
+    assert images == [f'{server}/img/chain-{n}-{suffix}.jpg' for n in range(1, 4) for suffix in ('a', 'b')]
+    assert sorted(GalleryHandler.requests_seen) == ['/chain/1', '/chain/2', '/chain/3']
+
+
+def test_loop_is_fetched_once(server):
+    images = crawl(f'{server}/loop/1', max_pages=10)
+    assert images == [f'{server}/img/loop-{n}-{suffix}.jpg' for n in range(1, 4) for suffix in ('a', 'b')]
+    assert sorted(GalleryHandler.requests_seen) == ['/loop/1', '/loop/2', '/loop/3']
+
+
+def test_single_page_without_next_xpath(server):
+    crawler = viewer.GalleryCrawler(viewer.WebScraper())
+    images = crawler.crawl(f'{server}/chain/1', [{'xpath': '//img/@src'}])
+    assert images == ['/img/chain-1-a.jpg', '/img/chain-1-b.jpg']
+    assert GalleryHandler.requests_seen == ['/chain/1']
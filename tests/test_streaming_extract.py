@@ -0,0 +1,81 @@
+"""
+WebScraper流式提取测试：请求失败时与整页模式一样打印错误并返回已提取的结果，不向外抛出异常
+
+用法:
+    python -m pytest tests/test_streaming_extract.py
+"""
+
+import importlib.util
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+def load_viewer_module():
+    """加载6_open_img.py（文件名以数字开头，无法直接import）"""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "6_open_img.py")
+    spec = importlib.util.spec_from_file_location("image_viewer", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+viewer = load_viewer_module()
+
+PAGE = ('<html><body>' + ''.join(f'<img src="/img/{n}.jpg">' for n in range(200)) + '</body></html>').encode('utf-8')
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """/page：完整页面；/error：500；/truncated：声明完整长度，只发送一半后断开连接"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/error':
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(PAGE if self.path == '/page' else PAGE[:len(PAGE) // 2])
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # 小块读取，保证断开前已产出过批次
+    monkeypatch.setattr(viewer.WebScraper, 'STREAM_CHUNK_SIZE', 256)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+STREAMING = {'xpath': '//img/@src', 'streaming': True}
+
+
+def test_streaming_http_error_returns_empty(server):
+    assert viewer.WebScraper().extract_images(f'{server}/error', [STREAMING]) == []
+
+
+def test_streaming_keeps_batches_before_connection_drop(server):
+    batches = []
+    images = viewer.WebScraper().extract_images(f'{server}/truncated', [STREAMING], on_batch=batches.append)
+    assert batches and images == [url for batch in batches for url in batch]
+    assert images == [f'/img/{n}.jpg' for n in range(len(images))]
+
+
+def test_page_failure_keeps_streamed_urls(server, monkeypatch):
+    scraper = viewer.WebScraper()
+    monkeypatch.setattr(scraper, 'get_webpage_content', lambda url: None)
+    images = scraper.extract_images(f'{server}/page', [STREAMING, {'xpath': '//a/@href'}])
+    assert images == [f'/img/{n}.jpg' for n in range(200)]
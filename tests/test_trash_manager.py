@@ -0,0 +1,85 @@
+"""
+TrashManager回收区测试：移入回收区的途中触发清理（进度对话框运行事件循环时定时清理可能触发），
+正在移入的批次不能被当作残留目录删除
+
+用法:
+    python -m pytest tests/test_trash_manager.py
+"""
+
+import importlib.util
+import os
+
+import pytest
+
+
+def load_viewer_module():
+    """加载6_open_img.py（文件名以数字开头，无法直接import）"""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "6_open_img.py")
+    spec = importlib.util.spec_from_file_location("image_viewer", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+viewer = load_viewer_module()
+
+
+def make_albums(root, count):
+    paths = []
+    for i in range(count):
+        album = root / f"album_{i}"
+        album.mkdir()
+        (album / "1.jpg").write_bytes(b"jpg")
+        paths.append(str(album))
+    return paths
+
+
+def purge_now(trash_manager):
+    """同步执行一次清理（保留时间为0，所有已完成的批次和残留目录都会删除）"""
+    worker = viewer.TrashPurgeWorker([(trash_manager, trash_manager.expired_batches(0))])
+    worker.run()
+
+
+def test_purge_during_move_keeps_batch(tmp_path):
+    paths = make_albums(tmp_path, 5)
+    trash_manager = viewer.TrashManager(str(tmp_path))
+    purged_during_move = []
+
+    def progress(done):
+        if done == 2:
+            purged_during_move.append(trash_manager.expired_batches(0))
+            purge_now(trash_manager)
+
+    batch_id = trash_manager.move_to_trash(paths, "删除5个相册", progress)
+    assert purged_during_move == [[]]
+    assert trash_manager.is_restorable(batch_id)
+    assert sorted(trash_manager.restore(batch_id)) == sorted(paths)
+    assert all(os.path.isfile(os.path.join(path, "1.jpg")) for path in paths)
+
+
+def test_pending_batch_is_not_restorable_and_survives_reload(tmp_path):
+    paths = make_albums(tmp_path, 2)
+    trash_manager = viewer.TrashManager(str(tmp_path))
+    seen = []
+
+    def progress(done):
+        batch_id = next(iter(trash_manager.batches))
+        seen.append(trash_manager.is_restorable(batch_id))
+        # 另一个实例读到进行中的批次（例如程序在移动途中退出后重启）：按普通批次保留
+        seen.append(viewer.TrashManager(str(tmp_path)).expired_batches(3600))
+
+    batch_id = trash_manager.move_to_trash(paths, "", progress)
+    assert seen[::2] == [False, False]
+    assert seen[1::2] == [[], []]
+    assert trash_manager.is_restorable(batch_id)
+
+
+def test_failed_move_removes_pending_entry(tmp_path):
+    paths = make_albums(tmp_path, 2) + [str(tmp_path / "missing")]
+    trash_manager = viewer.TrashManager(str(tmp_path))
+    with pytest.raises(OSError):
+        trash_manager.move_to_trash(paths)
+    assert trash_manager.batches == {}
+    assert viewer.TrashManager(str(tmp_path)).batches == {}
+    assert all(os.path.isdir(path) for path in paths[:2])
+    assert os.listdir(tmp_path / ".trash") == ["manifest.json"]